@@ -1,25 +1,55 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_mail import Mail
 from config import Config
 
 db = SQLAlchemy()
-mail = Mail()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    from app import log
+    log.init_app(app)
+
+    if app.config['PROXY_FIX_X_FOR'] or app.config['PROXY_FIX_X_PROTO']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                                x_proto=app.config['PROXY_FIX_X_PROTO'])
+
+    # Outermost, so a profile covers everything the app does. Optional
+    # subsystems are only imported when configured.
+    if app.config['PROFILE_SECRET'] or app.config['PROFILE_SAMPLE_INTERVAL']:
+        from app import profiling
+        profiling.init_app(app)
+
     db.init_app(app)
-    
-    # Initialize mail only if configuration is provided
-    if app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD'):
-        mail.init_app(app)
-        app.logger.info("Email functionality enabled")
-    else:
+
+    from app import database, queries
+    database.init_app(app)
+    queries.init_app(app)
+
+    from app.cache import page_cache
+    page_cache.init_app(app)
+
+    from app.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+
+    from app import assets, catalog, health, streaming, suggestions, templating
+    assets.init_app(app)
+    catalog.init_app(app)
+    suggestions.init_app(app)
+    templating.init_app(app)
+    streaming.init_app(app)
+    health.init_app(app)
+
+    # prometheus_client alone costs more to import than any module of the app
+    if app.config['METRICS_ENABLED']:
+        from app import metrics
+        metrics.init_app(app)
+
+    # Mail is sent by the outbox worker (`flask outbox run`); nothing to set up here
+    if not (app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD')):
         app.logger.warning("Email configuration not set up. Email functionality disabled.")
-        # Create a mock mail object for routes that expect it
-        app.mail = None
 
     from app.routes import main, services, about, contact, blog
     app.register_blueprint(main.bp)
@@ -28,7 +58,8 @@ def create_app():
     app.register_blueprint(contact.bp, url_prefix='/contact')
     app.register_blueprint(blog.bp, url_prefix='/blog')
 
-    with app.app_context():
-        db.create_all()
+    # The schema is managed by `flask db upgrade`, never at startup
+    from app import cli
+    cli.register(app)
 
     return app
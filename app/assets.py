@@ -0,0 +1,322 @@
+"""Static asset pipeline: minify, fingerprint, precompress.
+
+``flask assets build`` processes every file under ``app/static`` and
+``public`` into a ``dist/`` directory next to it, renaming each file to
+``name.<hash>.ext``. Every text asset also gets a ``.gz`` copy, and a
+``.br`` copy when the optional ``brotli`` package is installed. CSS
+``url()`` references are rewritten to the fingerprinted names.
+
+The resulting ``app/static/dist/manifest.json`` is applied to
+``url_for('static', ...)`` and ``url_for('public', ...)`` through a URL
+defaults hook, so templates keep using logical file names while browsers
+get immutable, content-addressed URLs.
+
+The third-party files (Bootstrap, Bootstrap Icons) are committed under
+``app/static/vendor`` together with ``vendor.lock.json``, which pins the
+SHA-384 of each one, so they go through the same pipeline instead of being
+loaded from a CDN and deploys never need the network. ``flask assets
+vendor --pin`` (re)downloads them on a developer machine; ``--check``
+verifies the committed copies offline.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+
+from flask import send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: only adds .br variants
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+DIST_DIR = 'dist'
+VENDOR_DIR = 'vendor'
+VENDOR_LOCK = 'vendor.lock.json'
+
+# Files worth precompressing; fonts and images are compressed already
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.map', '.ico'}
+
+# Logical name under static/vendor -> pinned upstream URL
+VENDOR_ASSETS = {
+    'bootstrap/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'bootstrap-icons/bootstrap-icons.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css',
+    'bootstrap-icons/fonts/bootstrap-icons.woff2':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/fonts/bootstrap-icons.woff2',
+    'bootstrap-icons/fonts/bootstrap-icons.woff':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/fonts/bootstrap-icons.woff',
+}
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_SOURCE_MAP_RE = re.compile(r'^\s*(/\*# sourceMappingURL=.*?\*/|//# sourceMappingURL=.*)$', re.M)
+
+
+def minify_css(css):
+    """Drop comments and insignificant whitespace, leaving strings alone."""
+    css = _CSS_COMMENT_RE.sub('', css)
+    parts = _CSS_STRING_RE.split(css)
+    for i in range(0, len(parts), 2):
+        chunk = re.sub(r'\s+', ' ', parts[i])
+        # Never touch the space before ":" (descendant selectors like "a :hover")
+        chunk = re.sub(r'\s*([{};,>])\s*', r'\1', chunk)
+        chunk = re.sub(r':\s+', ':', chunk)
+        parts[i] = chunk.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """Conservative JS minification: indentation, blank and comment-only lines.
+
+    Line breaks are kept, so automatic semicolon insertion is unaffected.
+    """
+    lines = []
+    for line in js.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def _fingerprint(relative, data):
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    stem, ext = posixpath.splitext(relative)
+    return f'{stem}.{digest}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        return  # content-addressed: same name, same bytes
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+
+
+def _source_files(root):
+    for directory, subdirs, files in os.walk(root):
+        relative_dir = os.path.relpath(directory, root).replace(os.sep, '/')
+        if relative_dir == DIST_DIR or relative_dir.startswith(f'{DIST_DIR}/'):
+            subdirs[:] = []
+            continue
+        subdirs[:] = [name for name in subdirs if not name.startswith('.')]
+        for name in files:
+            if name.startswith('.') or name == VENDOR_LOCK:
+                continue
+            relative = posixpath.normpath(posixpath.join(relative_dir, name))
+            yield relative, os.path.join(directory, name)
+
+
+def _rewrite_css_urls(css, relative, mapping):
+    """Point url() references at the fingerprinted copies of their targets."""
+    base = posixpath.dirname(relative)
+
+    def replace(match):
+        quote, target = match.group(1), match.group(2).strip()
+        if re.match(r'^(data:|[a-z]+://|//|#)', target):
+            return match.group(0)
+        path, _, fragment = target.partition('#')
+        path = path.split('?', 1)[0]
+        resolved = posixpath.normpath(posixpath.join(base, path))
+        if resolved not in mapping:
+            return match.group(0)
+        new = posixpath.relpath(mapping[resolved], posixpath.dirname(mapping[relative]))
+        if fragment:
+            new = f'{new}#{fragment}'
+        return f'url({quote}{new}{quote})'
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def build_root(root):
+    """Build one asset root into ``root/dist``. Returns its manifest."""
+    mapping, sources = {}, {}
+    for relative, path in _source_files(root):
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        ext = posixpath.splitext(relative)[1]
+        if ext in ('.css', '.js'):
+            text = _SOURCE_MAP_RE.sub('', data.decode('utf-8'))
+            if not relative.endswith(f'.min{ext}'):
+                text = minify_css(text) if ext == '.css' else minify_js(text)
+            data = text.encode('utf-8')
+        sources[relative] = data
+
+    # Fingerprint everything except CSS first, so stylesheets can refer to it
+    for relative, data in sources.items():
+        if not relative.endswith('.css'):
+            mapping[relative] = _fingerprint(relative, data)
+    for relative, data in sources.items():
+        if relative.endswith('.css'):
+            # The name depends on the rewritten content, so map provisionally
+            mapping[relative] = relative
+            css = _rewrite_css_urls(data.decode('utf-8'), relative, mapping)
+            sources[relative] = data = css.encode('utf-8')
+            mapping[relative] = _fingerprint(relative, data)
+
+    for relative, data in sources.items():
+        target = os.path.join(root, DIST_DIR, mapping[relative])
+        _write(target, data)
+        if posixpath.splitext(relative)[1] in COMPRESSIBLE:
+            _write(f'{target}.gz', gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                _write(f'{target}.br', brotli.compress(data, quality=11))
+
+    return {relative: f'{DIST_DIR}/{hashed}' for relative, hashed in sorted(mapping.items())}
+
+
+def public_folder(app):
+    return app.config['PUBLIC_FOLDER'] or os.path.join(os.path.dirname(app.root_path), 'public')
+
+
+def asset_roots(app):
+    return {'static': app.static_folder, 'public': public_folder(app)}
+
+
+def build(app):
+    """Build every asset root and write the combined manifest."""
+    manifest = {endpoint: build_root(root)
+                for endpoint, root in asset_roots(app).items() if os.path.isdir(root)}
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'w') as handle:
+        json.dump(manifest, handle, indent=1, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+    return manifest
+
+
+def _integrity(data):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+def _vendor_lock(app):
+    try:
+        with open(os.path.join(app.static_folder, VENDOR_DIR, VENDOR_LOCK)) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def _pin(lock, name):
+    """The lock entry for ``name``, if it pins the URL in :data:`VENDOR_ASSETS`."""
+    entry = lock.get(name)
+    return entry if entry and entry.get('url') == VENDOR_ASSETS[name] else None
+
+
+def vendor(app, refresh=False, pin=False):
+    """Download the third-party assets into ``static/vendor``; a developer step.
+
+    Every download must match its SHA-384 in ``vendor.lock.json``. A file
+    with no pin there (a new or bumped URL) is refused unless ``pin`` is
+    set, which records the hash of whatever arrived: review that diff,
+    then commit the files and the lock together.
+    """
+    import urllib.request
+
+    vendor_root = os.path.join(app.static_folder, VENDOR_DIR)
+    lock = _vendor_lock(app)
+
+    fetched = []
+    for name, url in VENDOR_ASSETS.items():
+        target = os.path.join(vendor_root, name)
+        pinned = _pin(lock, name)
+        if os.path.exists(target) and pinned and not refresh:
+            continue
+        if pinned is None and not pin:
+            raise ValueError(f'{name} is not pinned in {VENDOR_LOCK}; download it with --pin and review it')
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        integrity = _integrity(data)
+        if pinned and pinned['integrity'] != integrity:
+            raise ValueError(f'{url} does not match the integrity pinned in {VENDOR_LOCK}')
+        lock[name] = {'url': url, 'integrity': integrity}
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as handle:
+            handle.write(data)
+        fetched.append(name)
+
+    os.makedirs(vendor_root, exist_ok=True)
+    with open(os.path.join(vendor_root, VENDOR_LOCK), 'w') as handle:
+        json.dump(lock, handle, indent=1, sort_keys=True)
+        handle.write('\n')
+    return fetched
+
+
+def check_vendor(app):
+    """Compare the vendored files with ``vendor.lock.json``, offline.
+
+    Returns ``{name: problem}`` for every file that is missing, unpinned or
+    does not match its pin; empty when all is well.
+    """
+    lock = _vendor_lock(app)
+    problems = {}
+    for name in VENDOR_ASSETS:
+        pinned = _pin(lock, name)
+        try:
+            with open(os.path.join(app.static_folder, VENDOR_DIR, name), 'rb') as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            problems[name] = 'missing'
+            continue
+        if pinned is None:
+            problems[name] = f'not pinned in {VENDOR_LOCK}'
+        elif pinned['integrity'] != _integrity(data):
+            problems[name] = f'does not match {pinned["integrity"]}'
+    return problems
+
+
+def _vendor_url_function(app):
+    """``vendor_url(name)`` for templates, with the vendored files found once at startup."""
+    local = {name for name in VENDOR_ASSETS
+             if os.path.isfile(os.path.join(app.static_folder, VENDOR_DIR, name))}
+    missing = sorted(set(VENDOR_ASSETS) - local)
+    if missing:
+        app.logger.warning('Vendored assets missing, loading them from the CDN: %s', ', '.join(missing))
+
+    def vendor_url(name):
+        if name in local:
+            return url_for('static', filename=f'{VENDOR_DIR}/{name}')
+        return VENDOR_ASSETS[name]
+    return vendor_url
+
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    """Serve ``public/`` and resolve asset URLs through the build manifest."""
+    folder = public_folder(app)
+
+    def public(filename):
+        return send_from_directory(folder, filename)
+
+    app.add_url_rule('/public/<path:filename>', endpoint='public', view_func=public)
+    app.jinja_env.globals['vendor_url'] = _vendor_url_function(app)
+
+    # Source files are edited in place during development
+    manifest = {} if app.debug else load_manifest(app)
+    app.extensions['asset_manifest'] = manifest
+    if not manifest:
+        return
+
+    @app.url_defaults
+    def fingerprinted_filename(endpoint, values):
+        files = manifest.get(endpoint)
+        if files and values.get('filename') in files:
+            values['filename'] = files[values['filename']]
@@ -0,0 +1,174 @@
+"""Bulk import and export of blog posts as JSON Lines or CSV.
+
+Both directions stream: exports walk the table in id order one batch at a
+time, and imports read, write and commit one batch at a time, so memory
+stays flat however large the file is.
+
+Imports write through SQLAlchemy Core with ``executemany``, one
+transaction per batch. The derived columns (see ``app.content``) and the
+search index are filled in for the whole batch at once. The ORM events
+that normally do this per row are not involved. A post's natural key is
+its ``(title, date_posted)``: rows matching an existing post update it
+(or are skipped with ``on_conflict='skip'``), and duplicates within one
+batch collapse to the last one. The caller sends ``posts_changed`` once at
+the end.
+"""
+import csv
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import bindparam, select
+
+from app import content, search
+from app.models import Post
+
+FIELDS = ('title', 'author', 'date_posted', 'updated_at', 'content')
+
+_posts = Post.__table__
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timestamp(value):
+    if value in (None, ''):
+        return None
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+# -- export ---------------------------------------------------------------
+
+def export_rows(connection, batch_size=1000):
+    """Yield every post as a dict of :data:`FIELDS`, oldest id first."""
+    columns = [_posts.c.id] + [_posts.c[name] for name in FIELDS]
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(*columns).where(_posts.c.id > last_id).order_by(_posts.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        for row in rows:
+            yield {name: getattr(row, name) for name in FIELDS}
+        last_id = rows[-1].id
+
+
+def write_jsonl(rows, stream):
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(row, default=datetime.isoformat, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, fieldnames=FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow({name: value.isoformat() if isinstance(value, datetime) else value
+                         for name, value in row.items()})
+        count += 1
+    return count
+
+
+# -- import ---------------------------------------------------------------
+
+def read_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f'line {number}: {exc}') from None
+
+
+def read_csv(stream):
+    # Post bodies easily exceed the csv module's default 128 KiB field limit
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+    yield from csv.DictReader(stream)
+
+
+def _normalize(record, now):
+    if not record.get('title') or record.get('content') is None:
+        raise ValueError(f"every row needs a title and content: {str(record)[:80]}")
+    date_posted = _timestamp(record.get('date_posted')) or now
+    return {
+        'title': record['title'],
+        'content': record['content'],
+        'author': record.get('author') or 'Zencrow Team',
+        'date_posted': date_posted,
+        'updated_at': _timestamp(record.get('updated_at')),
+    }
+
+
+def _existing_ids(connection, keys):
+    """Map ``(title, date_posted)`` to post ids; a lookup on ``ix_post_date_posted_id``."""
+    dates = list({date for _, date in keys})
+    rows = connection.execute(
+        select(_posts.c.id, _posts.c.title, _posts.c.date_posted).where(_posts.c.date_posted.in_(dates))
+    ).all()
+    return {(row.title, row.date_posted): row.id for row in rows}
+
+
+def import_batch(connection, records, on_conflict='update'):
+    """Write one batch of post dicts. Returns ``(inserted, updated, skipped)``."""
+    now = datetime.utcnow()
+    by_key = {}
+    for record in records:
+        row = _normalize(record, now)
+        by_key[(row['title'], row['date_posted'])] = row
+    existing = _existing_ids(connection, by_key)
+
+    inserts, updates = [], []
+    for key, row in by_key.items():
+        row.update(content.derive_fields(row['title'], row['content']))
+        if key not in existing:
+            inserts.append(dict(row, updated_at=row['updated_at'] or row['date_posted']))
+        elif on_conflict == 'update':
+            updates.append(dict(row, updated_at=row['updated_at'] or now, _id=existing[key]))
+    skipped = len(records) - len(inserts) - len(updates)
+
+    indexed = search.is_available(connection)
+    if inserts:
+        # The ids come back from the INSERT itself (SQLite 3.35+), so a post
+        # another connection adds meanwhile is never indexed a second time
+        created = connection.execute(
+            _posts.insert().returning(_posts.c.id, _posts.c.title, _posts.c.content), inserts).all()
+        if indexed:
+            search.index_posts(connection, created, new=True)
+    if updates:
+        connection.execute(
+            _posts.update().where(_posts.c.id == bindparam('_id')),
+            [{name: value for name, value in row.items() if name not in ('title', 'date_posted')}
+             for row in updates])
+        if indexed:
+            search.index_posts(connection, [(row['_id'], row['title'], row['content'])
+                                            for row in updates])
+    return len(inserts), len(updates), skipped
+
+
+def import_records(engine, records, batch_size=1000, on_conflict='update', progress=None):
+    """Import an iterable of post dicts, one transaction per batch.
+
+    ``progress(inserted, updated, skipped)`` is called after each commit.
+    Returns the final ``(inserted, updated, skipped)``.
+    """
+    inserted = updated = skipped = 0
+    for batch in _batches(records, batch_size):
+        with engine.begin() as connection:
+            counts = import_batch(connection, batch, on_conflict)
+        inserted, updated, skipped = (total + count for total, count
+                                      in zip((inserted, updated, skipped), counts))
+        if progress:
+            progress(inserted, updated, skipped)
+    return inserted, updated, skipped
@@ -0,0 +1,360 @@
+"""Server-side cache for fully rendered pages.
+
+Views opt in with ``@page_cache.cached(ttl=..., group=..., args=...)``.
+Entries are keyed on the path and the URL-encoded values of the query
+arguments listed in ``args``, the ones the view reads. A request carrying
+any other argument is passed through uncached, so made-up query strings
+cannot multiply the entries of a page. Every group has a generation
+number that is part of the key: purging a group bumps its generation, so
+entries rendered before the purge can never be served again, even if a
+slow request stores one afterwards. Streamed responses are
+stored once their last chunk has gone out.
+
+Two backends are available through ``PAGE_CACHE_BACKEND``:
+
+``memory``
+    An LRU dict inside each worker process. Fast, but purges only reach the
+    process that made the write.
+``filesystem``
+    One file per entry under ``PAGE_CACHE_DIR``, shared by every gunicorn
+    worker on the host, and at most ``PAGE_CACHE_MAX_FILES`` of them.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request, session
+
+from app.signals import page_cache_used, posts_changed
+
+
+class NullBackend:
+    def get(self, group, key):
+        return None
+
+    def set(self, group, key, value, ttl):
+        pass
+
+    def generation(self, group):
+        return '0'
+
+    def purge(self, group):
+        pass
+
+    def clear(self):
+        pass
+
+    def entry_count(self):
+        return 0
+
+
+class MemoryBackend:
+    """Per-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, group, key):
+        with self._lock:
+            item = self._entries.get((group, key))
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self._entries[(group, key)]
+                return None
+            self._entries.move_to_end((group, key))
+            return value
+
+    def set(self, group, key, value, ttl):
+        with self._lock:
+            self._entries[(group, key)] = (time.time() + ttl, value)
+            self._entries.move_to_end((group, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, group):
+        return str(self._generations.get(group, 0))
+
+    def purge(self, group):
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+            for entry in [entry for entry in self._entries if entry[0] == group]:
+                del self._entries[entry]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations = {group: gen + 1 for group, gen in self._generations.items()}
+
+    def entry_count(self):
+        return len(self._entries)
+
+
+class FileSystemBackend:
+    """Entries as files, shared by all processes on the host.
+
+    Writes go to a temporary file and are renamed into place, so readers
+    never see a partial entry. Each group's generation lives in a small
+    file that is replaced atomically on purge.
+
+    An entry's modification time is set to its expiry. Every tenth of
+    ``max_entries`` writes, a process sweeps the directory using only
+    ``stat``: expired entries are deleted, then those closest to expiry
+    until at most ``max_entries`` are left.
+    """
+
+    def __init__(self, directory, max_entries=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._sweep_every = max(1, (max_entries or 0) // 10)
+        self._writes = 0
+        self._sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, group, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, group, digest[:2], digest)
+
+    def _write_atomic(self, path, data, mtime=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(data)
+            if mtime is not None:
+                os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, group, key):
+        path = self._path(group, key)
+        try:
+            with open(path, 'rb') as handle:
+                expires, value = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires < time.time():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, group, key, value, ttl):
+        expires = time.time() + ttl
+        self._write_atomic(self._path(group, key), pickle.dumps((expires, value), pickle.HIGHEST_PROTOCOL),
+                           mtime=expires)
+        self._writes += 1
+        if self.max_entries and self._writes % self._sweep_every == 0:
+            self.sweep()
+
+    def sweep(self):
+        """Delete expired entries, then the soonest to expire beyond ``max_entries``."""
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0  # another thread of this process is sweeping
+        try:
+            now, live, removed = time.time(), [], 0
+            for root, _, files in os.walk(self.directory):
+                if root == self.directory:
+                    continue  # generation files
+                for name in files:
+                    if name.startswith('.tmp-'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        expires = os.stat(path).st_mtime
+                    except OSError:
+                        continue  # purged meanwhile
+                    if expires < now:
+                        removed += self._unlink(path)
+                    else:
+                        live.append((expires, path))
+            if self.max_entries and len(live) > self.max_entries:
+                live.sort()
+                for _, path in live[:len(live) - self.max_entries]:
+                    removed += self._unlink(path)
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return 0
+        return 1
+
+    def generation(self, group):
+        try:
+            with open(os.path.join(self.directory, f'{group}.generation')) as handle:
+                return handle.read()
+        except OSError:
+            return '0'
+
+    def purge(self, group):
+        self._write_atomic(os.path.join(self.directory, f'{group}.generation'),
+                           uuid.uuid4().hex.encode())
+        # Old entries are unreachable now; reclaim their space
+        group_dir = os.path.join(self.directory, group)
+        doomed = f'{group_dir}.purged-{uuid.uuid4().hex}'
+        try:
+            os.rename(group_dir, doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.generation'):
+                self.purge(name[:-len('.generation')])
+            elif os.path.isdir(os.path.join(self.directory, name)):
+                self.purge(name)
+
+    def entry_count(self):
+        return sum(len(files) for _, _, files in os.walk(self.directory)) - len(
+            [name for name in os.listdir(self.directory) if name.endswith('.generation')])
+
+
+# Headers that are specific to one response and must not be replayed
+_UNCACHED_HEADERS = {'set-cookie', 'date', 'content-length'}
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.default_ttl = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config['PAGE_CACHE_BACKEND']
+        if kind == 'memory':
+            self.backend = MemoryBackend(app.config['PAGE_CACHE_MAX_ENTRIES'])
+        elif kind == 'filesystem':
+            directory = app.config['PAGE_CACHE_DIR'] or os.path.join(app.instance_path, 'page-cache')
+            self.backend = FileSystemBackend(directory, app.config['PAGE_CACHE_MAX_FILES'])
+        elif kind in ('null', 'none', ''):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown PAGE_CACHE_BACKEND: {kind!r}')
+        self.default_ttl = app.config['PAGE_CACHE_DEFAULT_TTL']
+        app.extensions['page_cache'] = self
+        posts_changed.connect(self._purge_blog, app, weak=False)
+
+    def _purge_blog(self, sender, **extra):
+        self.purge('blog')
+
+    def purge(self, group):
+        self.backend.purge(group)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Hits and misses per group from the Prometheus counters, and the entry count."""
+        from app import metrics
+
+        groups = {}
+        for (group, result), count in metrics.page_cache_totals().items():
+            groups.setdefault(group, {'hit': 0, 'miss': 0})[result] = int(count)
+        for counts in groups.values():
+            total = counts['hit'] + counts['miss']
+            counts['hit_ratio'] = round(counts['hit'] / total, 4) if total else 0.0
+        return {'groups': groups, 'entries': self.backend.entry_count()}
+
+    def make_key(self, group, args=()):
+        query = urlencode(sorted((name, value) for name, value in request.args.items(multi=True)
+                                 if name in args))
+        return '|'.join((
+            current_app.config['BUILD_VERSION'],
+            self.backend.generation(group),
+            request.path,
+            query,
+        ))
+
+    @staticmethod
+    def _is_cacheable_request(args):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        # Arguments the view ignores would only add entries for the same page
+        if any(name not in args for name in request.args):
+            return False
+        # Pages showing flashed messages are personal
+        if current_app.config['SESSION_COOKIE_NAME'] in request.cookies:
+            # A membership test does not mark the session as accessed
+            return '_flashes' not in session
+        return True
+
+    @staticmethod
+    def _is_cacheable_response(response):
+        return (response.status_code == 200
+                and 'Set-Cookie' not in response.headers
+                and not session.accessed)
+
+    def _store_when_complete(self, chunks, group, key, status, headers, ttl):
+        # Streamed pages are stored once the last chunk went out; a client
+        # that disconnects early (GeneratorExit) leaves nothing behind
+        body = []
+        for chunk in chunks:
+            body.append(chunk if isinstance(chunk, bytes) else chunk.encode())
+            yield chunk
+        self.backend.set(group, key, (status, headers, b''.join(body)), ttl)
+
+    def cached(self, ttl=None, group='pages', args=()):
+        """Cache a view's rendered response for ``ttl`` seconds.
+
+        ``args`` names the query arguments the view reads; they are part of
+        the key, and requests with any other argument are not cached.
+        """
+        args = frozenset(args)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if not self._is_cacheable_request(args):
+                    return view(**kwargs)
+
+                key = self.make_key(group, args)
+                entry = self.backend.get(group, key)
+                if entry is not None:
+                    page_cache_used.send(current_app._get_current_object(), group=group, result='hit')
+                    status, headers, body = entry
+                    response = current_app.response_class(body, status=status, headers=headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                page_cache_used.send(current_app._get_current_object(), group=group, result='miss')
+                response = current_app.make_response(view(**kwargs))
+                if self._is_cacheable_response(response):
+                    headers = [(name, value) for name, value in response.headers
+                               if name.lower() not in _UNCACHED_HEADERS]
+                    if response.is_streamed:
+                        response.response = self._store_when_complete(
+                            response.response, group, key, response.status_code, headers,
+                            ttl or self.default_ttl)
+                    else:
+                        self.backend.set(group, key, (response.status_code, headers, response.get_data()),
+                                         ttl or self.default_ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+page_cache = PageCache()
@@ -0,0 +1,125 @@
+"""The services catalog, loaded once from ``app/data/services.json``.
+
+The file is read and validated when the app is created. A malformed
+catalog stops the app from starting, rather than breaking the services
+page at request time. It becomes a tree of namedtuples that views share
+and cannot change.
+
+Everything derived from it is computed once per catalog version: the JSON
+served at ``/services/api`` and its ETag at load time, and the HTML card
+for each service on first use (it needs a request context for
+``url_for``). ``version`` in the file is the format version. Bump it if
+the structure changes.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from flask import current_app, render_template
+from markupsafe import Markup
+
+FORMAT_VERSION = 1
+COLORS = ('primary', 'secondary', 'success', 'danger', 'warning', 'info', 'light', 'dark')
+
+Plan = namedtuple('Plan', ['name', 'price', 'period', 'features'])
+Service = namedtuple('Service', ['id', 'title', 'icon', 'color', 'description', 'features', 'plans'])
+Catalog = namedtuple('Catalog', ['version', 'services', 'json', 'etag'])
+
+
+class CatalogError(ValueError):
+    """The catalog file is missing a field or has one of the wrong type.
+
+    The message starts with the path of the field, e.g. ``services[2].plans[0].price``.
+    """
+
+
+def _path(where, name):
+    return f'{where}.{name}' if where else name
+
+
+def _field(data, name, where, type_=str, required=True):
+    value = data.get(name)
+    if value is None and not required:
+        return type_()
+    if not isinstance(value, type_) or (type_ is str and required and not value):
+        expected = {str: 'non-empty string' if required else 'string', list: 'list'}[type_]
+        raise CatalogError(f'{_path(where, name)}: must be a {expected}')
+    return value
+
+
+def _strings(data, name, where):
+    values = _field(data, name, where, list)
+    if not all(isinstance(value, str) and value for value in values):
+        raise CatalogError(f'{_path(where, name)}: must be a list of non-empty strings')
+    return tuple(values)
+
+
+def parse(document):
+    """Validate a decoded catalog document and build the immutable catalog."""
+    if not isinstance(document, dict) or document.get('version') != FORMAT_VERSION:
+        raise CatalogError(f'expected an object with "version": {FORMAT_VERSION}')
+    services, seen = [], set()
+    for index, raw in enumerate(_field(document, 'services', '', list)):
+        where = f'services[{index}]'
+        if not isinstance(raw, dict):
+            raise CatalogError(f'{where}: must be an object')
+        service_id = _field(raw, 'id', where)
+        if service_id in seen:
+            raise CatalogError(f'{where}.id: duplicate "{service_id}"')
+        seen.add(service_id)
+        title, icon, color = (_field(raw, name, where) for name in ('title', 'icon', 'color'))
+        if color not in COLORS:
+            raise CatalogError(f'{where}.color: must be one of {", ".join(COLORS)}, not "{color}"')
+        plans = []
+        for plan_index, plan in enumerate(_field(raw, 'plans', where, list, required=False)):
+            plan_where = f'{where}.plans[{plan_index}]'
+            if not isinstance(plan, dict):
+                raise CatalogError(f'{plan_where}: must be an object')
+            plans.append(Plan(_field(plan, 'name', plan_where), _field(plan, 'price', plan_where),
+                              _field(plan, 'period', plan_where, required=False),
+                              _strings(plan, 'features', plan_where)))
+        services.append(Service(service_id, title, icon, color, _field(raw, 'description', where),
+                                _strings(raw, 'features', where), tuple(plans)))
+
+    payload = {
+        'version': FORMAT_VERSION,
+        'services': [dict(service._asdict(), plans=[plan._asdict() for plan in service.plans])
+                     for service in services],
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+    return Catalog(FORMAT_VERSION, tuple(services), encoded, hashlib.sha1(encoded).hexdigest()[:20])
+
+
+def load(path):
+    try:
+        with open(path, encoding='utf-8') as handle:
+            document = json.load(handle)
+    except (OSError, ValueError) as exc:
+        raise CatalogError(f'{path}: {exc}') from exc
+    try:
+        return parse(document)
+    except CatalogError as exc:
+        raise CatalogError(f'{path}: {exc}') from None
+
+
+def get():
+    return current_app.extensions['catalog']
+
+
+def service_cards():
+    """The rendered card of every service; rendered once per catalog version."""
+    catalog = get()
+    cache = current_app.extensions.setdefault('catalog_cards', {})
+    if catalog.etag in cache and not current_app.jinja_env.auto_reload:
+        return cache[catalog.etag]
+    cards = tuple(Markup(render_template('services/_service.html', service=service))
+                  for service in catalog.services)
+    cache.clear()
+    cache[catalog.etag] = cards
+    return cards
+
+
+def init_app(app):
+    path = app.config['SERVICES_CATALOG'] or os.path.join(app.root_path, 'data', 'services.json')
+    app.extensions['catalog'] = load(path)
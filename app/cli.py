@@ -0,0 +1,376 @@
+"""Maintenance commands, available as ``flask <group> <command>``."""
+import click
+from flask.cli import AppGroup, with_appcontext
+
+db_cli = AppGroup('db', help='Apply and check schema migrations.')
+blog_cli = AppGroup('blog', help='Import, export and maintain blog posts.')
+search_cli = AppGroup('search', help='Manage the blog full-text search index.')
+outbox_cli = AppGroup('outbox', help='Deliver and inspect queued contact emails.')
+cache_cli = AppGroup('cache', help='Inspect and purge the rendered page cache.')
+assets_cli = AppGroup('assets', help='Build fingerprinted, precompressed static assets.')
+templates_cli = AppGroup('templates', help='Precompile the Jinja templates.')
+leads_cli = AppGroup('leads', help='Export and report on contact form leads.')
+profile_cli = AppGroup('profile', help='Profile requests in production.')
+queries_cli = AppGroup('queries', help='Check SQL query budgets.')
+
+
+@db_cli.command('upgrade')
+def upgrade_db():
+    """Apply every pending schema migration."""
+    from app import db, schema
+
+    with db.engine.begin() as connection:
+        ran = schema.upgrade(connection)
+    for version, description in ran:
+        click.echo(f'Applied {version:>3}  {description}')
+    click.echo('Schema is up to date.' if not ran else f'Applied {len(ran)} migrations.')
+
+
+@db_cli.command('check')
+def check_db():
+    """Exit with status 1 if any migration is pending."""
+    from app import db, schema
+
+    with db.engine.connect() as connection:
+        missing = schema.pending(connection)
+    for version, description in missing:
+        click.echo(f'Pending {version:>3}  {description}')
+    if missing:
+        raise click.ClickException(f'{len(missing)} migrations pending; run `flask db upgrade`.')
+    click.echo('Schema is up to date.')
+
+
+@blog_cli.command('backfill')
+@click.option('--all', 'everything', is_flag=True,
+              help='Re-derive every post, e.g. after changing the renderer.')
+def backfill_posts(everything):
+    """Store rendered HTML, excerpt, reading time and slug for posts."""
+    from flask import current_app
+    from app import content, db
+    from app.signals import posts_changed
+
+    with db.engine.begin() as connection:
+        count = content.backfill(connection, everything=everything)
+    if count:
+        posts_changed.send(current_app._get_current_object())
+    click.echo(f'Updated {count} posts.')
+
+
+def _format_for(file, fmt):
+    if fmt:
+        return fmt
+    return 'csv' if getattr(file, 'name', '').endswith('.csv') else 'jsonl'
+
+
+@blog_cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']),
+              help='Input format (default: from the file name, else jsonl).')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction.')
+@click.option('--on-conflict', type=click.Choice(['update', 'skip']), default='update', show_default=True,
+              help='What to do with rows whose (title, date_posted) already exists.')
+def import_posts(file, fmt, batch_size, on_conflict):
+    """Import posts from a JSON Lines or CSV file ('-' for stdin)."""
+    import time
+    from flask import current_app
+    from app import bulk, db
+    from app.signals import posts_changed
+
+    records = bulk.read_csv(file) if _format_for(file, fmt) == 'csv' else bulk.read_jsonl(file)
+    started = time.perf_counter()
+
+    def progress(inserted, updated, skipped):
+        done = inserted + updated + skipped
+        if done // batch_size % 50 == 0:
+            click.echo(f'{done} rows, {done / (time.perf_counter() - started):.0f} rows/s', err=True)
+
+    try:
+        inserted, updated, skipped = bulk.import_records(db.engine, records, batch_size, on_conflict,
+                                                         progress)
+    except ValueError as exc:
+        raise click.ClickException(f'Import stopped, earlier batches were kept: {exc}')
+    finally:
+        # Even a failed import may have committed batches
+        posts_changed.send(current_app._get_current_object())
+    elapsed = time.perf_counter() - started
+    total = inserted + updated + skipped
+    click.echo(f'Inserted {inserted}, updated {updated}, skipped {skipped} in {elapsed:.1f}s '
+               f'({total / elapsed if elapsed else 0:.0f} rows/s).', err=True)
+
+
+@blog_cli.command('export')
+@click.argument('file', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']),
+              help='Output format (default: from the file name, else jsonl).')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per query.')
+def export_posts(file, fmt, batch_size):
+    """Export every post as JSON Lines or CSV (default: stdout)."""
+    import time
+    from app import bulk, db
+
+    started = time.perf_counter()
+    with db.engine.connect() as connection:
+        rows = bulk.export_rows(connection, batch_size)
+        count = bulk.write_csv(rows, file) if _format_for(file, fmt) == 'csv' else bulk.write_jsonl(rows, file)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Exported {count} posts in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f} rows/s).',
+               err=True)
+
+
+@search_cli.command('rebuild')
+def rebuild_search_index():
+    """Rebuild the FTS5 index from every row in the post table."""
+    from app import search
+
+    if not search.is_available():
+        raise click.ClickException('Full-text search requires an SQLite database.')
+    count = search.rebuild_index()
+    click.echo(f'Indexed {count} posts.')
+
+
+@outbox_cli.command('run')
+@click.option('--once', is_flag=True, help='Exit once nothing is due instead of polling.')
+def run_outbox(once):
+    """Deliver queued emails over one reused SMTP connection."""
+    from app import outbox
+
+    totals = outbox.run_worker(once=once)
+    click.echo(f"Sent {totals['sent']}, retrying {totals['retried']}, dead {totals['dead']}, "
+               f"deferred {totals['deferred']}.")
+
+
+@outbox_cli.command('status')
+def outbox_status():
+    """Show how many messages are in each state."""
+    from app import outbox
+
+    counts = outbox.status_counts()
+    for status in ('pending', 'sending', 'sent', 'dead'):
+        click.echo(f'{status:<8} {counts.get(status, 0)}')
+
+
+@outbox_cli.command('requeue')
+def requeue_outbox():
+    """Retry every dead-lettered message from scratch."""
+    from app import outbox
+
+    click.echo(f'Requeued {outbox.requeue_dead()} messages.')
+
+
+@cache_cli.command('stats')
+def cache_stats():
+    """Show the page cache's entries, and its hits and misses per group."""
+    from app import metrics
+    from app.cache import page_cache
+
+    stats = page_cache.stats()
+    click.echo(f"backend  {type(page_cache.backend).__name__}")
+    click.echo(f"entries  {stats['entries']}")
+    if not metrics.MULTIPROC_DIR:
+        click.echo('Set PROMETHEUS_MULTIPROC_DIR as in the service unit to count the workers\' hits and misses.')
+        return
+    click.echo(f"\n{'group':<10} {'hits':>10} {'misses':>10} {'hit ratio':>10}")
+    for group, counts in sorted(stats['groups'].items()):
+        click.echo(f"{group:<10} {counts['hit']:>10} {counts['miss']:>10} {counts['hit_ratio']:>10.1%}")
+
+
+@cache_cli.command('clear')
+@click.option('--group', help='Only purge one group, e.g. "blog" or "pages".')
+def clear_cache(group):
+    """Purge cached pages."""
+    from app.cache import page_cache
+
+    if group:
+        page_cache.purge(group)
+    else:
+        page_cache.clear()
+    click.echo('Page cache purged.')
+
+
+_DAY = click.DateTime(formats=['%Y-%m-%d'])
+
+
+@leads_cli.command('export')
+@click.argument('file', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--since', type=_DAY, help='First day to include (YYYY-MM-DD, UTC).')
+@click.option('--until', type=_DAY, help='Last day to include (YYYY-MM-DD, UTC).')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per query.')
+def export_leads(file, since, until, batch_size):
+    """Export leads as CSV (default: stdout), oldest first."""
+    from app import db, leads
+
+    with db.engine.connect() as connection:
+        count = leads.write_csv(leads.export_rows(connection, since and since.date(), until and until.date(),
+                                                  batch_size), file)
+    click.echo(f'Exported {count} leads.', err=True)
+
+
+@leads_cli.command('stats')
+@click.option('--since', type=_DAY, help='First day to include (YYYY-MM-DD, UTC).')
+@click.option('--until', type=_DAY, help='Last day to include (YYYY-MM-DD, UTC).')
+@click.option('--by', 'segment', default='total', show_default=True,
+              type=click.Choice(['total', 'language', 'proficiency_level', 'it_services',
+                                 'web_development_services', 'tech_training_services']),
+              help='Count leads per value of this field.')
+@click.option('--daily', is_flag=True, help='One line per day instead of totals for the range.')
+def lead_stats(since, until, segment, daily):
+    """Count leads from the daily aggregates."""
+    from app import db, leads
+
+    since, until = since and since.date(), until and until.date()
+    with db.engine.connect() as connection:
+        if daily:
+            for day, value, count in leads.daily_counts(connection, since, until, segment):
+                click.echo(f'{day}  {value or segment:<32} {count:>7}')
+        else:
+            for value, count in leads.totals(connection, since, until, segment):
+                click.echo(f'{value or segment:<32} {count:>7}')
+
+
+@leads_cli.command('recount')
+def recount_leads():
+    """Rebuild the daily aggregates from the lead table."""
+    from app import db, leads
+
+    with db.engine.begin() as connection:
+        count = leads.recount(connection)
+    click.echo(f'Recounted {count} leads.')
+
+
+@assets_cli.command('build')
+@with_appcontext
+def build_assets():
+    """Minify, fingerprint and precompress app/static and public into dist/."""
+    from flask import current_app
+    from app import assets
+
+    manifest = assets.build(current_app._get_current_object())
+    for endpoint, files in manifest.items():
+        click.echo(f'{endpoint:<8} {len(files)} files')
+    if assets.brotli is None:
+        click.echo('brotli is not installed; only .gz variants were written.')
+
+
+@assets_cli.command('vendor')
+@click.option('--refresh', is_flag=True, help='Download again even if the files exist.')
+@click.option('--pin', is_flag=True, help='Accept and record the hash of files not pinned yet.')
+@click.option('--check', is_flag=True, help='Only verify the committed files against the lock, offline.')
+@with_appcontext
+def vendor_assets(refresh, pin, check):
+    """Download (or --check) the pinned Bootstrap and Bootstrap Icons files."""
+    from flask import current_app
+    from app import assets
+
+    app = current_app._get_current_object()
+    if check:
+        problems = assets.check_vendor(app)
+        for name, problem in problems.items():
+            click.echo(f'{name}: {problem}')
+        if problems:
+            raise click.ClickException(f'{len(problems)} vendored files do not match {assets.VENDOR_LOCK}.')
+        click.echo(f'All {len(assets.VENDOR_ASSETS)} vendored files match {assets.VENDOR_LOCK}.')
+        return
+    try:
+        fetched = assets.vendor(app, refresh=refresh, pin=pin)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f'Vendored {len(fetched)} files into app/static/{assets.VENDOR_DIR}; commit them with the lock.')
+
+
+@templates_cli.command('compile')
+@click.option('--clear', is_flag=True, help='Empty the bytecode cache first.')
+@with_appcontext
+def compile_templates(clear):
+    """Compile every template into the bytecode cache; fail on syntax errors."""
+    from flask import current_app
+    from app import templating
+
+    app = current_app._get_current_object()
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        click.echo('TEMPLATE_BYTECODE_CACHE is off; only checking the templates.')
+    elif clear:
+        cache.clear()
+    names, errors = templating.compile_all(app)
+    for name, error in errors.items():
+        click.echo(f'{name}: {error}', err=True)
+    if errors:
+        raise click.ClickException(f'{len(errors)} of {len(names) + len(errors)} templates do not compile.')
+    click.echo(f'Compiled {len(names)} templates.')
+
+
+@profile_cli.command('sign')
+@click.argument('path')
+@click.option('--ttl', default=300, show_default=True, help='Seconds the header stays valid.')
+@with_appcontext
+def sign_profile(path, ttl):
+    """Print an X-Profile header that profiles requests to PATH."""
+    import time
+    from flask import current_app
+    from app import profiling
+
+    secret = current_app.config['PROFILE_SECRET']
+    if not secret:
+        raise click.ClickException('PROFILE_SECRET is not set.')
+    click.echo(f'{profiling.HEADER}: {profiling.sign(secret, path, time.time() + ttl)}')
+
+
+@queries_cli.command('check')
+@with_appcontext
+def check_queries():
+    """Count the queries of every GET in QUERY_BUDGETS; fail if one is over or repeats itself."""
+    from flask import current_app
+    from app import queries
+
+    results = queries.check(current_app._get_current_object())
+    failed = 0
+    for result in results:
+        over = result.count > result.budget
+        failed += over or bool(result.repeats)
+        click.echo(f"{'OVER' if over else 'ok':<5} {result.key:<22} {result.count:>3} of {result.budget:<3} "
+                   f'{result.duration * 1000:>7.2f} ms  {result.url}')
+        for repeat in result.repeats:
+            click.echo(f'      {queries.describe_repeat(repeat)}: {repeat.statement}')
+    checked = {result.key for result in results}
+    for key in current_app.config['QUERY_BUDGETS']:
+        if key not in checked:
+            click.echo(f"{'skip':<5} {key:<22} only checked at runtime")
+    if failed:
+        raise click.ClickException(f'{failed} of {len(results)} endpoints are over budget or repeat queries.')
+    click.echo(f'{len(results)} endpoints within their query budgets.')
+
+
+@click.command('freeze')
+@click.option('--output', type=click.Path(file_okay=False),
+              help='Target directory (default: FREEZE_DIR or instance/frozen).')
+@click.option('--no-gzip', is_flag=True, help='Skip the pre-compressed .gz copies.')
+@click.option('--upstream', default='http://127.0.0.1:8000', show_default=True,
+              help='gunicorn address for the generated nginx snippet.')
+@with_appcontext
+def freeze_site(output, no_gzip, upstream):
+    """Export every GET page as static files for nginx."""
+    import os
+    from flask import current_app
+    from app import freeze
+
+    app = current_app._get_current_object()
+    output = output or app.config['FREEZE_DIR'] or os.path.join(app.instance_path, 'frozen')
+    summary = freeze.freeze(app, output, compress=not no_gzip)
+    snippet = freeze.write_nginx_snippet(output, upstream)
+    click.echo(f"Froze {summary['pages']} pages into {output}: {summary['written']} files written, "
+               f"{summary['unchanged']} unchanged, {summary['removed']} removed.")
+    click.echo(f'nginx snippet: {snippet}')
+
+
+def register(app):
+    app.cli.add_command(db_cli)
+    app.cli.add_command(blog_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(cache_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(templates_cli)
+    app.cli.add_command(leads_cli)
+    app.cli.add_command(profile_cli)
+    app.cli.add_command(queries_cli)
+    app.cli.add_command(freeze_site)
@@ -0,0 +1,122 @@
+"""Conditional GET support: ETag / Last-Modified validators and 304s.
+
+Views opt in with the :func:`conditional` decorator. Validators are
+computed *before* the view runs, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered without rendering anything.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from jinja2 import meta
+from werkzeug.http import is_resource_modified
+
+from app import db
+from app.database import read_session
+from app.models import Post
+
+
+def _template_sources(name, seen):
+    """Yield the source of ``name`` and of every template it extends or includes."""
+    if name in seen:
+        return
+    seen.add(name)
+    env = current_app.jinja_env
+    source, _, _ = env.loader.get_source(env, name)
+    yield source
+    for parent in meta.find_referenced_templates(env.parse(source)):
+        if parent:
+            yield from _template_sources(parent, seen)
+
+
+def template_etag(*names):
+    """ETag derived from the build version and the full template chain.
+
+    Digests are cached per process unless templates auto-reload, since
+    templates only change with a deploy.
+    """
+    cache = current_app.extensions.setdefault('template_etags', {})
+    if names in cache and not current_app.jinja_env.auto_reload:
+        return cache[names]
+
+    digest = hashlib.sha1(current_app.config['BUILD_VERSION'].encode())
+    seen = set()
+    for name in names:
+        for source in _template_sources(name, seen):
+            digest.update(source.encode())
+    cache[names] = digest.hexdigest()[:20]
+    return cache[names]
+
+
+def combine_etag(*parts):
+    """Fold several version markers into one short opaque ETag."""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def _blog_version():
+    """``(newest updated_at, post count)``, queried once per request.
+
+    Both blog validators come from it, and a view may ask again for its own
+    use (the feed's ``<updated>``).
+    """
+    if '_blog_version' not in g:
+        g._blog_version = tuple(read_session.query(db.func.max(Post.updated_at), db.func.count()).one())
+    return g._blog_version
+
+
+def blog_last_modified():
+    """When any post last changed; an index-only lookup on ``ix_post_updated_at``."""
+    return _blog_version()[0]
+
+
+def blog_etag(*names):
+    """ETag for pages listing posts: template chain plus the newest change.
+
+    The post count covers deletions, which leave no newer timestamp behind.
+    """
+    return combine_etag(template_etag(*names), *_blog_version())
+
+
+def _has_pending_flashes():
+    # Only open the session when the client actually sent one
+    if current_app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+        return False
+    # A membership test does not mark the session as accessed
+    return '_flashes' in session
+
+
+def _apply_validators(response, etag, last_modified):
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Caches may store the page but must revalidate it on every use
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(etag=None, last_modified=None):
+    """Answer GETs with 304 when the client's copy is still current.
+
+    ``etag`` and ``last_modified`` are callables taking the view's keyword
+    arguments and returning the validator (or ``None`` to skip it).
+    Responses carrying flashed messages are never treated as cacheable.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_pending_flashes():
+                return view(**kwargs)
+
+            tag = etag(**kwargs) if etag else None
+            modified = last_modified(**kwargs) if last_modified else None
+            if (tag or modified) and not is_resource_modified(
+                    request.environ, etag=tag, last_modified=modified):
+                return _apply_validators(current_app.response_class(status=304), tag, modified)
+
+            response = make_response(view(**kwargs))
+            if response.status_code == 200:
+                _apply_validators(response, tag, modified)
+            return response
+        return wrapper
+    return decorator
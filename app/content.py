@@ -0,0 +1,140 @@
+"""Helpers that derive display fields from a post's raw content.
+
+Everything here runs once, when a post is written (see ``_derive_fields``
+in ``app.models``), or in bulk through ``flask blog backfill``. Pages only
+ever read the stored results.
+"""
+import math
+import re
+import unicodedata
+
+from markupsafe import escape
+from sqlalchemy import text
+
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+SLUG_LENGTH = 80
+
+# Leading markup used by post bodies: headings, list bullets, numbered items
+_LINE_MARKUP_RE = re.compile(r'^\s*(#{1,6}\s+|[-*]\s+|\d+\.\s+)')
+_INLINE_MARKUP_RE = re.compile(r'(\*\*|__|\*|`)')
+
+_HEADING_RE = re.compile(r'^(#{1,3}) (.*)$')
+_LIST_ITEM_RE = re.compile(r'^(?:(-)|\d+\.) (.*)$')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_CODE_RE = re.compile(r'`([^`]+)`')
+
+_HEADING_CLASSES = {1: 'mt-4 mb-3', 2: 'mt-4 mb-3 text-primary', 3: 'mt-3 mb-2 text-secondary'}
+
+
+def plain_words(content):
+    """The words of a post body with line and inline markup removed."""
+    words = []
+    for line in (content or '').splitlines():
+        line = line.strip()
+        if not line or line.startswith('---'):
+            continue
+        line = _LINE_MARKUP_RE.sub('', line)
+        words.extend(_INLINE_MARKUP_RE.sub('', line).split())
+    return words
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH, words=None):
+    """Plain-text summary of a post body, cut on a word boundary."""
+    text_ = ' '.join(plain_words(content) if words is None else words)
+    if len(text_) <= length:
+        return text_
+    cut = text_.rfind(' ', 0, length)
+    return text_[:cut if cut > 0 else length].rstrip(' ,;:.') + '…'
+
+
+def slugify(title, length=SLUG_LENGTH):
+    """ASCII, lowercase, hyphen-separated form of a title for URLs."""
+    ascii_title = unicodedata.normalize('NFKD', title or '').encode('ascii', 'ignore').decode()
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_title.lower()).strip('-')
+    return slug[:length].rstrip('-') or 'post'
+
+
+def _inline(line):
+    html = str(escape(line))
+    if '**' in html:
+        html = _BOLD_RE.sub(r'<strong>\1</strong>', html)
+    if '`' in html:
+        html = _CODE_RE.sub(r'<code>\1</code>', html)
+    return html
+
+
+def render_html(content):
+    """HTML for a post body.
+
+    Headings (``#`` to ``###``), ``-`` and numbered list items, ``---``
+    rules, ``*italic*`` lines and paragraphs, with ``**bold**`` and
+    ```code``` inline. Consecutive list items share one ``<ul>``/``<ol>``.
+    """
+    html, open_list = [], None
+    for line in (content or '').split('\n'):
+        line = line.rstrip()
+        item = _LIST_ITEM_RE.match(line)
+        tag = ('ul' if item.group(1) else 'ol') if item else None
+        if open_list and tag != open_list:
+            html.append(f'</{open_list}>')
+            open_list = None
+        if item:
+            if not open_list:
+                html.append(f'<{tag} class="mb-3">')
+                open_list = tag
+            html.append(f'<li class="mb-2">{_inline(item.group(2))}</li>')
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            level = len(heading.group(1))
+            html.append(f'<h{level} class="{_HEADING_CLASSES[level]}">{_inline(heading.group(2))}</h{level}>')
+        elif line.startswith('---'):
+            html.append('<hr class="my-4">')
+        elif not line.strip():
+            html.append('<br>')
+        elif len(line) > 1 and line.startswith('*') and line.endswith('*') and not line.startswith('**'):
+            html.append(f'<p class="text-muted fst-italic">{_inline(line[1:-1])}</p>')
+        else:
+            html.append(f'<p class="mb-3">{_inline(line)}</p>')
+    if open_list:
+        html.append(f'</{open_list}>')
+    return '\n'.join(html)
+
+
+def derive_fields(title, content):
+    """Every stored field computed from a post's title and body."""
+    words = plain_words(content)
+    return {
+        'content_html': render_html(content),
+        'excerpt': make_excerpt(content, words=words),
+        'word_count': len(words),
+        'reading_minutes': max(1, math.ceil(len(words) / WORDS_PER_MINUTE)),
+        'slug': slugify(title),
+    }
+
+
+def backfill(connection, everything=False, batch_size=500):
+    """Store derived fields for posts missing them (or for all posts).
+
+    Works on a plain connection in id order, so it suits migrations and
+    large tables alike. Returns the number of posts updated; the caller
+    announces the change (``posts_changed``), as it bypasses the ORM.
+    """
+    condition = '' if everything else 'AND content_html IS NULL'
+    last_id, updated = 0, 0
+    while True:
+        rows = connection.execute(text(
+            f'SELECT id, title, content FROM post WHERE id > :last_id {condition} ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': batch_size}).all()
+        if not rows:
+            return updated
+        connection.execute(
+            text('UPDATE post SET content_html = :content_html, excerpt = :excerpt, '
+                 'word_count = :word_count, reading_minutes = :reading_minutes, slug = :slug '
+                 'WHERE id = :id'),
+            [{'id': row.id, **derive_fields(row.title, row.content)} for row in rows],
+        )
+        updated += len(rows)
+        last_id = rows[-1].id
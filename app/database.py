@@ -0,0 +1,74 @@
+"""SQLite connection tuning and the read-only engine.
+
+Every connection to an SQLite database gets the pragmas in
+``SQLITE_PRAGMAS``: WAL journaling, so readers never wait for a writer,
+plus ``synchronous``, ``mmap_size``, ``cache_size`` and ``busy_timeout``.
+
+Pages that only read (the blog listing, post pages, search and their
+validators) go through :data:`read_session`. It is bound to a second engine
+that opens the same file read-only (``mode=ro`` plus ``query_only``), with
+its own pool. Writers (the contact form, CLI commands, the mail worker) keep
+using ``db.session``, so reads never queue behind them for a pooled
+connection and can never take a write lock by accident. On other databases
+both sessions share one engine.
+"""
+from flask import current_app
+from flask_sqlalchemy.session import _app_ctx_id
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+
+from app import db
+
+# Pragmas that a read-only connection cannot or need not set
+_WRITER_ONLY_PRAGMAS = {'journal_mode'}
+
+
+class ReadOnlySession(Session):
+    """Session bound to the current app's read-only engine."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        return current_app.extensions['read_engine']
+
+
+read_session = scoped_session(sessionmaker(class_=ReadOnlySession, autoflush=False),
+                              scopefunc=_app_ctx_id)
+
+
+def _pragma_listener(pragmas, read_only=False):
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if read_only and name in _WRITER_ONLY_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only = 1')
+        cursor.close()
+    return apply
+
+
+def read_only_url(url):
+    """The same SQLite file, opened read-only through a URI filename."""
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'})
+
+
+def init_app(app):
+    with app.app_context():
+        engine = db.engine
+    read_engine = engine
+
+    sqlite_file = engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+    if sqlite_file:
+        pragmas = app.config['SQLITE_PRAGMAS']
+        event.listen(engine, 'connect', _pragma_listener(pragmas))
+        if app.config['SQLITE_READ_ENGINE']:
+            # Opening one writer connection first switches the file to WAL,
+            # which a read-only connection cannot do by itself
+            if pragmas.get('journal_mode'):
+                engine.connect().close()
+            read_engine = create_engine(read_only_url(engine.url),
+                                        **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+            event.listen(read_engine, 'connect', _pragma_listener(pragmas, read_only=True))
+
+    app.extensions['read_engine'] = read_engine
+    app.teardown_appcontext(lambda exc: read_session.remove())
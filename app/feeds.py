@@ -0,0 +1,44 @@
+"""Sources for /sitemap.xml and the blog's Atom feed.
+
+Both documents only read a few narrow columns, never post bodies (the
+feed takes the stored HTML of its newest entries). Their views sit in the
+``blog`` page-cache group, so they are regenerated once after posts change
+and otherwise served from the cache or answered with a 304.
+"""
+from flask import current_app, url_for
+
+from app.database import read_session
+from app.models import Post
+
+
+def site_url(endpoint, **values):
+    """Absolute URL for ``endpoint``, based on SITE_URL when it is set."""
+    base = current_app.config['SITE_URL']
+    if base:
+        return base.rstrip('/') + url_for(endpoint, **values)
+    return url_for(endpoint, _external=True, **values)
+
+
+def static_pages():
+    """URLs of every GET route without arguments, across all blueprints."""
+    skip = set(current_app.config['SITEMAP_SKIP_ENDPOINTS'])
+    endpoints = {rule.endpoint for rule in current_app.url_map.iter_rules()
+                 if 'GET' in rule.methods and not rule.arguments and rule.endpoint not in skip}
+    return sorted(site_url(endpoint) for endpoint in endpoints)
+
+
+def sitemap_posts():
+    """``(url, updated_at)`` for every post, oldest first, streamed in batches."""
+    query = (read_session.query(Post.id, Post.slug, Post.updated_at)
+             .order_by(Post.id).yield_per(1000))
+    for post_id, slug, updated_at in query:
+        yield site_url('blog.post', post_id=post_id, slug=slug), updated_at
+
+
+def feed_posts(limit=None):
+    """The newest posts with the columns an Atom entry needs."""
+    return (read_session.query(Post.id, Post.title, Post.author, Post.slug, Post.date_posted,
+                               Post.updated_at, Post.excerpt, Post.content_html)
+            .order_by(Post.date_posted.desc(), Post.id.desc())
+            .limit(limit or current_app.config['FEED_POSTS'])
+            .all())
@@ -0,0 +1,210 @@
+"""Export the site as static files that nginx can serve without Python.
+
+``flask freeze`` renders every GET route without URL arguments, every URL
+produced by a registered generator (one per blog post), and every page
+reachable from those through pagination links. Each page is written as
+``<path>/index[?<query>].html`` with a pre-compressed ``.gz`` twin, plus an
+nginx snippet that serves the files directly and proxies anything else
+(the contact form, search, health checks) to gunicorn.
+
+Re-running the export only rewrites files whose content changed, so file
+mtimes, and the validators nginx derives from them, stay stable, and it
+removes files that earlier runs wrote but this run no longer produces.
+"""
+import gzip
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+from flask import url_for
+
+from app import db
+from app.models import Post
+
+MANIFEST_NAME = '.freeze-manifest.json'
+
+# Query strings that are safe to use verbatim in a file name
+SAFE_QUERY_RE = re.compile(r'^[A-Za-z0-9_=&-]+$')
+
+_HREF_RE = re.compile(r'href="([^"#]+)"')
+
+# Endpoint -> callable yielding url_for() keyword arguments
+url_generators = {}
+
+
+def generates(endpoint):
+    """Register a generator of URL arguments for a route with parameters."""
+    def decorator(fn):
+        url_generators[endpoint] = fn
+        return fn
+    return decorator
+
+
+@generates('blog.post')
+def _blog_posts():
+    for post_id, slug in db.session.query(Post.id, Post.slug).order_by(Post.id).yield_per(1000):
+        yield {'post_id': post_id, 'slug': slug}
+
+
+def output_path(url):
+    """Map a site URL onto the file nginx will look for."""
+    parts = urlsplit(url)
+    path = parts.path.strip('/')
+    last = path.rsplit('/', 1)[-1]
+    if '.' in last and not parts.query:
+        return path
+    # Mirrors nginx's "$is_args$args"
+    suffix = f'?{parts.query}' if parts.query else ''
+    return os.path.join(path, f'index{suffix}.html')
+
+
+def _seed_urls(app):
+    skip = set(app.config['FREEZE_SKIP_ENDPOINTS'])
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in skip or rule.endpoint == 'static':
+            continue
+        if not rule.arguments:
+            yield url_for(rule.endpoint)
+        elif rule.endpoint in url_generators:
+            for values in url_generators[rule.endpoint]():
+                yield url_for(rule.endpoint, **values)
+
+
+def _followed_links(url, html, follow_args):
+    """Pagination links on ``url`` that point back at the same path."""
+    path = urlsplit(url).path
+    for href in _HREF_RE.findall(html):
+        href = href.replace('&amp;', '&')
+        parts = urlsplit(href)
+        if parts.netloc or parts.path != path or not parts.query:
+            continue
+        names = {pair.split('=', 1)[0] for pair in parts.query.split('&')}
+        if names <= follow_args and SAFE_QUERY_RE.match(parts.query):
+            yield href
+
+
+def _write_if_changed(path, data):
+    try:
+        with open(path, 'rb') as handle:
+            if handle.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def freeze(app, output_dir, compress=True):
+    """Render the site into ``output_dir``. Returns a summary dict."""
+    output_dir = os.path.abspath(output_dir)
+    follow_args = set(app.config['FREEZE_FOLLOW_ARGS'])
+    client = app.test_client()
+
+    with app.test_request_context():
+        queue = list(dict.fromkeys(_seed_urls(app)))
+    seen = set(queue)
+    written, unchanged, produced = 0, 0, set()
+
+    while queue:
+        url = queue.pop(0)
+        response = client.get(url)
+        if response.status_code != 200:
+            app.logger.warning('Not freezing %s: HTTP %s', url, response.status_code)
+            continue
+        body = response.get_data()
+        relative = output_path(url)
+        files = [(relative, body)]
+        if compress:
+            files.append((f'{relative}.gz', gzip.compress(body, 9, mtime=0)))
+        for name, data in files:
+            produced.add(name)
+            if _write_if_changed(os.path.join(output_dir, name), data):
+                written += 1
+            else:
+                unchanged += 1
+
+        if response.mimetype == 'text/html':
+            for link in _followed_links(url, response.get_data(as_text=True), follow_args):
+                if link not in seen:
+                    seen.add(link)
+                    queue.append(link)
+
+    removed = _prune(output_dir, produced)
+    _write_if_changed(os.path.join(output_dir, MANIFEST_NAME),
+                      json.dumps(sorted(produced), indent=1).encode())
+    return {'pages': len(seen), 'written': written, 'unchanged': unchanged, 'removed': removed}
+
+
+def _prune(output_dir, produced):
+    """Delete files from the previous export that this one did not produce."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as handle:
+            previous = set(json.load(handle))
+    except (OSError, ValueError):
+        return 0
+    removed = 0
+    for name in previous - produced:
+        try:
+            os.unlink(os.path.join(output_dir, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+NGINX_TEMPLATE = """\
+# Generated by `flask freeze`. Include inside the site's server block, in
+# place of its catch-all "location /".
+#
+# Frozen pages are served straight from disk, gzip copies included.
+# Anything that was not exported (search, the contact form, health checks)
+# falls through to gunicorn.
+
+location / {{
+    root {root};
+    gzip_static on;
+    add_header Cache-Control "no-cache";
+
+    # /blog/?after=X is stored as blog/index?after=X.html
+    try_files $uri/index$is_args$args.html @zencrow_app;
+}}
+
+location ~ \\.(xml|txt)$ {{
+    root {root};
+    gzip_static on;
+    add_header Cache-Control "no-cache";
+    try_files $uri @zencrow_app;
+}}
+
+location /contact/ {{
+    proxy_pass {upstream};
+    proxy_set_header Host $host;
+    proxy_set_header X-Real-IP $remote_addr;
+    proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+    proxy_set_header X-Forwarded-Proto $scheme;
+    # Shared with the app's log records and gunicorn's access log
+    proxy_set_header X-Request-ID $request_id;
+}}
+
+location @zencrow_app {{
+    proxy_pass {upstream};
+    proxy_set_header Host $host;
+    proxy_set_header X-Real-IP $remote_addr;
+    proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+    proxy_set_header X-Forwarded-Proto $scheme;
+    # Shared with the app's log records and gunicorn's access log
+    proxy_set_header X-Request-ID $request_id;
+}}
+"""
+
+
+def write_nginx_snippet(output_dir, upstream='http://127.0.0.1:8000'):
+    path = os.path.join(os.path.abspath(output_dir), 'nginx-frozen.conf')
+    snippet = NGINX_TEMPLATE.format(root=os.path.abspath(output_dir), upstream=upstream)
+    _write_if_changed(path, snippet.encode())
+    return path
@@ -0,0 +1,175 @@
+"""Liveness and readiness probes with cached dependency checks.
+
+``/health/live`` only shows that the process answers requests.
+``/health/ready`` reports the checks registered here with :func:`check`.
+Each one runs in a background thread on its own interval and its last
+result is cached, so a probe costs a dictionary read no matter how often
+the load balancer asks, and never touches the database or the SMTP server
+itself.
+
+The checker thread starts in each worker at boot (gunicorn's
+``post_worker_init``, or the first request under other servers) after one
+synchronous run of the critical checks, so even the first probe gets an
+answer.
+
+A failing *critical* check makes the instance unready (HTTP 503). The
+others (mail) only mark it ``degraded``: the outbox holds mail while SMTP
+is down, so the site can keep serving. A result older than three
+intervals counts as failed, in case the checker thread got stuck.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+# name -> (fn, interval_seconds, critical); fn() returns (ok, detail)
+CHECKS = {}
+
+
+def check(name, interval, critical=True):
+    """Register ``fn()`` as a readiness check run every ``interval`` seconds."""
+    def decorator(fn):
+        CHECKS[name] = (fn, interval, critical)
+        return fn
+    return decorator
+
+
+@check('database', interval=10)
+def _database():
+    from app import db
+
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('SELECT 1')
+    return True, 'reachable'
+
+
+@check('migrations', interval=60)
+def _migrations():
+    from app import db, schema
+
+    with db.engine.connect() as connection:
+        missing = schema.pending(connection)
+    if missing:
+        return False, f"{len(missing)} pending: {', '.join(str(version) for version, _ in missing)}"
+    return True, 'up to date'
+
+
+@check('outbox', interval=30, critical=False)
+def _outbox():
+    from app import db
+    from app.database import read_session
+    from app.models import OutboxMessage
+
+    depth, oldest = read_session.query(db.func.count(), db.func.min(OutboxMessage.created_at)).filter(
+        OutboxMessage.status == OutboxMessage.PENDING).one()
+    age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+    limit = current_app.config['HEALTH_OUTBOX_MAX_PENDING']
+    return depth <= limit, f'{depth} pending (limit {limit}), oldest {age:.0f}s'
+
+
+@check('smtp', interval=60, critical=False)
+def _smtp():
+    config = current_app.config
+    if not (config['MAIL_USERNAME'] and config['MAIL_PASSWORD']):
+        return True, 'not configured'
+    address = (config['MAIL_SERVER'], config['MAIL_PORT'])
+    # Connect and read the greeting; no EHLO, no login
+    with socket.create_connection(address, timeout=config['HEALTH_SMTP_TIMEOUT']) as sock:
+        if address[1] == 465 or config['MAIL_USE_SSL']:
+            return True, f'{address[0]}:{address[1]} accepts connections'
+        greeting = sock.recv(512).decode(errors='replace').strip()
+    if not greeting.startswith('220'):
+        return False, f'unexpected greeting {greeting[:80]!r}'
+    return True, f'{address[0]}:{address[1]} ready'
+
+
+class Monitor:
+    """Runs the checks for one app in a daemon thread and caches the results."""
+
+    def __init__(self, app):
+        self.app = app
+        self.results = {}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        # Started per process so it lives in the worker, not a forking master
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                for name, (fn, _, critical) in CHECKS.items():
+                    if critical:
+                        self.results[name] = self.run_check(name, fn)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='health-checks', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        intervals = self.app.config['HEALTH_CHECK_INTERVALS']
+        # Checks ensure_running() just ran are next due an interval later
+        due = {name: self.results[name]['checked_at'] + intervals.get(name, interval) if name in self.results
+               else 0.0 for name, (_, interval, _) in CHECKS.items()}
+        while True:
+            now = time.monotonic()
+            for name, (fn, interval, _) in CHECKS.items():
+                if due[name] <= now:
+                    self.results[name] = self.run_check(name, fn)
+                    due[name] = time.monotonic() + intervals.get(name, interval)
+            time.sleep(max(0.1, min(due.values()) - time.monotonic()))
+
+    def run_check(self, name, fn):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                ok, detail = fn()
+        except Exception as exc:
+            # First line only; SQLAlchemy errors go on to quote the statement
+            ok, detail = False, f"{type(exc).__name__}: {str(exc).splitlines()[0] if str(exc) else ''}"
+        return {
+            'ok': bool(ok),
+            'detail': detail,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'checked_at': time.monotonic(),
+            'checked': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        }
+
+    def readiness(self):
+        """``(status, checks)``; status is 'ready', 'degraded', 'starting' or 'unready'."""
+        intervals = self.app.config['HEALTH_CHECK_INTERVALS']
+        now = time.monotonic()
+        status, checks = 'ready', {}
+        for name, (_, interval, critical) in CHECKS.items():
+            result = self.results.get(name)
+            if result is None:
+                checks[name] = {'ok': False, 'detail': 'not checked yet', 'critical': critical}
+                if critical and status != 'unready':
+                    status = 'starting'
+                continue
+            stale = now - result['checked_at'] > 3 * intervals.get(name, interval)
+            ok = result['ok'] and not stale
+            checks[name] = {
+                'ok': ok,
+                'critical': critical,
+                'detail': 'stale: ' + result['detail'] if stale else result['detail'],
+                'latency_ms': result['latency_ms'],
+                'checked': result['checked'],
+            }
+            if not ok:
+                status = 'unready' if critical else (status if status != 'ready' else 'degraded')
+        return status, checks
+
+
+def get(app):
+    return app.extensions['health']
+
+
+def init_app(app):
+    monitor = Monitor(app)
+    app.extensions['health'] = monitor
+    # Servers without a worker boot hook start it on the first request
+    app.before_request(monitor.ensure_running)
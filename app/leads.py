@@ -0,0 +1,114 @@
+"""Contact form leads: recording, CSV export and daily reports.
+
+Every valid contact form submission is stored as a :class:`~app.models.Lead`
+before its email is queued, so the structured fields survive whatever
+happens to the mail. Reports read ``lead_daily_count``, which the Lead
+mapper events keep current, and never the lead table itself. The export
+walks ``ix_lead_created_at_id`` one batch at a time, so it runs in
+constant memory however long the date range is.
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import delete, func, select, tuple_
+
+from app import db
+from app.models import Lead, LeadDailyCount, add_lead_counts, lead_count_keys
+
+FIELDS = ('id', 'created_at', 'name', 'email', 'subject', 'message') + Lead.SEGMENTS
+
+_leads = Lead.__table__
+_counts = LeadDailyCount.__table__
+
+
+def record(form):
+    """Add a Lead for a validated ContactForm. The caller commits the session."""
+    lead = Lead(**{name: getattr(form, name).data or None
+                   for name in ('name', 'email', 'subject', 'message') + Lead.SEGMENTS})
+    db.session.add(lead)
+    return lead
+
+
+def _day_range(since, until):
+    """``[since, until]`` as dates -> half-open datetime bounds."""
+    start = datetime.combine(since, time.min) if since else None
+    end = datetime.combine(until + timedelta(days=1), time.min) if until else None
+    return start, end
+
+
+# -- export ---------------------------------------------------------------
+
+def export_rows(connection, since=None, until=None, batch_size=1000):
+    """Yield leads created between the dates ``since`` and ``until`` (inclusive), oldest first."""
+    start, end = _day_range(since, until)
+    columns = [_leads.c[name] for name in FIELDS]
+    position = None
+    while True:
+        query = select(*columns).order_by(_leads.c.created_at, _leads.c.id).limit(batch_size)
+        if start:
+            query = query.where(_leads.c.created_at >= start)
+        if end:
+            query = query.where(_leads.c.created_at < end)
+        if position:
+            query = query.where(tuple_(_leads.c.created_at, _leads.c.id) > tuple_(*position))
+        rows = connection.execute(query).all()
+        if not rows:
+            return
+        yield from rows
+        position = (rows[-1].created_at, rows[-1].id)
+
+
+def write_csv(rows, stream):
+    writer = csv.writer(stream)
+    writer.writerow(FIELDS)
+    count = 0
+    for row in rows:
+        writer.writerow(value.isoformat(sep=' ', timespec='seconds') if isinstance(value, datetime) else value
+                        for value in row)
+        count += 1
+    return count
+
+
+# -- reports --------------------------------------------------------------
+
+def daily_counts(connection, since=None, until=None, segment='total'):
+    """``[(day, value, count)]`` from the daily aggregates, by day then value."""
+    query = select(_counts.c.day, _counts.c.value, _counts.c.count).where(
+        _counts.c.segment == segment, _counts.c.count > 0).order_by(_counts.c.day, _counts.c.value)
+    if since:
+        query = query.where(_counts.c.day >= since)
+    if until:
+        query = query.where(_counts.c.day <= until)
+    return connection.execute(query).all()
+
+
+def totals(connection, since=None, until=None, segment='total'):
+    """``[(value, count)]`` summed over the date range, most leads first."""
+    total = func.sum(_counts.c.count).label('total')
+    query = select(_counts.c.value, total).where(_counts.c.segment == segment).group_by(
+        _counts.c.value).having(total > 0).order_by(total.desc(), _counts.c.value)
+    if since:
+        query = query.where(_counts.c.day >= since)
+    if until:
+        query = query.where(_counts.c.day <= until)
+    return connection.execute(query).all()
+
+
+def recount(connection, batch_size=1000):
+    """Rebuild every daily aggregate from the lead table. Returns the leads counted."""
+    connection.execute(delete(_counts))
+    columns = [_leads.c.id, _leads.c.created_at] + [_leads.c[name] for name in Lead.SEGMENTS]
+    last_id, counted = 0, 0
+    while True:
+        rows = connection.execute(
+            select(*columns).where(_leads.c.id > last_id).order_by(_leads.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return counted
+        deltas = {}
+        for row in rows:
+            for key in lead_count_keys(row.created_at, row._mapping):
+                deltas[key] = deltas.get(key, 0) + 1
+        add_lead_counts(connection, deltas)
+        counted += len(rows)
+        last_id = rows[-1].id
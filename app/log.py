@@ -0,0 +1,244 @@
+"""Structured application logging that never blocks a request.
+
+``app.logger`` (and every ``app.*`` module logger under it) hands records
+to a bounded in-memory queue. A listener thread formats them as one JSON
+object per line and writes them to stderr, or to ``LOG_FILE``. A slow log
+sink therefore stalls the listener, not the worker serving the request.
+If the queue fills up, records are dropped and counted rather than
+waited on, and the next record that gets through reports how many were
+lost.
+
+Records logged during a request carry its ``request_id``, method, path
+and the milliseconds elapsed so far. The id is taken from an incoming
+``X-Request-ID`` header (nginx can set one) or generated, and it is sent
+back in the response, where the gunicorn access log picks it up. With
+``LOG_REQUESTS`` on, every request also ends with one ``app.request``
+record giving its status and duration.
+
+Secrets are redacted in the listener thread: the configured values of
+``LOG_REDACT_CONFIG`` keys, and the value of anything that looks like
+``password=...`` or ``"token": "..."``.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+_SECRET_NAME = r'[\w-]*(?:password|passwd|secret|token|api[_-]?key|authorization)[\w-]*'
+_SECRET_NAME_RE = re.compile(f'(?i)^{_SECRET_NAME}$')
+_SECRET_FIELD_RE = re.compile(
+    rf'''(?i)(["']?\b{_SECRET_NAME}["']?\s*[:=]\s*)'''
+    r'''((?:(?:Bearer|Basic|Token)\s+)?(?:"[^"]*"|'[^']*'|\S+))''')
+_REQUEST_ID_RE = re.compile(r'^[\w.:-]{1,64}$')
+
+# LogRecord attributes that are not extra fields
+_RESERVED = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class Redactor:
+    """Masks known secret values and ``key=value`` pairs with secret-looking keys."""
+
+    def __init__(self, secrets=()):
+        values = sorted({str(value) for value in secrets if value and len(str(value)) >= 4}, key=len,
+                        reverse=True)
+        self._values_re = re.compile('|'.join(map(re.escape, values))) if values else None
+
+    def __call__(self, text):
+        if self._values_re is not None:
+            text = self._values_re.sub('***', text)
+        return _SECRET_FIELD_RE.sub(r'\1***', text)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, extra fields included."""
+
+    def __init__(self, redact):
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': self.redact(record.getMessage()),
+            'pid': record.process,
+        }
+        for name, value in record.__dict__.items():
+            if name in _RESERVED or name.startswith('_'):
+                continue
+            if _SECRET_NAME_RE.match(name):
+                value = '***'
+            elif isinstance(value, str):
+                value = self.redact(value)
+            entry[name] = value
+        if record.exc_text:
+            entry['exception'] = self.redact(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """``LOG_FORMAT=text``: the Flask default line, with the request id when there is one."""
+
+    def __init__(self, redact):
+        super().__init__('[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
+        self.redact = redact
+
+    def format(self, record):
+        line = super().format(record)
+        request_id = getattr(record, 'request_id', None)
+        return self.redact(f'{line} [{request_id}]' if request_id else line)
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the current request's id, method, path and elapsed time to a record."""
+
+    def filter(self, record):
+        if has_request_context() and 'request_id' in g:
+            record.request_id = g.request_id
+            record.method = request.method
+            record.path = request.path
+            record.elapsed_ms = round((time.perf_counter() - g.request_started) * 1000, 2)
+        return True
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops instead of blocking, and runs its own listener.
+
+    The listener thread is started on first use in each process, so a
+    gunicorn worker forked from a preloaded master gets its own rather
+    than sharing one that only exists in the master.
+    """
+
+    def __init__(self, handlers, maxsize):
+        super().__init__(None)
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # The parent's queue and lock state may not survive the fork
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, *self.handlers,
+                                                            respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def prepare(self, record):
+        # Merge the message and render any traceback here, while the
+        # exception is still alive; the rest of the formatting happens in
+        # the listener thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            lost = logging.makeLogRecord({'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                          'msg': f'Log queue full, dropped {dropped} records'})
+            try:
+                self.queue.put_nowait(lost)
+            except queue.Full:
+                self.dropped += dropped
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._ensure_listener()
+        super().emit(record)
+
+    def close(self):
+        """Write out what is queued and stop this process's listener."""
+        with self._lock:
+            if self._pid == os.getpid() and self._listener is not None:
+                try:
+                    self._listener.stop()
+                except queue.Full:
+                    pass  # no room for the stop marker; the daemon thread ends with the process
+                self._listener, self._pid = None, None
+        super().close()
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+
+def _finish_request(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def _log_request(response):
+    if 'request_id' in g:
+        request_logger.info('%s %s %s', request.method, request.full_path.rstrip('?'), response.status_code,
+                            extra={'status': response.status_code,
+                                   'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 2)})
+    return response
+
+
+request_logger = logging.getLogger('app.request')
+
+
+def init_app(app):
+    config = app.config
+    redact = Redactor(config.get(key) for key in config['LOG_REDACT_CONFIG'])
+    if config['LOG_FILE']:
+        # Reopens the file after logrotate moves it
+        sink = logging.handlers.WatchedFileHandler(config['LOG_FILE'], encoding='utf-8')
+    else:
+        sink = logging.StreamHandler(sys.stderr)
+    sink.setFormatter(JsonFormatter(redact) if config['LOG_FORMAT'] == 'json' else TextFormatter(redact))
+
+    if config['LOG_QUEUE_SIZE'] > 0:
+        handler = AsyncQueueHandler([sink], config['LOG_QUEUE_SIZE'])
+    else:
+        # Synchronous, for debugging the logging itself
+        handler = sink
+    handler.addFilter(RequestContextFilter())
+
+    logger = app.logger
+    logger.removeHandler(default_handler)
+    # A second create_app() in the same process replaces the first one's handler
+    for existing in [h for h in logger.handlers if getattr(h, 'app_log', False)]:
+        logger.removeHandler(existing)
+        existing.close()
+    handler.app_log = True
+    logger.addHandler(handler)
+    logger.setLevel(config['LOG_LEVEL'])
+    logger.propagate = False
+
+    app.before_request(_start_request)
+    if config['LOG_REQUESTS']:
+        app.after_request(_log_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,170 @@
+"""Prometheus instrumentation, exposed at ``/metrics``.
+
+Recorded per request: duration by endpoint, method and status; the number
+of SQL queries and the time spent in them; the render time of every
+template; page cache hits and misses by group. The mail worker records the
+duration and outcome of every send.
+
+Under gunicorn every worker is a separate process, so samples go through
+prometheus_client's multiprocess mode: each process writes its values to
+memory-mapped files in ``PROMETHEUS_MULTIPROC_DIR``, and ``/metrics``
+merges them. The variable has to be set before this module is imported
+(the systemd units do it). Without it, metrics stay in-process, which is
+what the development server needs.
+"""
+import os
+import time
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.signals import mail_send_finished, page_cache_used
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,  # noqa: E402
+                               generate_latest, multiprocess, REGISTRY)
+
+REQUEST_DURATION = Histogram(
+    'zencrow_http_request_duration_seconds', 'Time spent handling a request.',
+    ['endpoint', 'method', 'status'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+DB_QUERIES = Histogram(
+    'zencrow_db_queries_per_request', 'SQL statements executed by one request.',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+DB_TIME = Histogram(
+    'zencrow_db_time_seconds', 'Time one request spent executing SQL.',
+    ['endpoint'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1))
+TEMPLATE_RENDER = Histogram(
+    'zencrow_template_render_seconds', 'Time spent rendering a template.',
+    ['template'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1))
+MAIL_SEND = Histogram(
+    'zencrow_mail_send_seconds', 'Time spent handing one email to the SMTP server.',
+    ['outcome'], buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+PAGE_CACHE = Counter(
+    'zencrow_page_cache_requests', 'Cacheable page requests, answered from the cache (hit) or not (miss).',
+    ['group', 'result'])
+
+
+def _endpoint():
+    return request.url_rule.endpoint if request.url_rule else 'none'
+
+
+def _before_request():
+    g._metrics = [time.perf_counter(), 0, 0.0]
+
+
+def _after_request(response):
+    state = g.pop('_metrics', None)
+    if state is not None:
+        started, queries, db_time = state
+        endpoint = _endpoint()
+        REQUEST_DURATION.labels(endpoint, request.method, response.status_code).observe(
+            time.perf_counter() - started)
+        DB_QUERIES.labels(endpoint).observe(queries)
+        DB_TIME.labels(endpoint).observe(db_time)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_metrics_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = g.get('_metrics') if has_request_context() else None
+    if state is not None:
+        state[1] += 1
+        state[2] += time.perf_counter() - conn.info['_metrics_started']
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('_metrics_templates', []).append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    stack = g.get('_metrics_templates') if has_request_context() else None
+    if stack:
+        TEMPLATE_RENDER.labels(template.name or 'string').observe(time.perf_counter() - stack.pop())
+
+
+def _mail_send_finished(sender, outcome, seconds, **extra):
+    MAIL_SEND.labels(outcome).observe(seconds)
+
+
+def _page_cache_used(sender, group, result, **extra):
+    PAGE_CACHE.labels(group, result).inc()
+
+
+def _registry():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def collect():
+    """Exposition text for this process, or for all of them in multiprocess mode."""
+    return generate_latest(_registry())
+
+
+def page_cache_totals():
+    """``{(group, result): count}`` of this process, or of every worker in multiprocess mode."""
+    totals = {}
+    for family in _registry().collect():
+        if family.name != 'zencrow_page_cache_requests':
+            continue
+        for sample in family.samples:
+            if sample.name.endswith('_total'):
+                key = (sample.labels['group'], sample.labels['result'])
+                totals[key] = totals.get(key, 0) + sample.value
+    return totals
+
+
+def metrics_view():
+    return collect(), 200, {'Content-Type': CONTENT_TYPE_LATEST, 'Cache-Control': 'no-store'}
+
+
+def prune_dead_processes(path=MULTIPROC_DIR):
+    """Delete value files left behind by processes that no longer exist.
+
+    Run by the gunicorn master on startup. Files of live processes (the
+    mail worker, for one) are kept.
+    """
+    if not path or not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        pid = name.rsplit('_', 1)[-1].split('.', 1)[0]
+        if not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            os.unlink(os.path.join(path, name))
+        except PermissionError:
+            pass
+
+
+def mark_process_dead(pid):
+    """Gunicorn ``child_exit`` hook: drop a dead worker's live gauges."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app, weak=False)
+    template_rendered.connect(_template_rendered, app, weak=False)
+    page_cache_used.connect(_page_cache_used, app, weak=False)
+    mail_send_finished.connect(_mail_send_finished, app, weak=False)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.add_url_rule('/metrics', endpoint='metrics', view_func=metrics_view)
@@ -1,12 +1,215 @@
 from datetime import datetime
+from itertools import chain
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 from app import db
+from app.content import derive_fields
+from app.signals import posts_changed
 
 class Post(db.Model):
+    __table_args__ = (
+        # Serves the newest-first listing and its keyset pagination
+        db.Index('ix_post_date_posted_id', 'date_posted', 'id'),
+        # "When did any post last change", for validators, the feed and the sitemap
+        db.Index('ix_post_updated_at', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200))
     content = db.Column(db.Text)
     author = db.Column(db.String(100))
     date_posted = db.Column(db.DateTime, default=datetime.utcnow)
+    excerpt = db.Column(db.String(300))
+    # Set when the title or content changes; starts out as date_posted
+    updated_at = db.Column(db.DateTime)
+    # Derived from title and content when the post is written; see app.content
+    content_html = db.Column(db.Text)
+    word_count = db.Column(db.Integer)
+    reading_minutes = db.Column(db.Integer)
+    slug = db.Column(db.String(80))
 
     def __repr__(self):
         return f'<Post {self.title}>'
+
+
+class OutboxMessage(db.Model):
+    """An email waiting to be delivered by the outbox worker."""
+    __tablename__ = 'mail_outbox'
+    __table_args__ = (
+        # The worker's "what is due" query
+        db.Index('ix_mail_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)
+    reply_to = db.Column(db.String(255))
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status}>'
+
+
+class Lead(db.Model):
+    """A contact form submission, kept whether or not its email goes out."""
+    # The form's optional selects; each one is counted per day in LeadDailyCount
+    SEGMENTS = ('language', 'proficiency_level', 'it_services', 'web_development_services',
+                'tech_training_services')
+
+    __table_args__ = (
+        # Date-range exports walk this in order
+        db.Index('ix_lead_created_at_id', 'created_at', 'id'),
+        *(db.Index(f'ix_lead_{segment}_created_at', segment, 'created_at') for segment in SEGMENTS),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    # NULL when the visitor left the select empty
+    language = db.Column(db.String(32))
+    proficiency_level = db.Column(db.String(32))
+    it_services = db.Column(db.String(64))
+    web_development_services = db.Column(db.String(64))
+    tech_training_services = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Lead {self.id} {self.email}>'
+
+
+class LeadDailyCount(db.Model):
+    """Leads per day, in total and per value of each segment.
+
+    Kept up to date by the Lead mapper events below, in the same
+    transaction as the lead itself, so reports never scan the lead table.
+    ``segment`` is ``'total'`` (with an empty ``value``) or one of
+    ``Lead.SEGMENTS``.
+    """
+    __tablename__ = 'lead_daily_count'
+
+    # Key order serves the reports: one segment over a range of days
+    segment = db.Column(db.String(32), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    value = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<LeadDailyCount {self.day} {self.segment}={self.value}: {self.count}>'
+
+
+# Everything the blog listing renders; never loads the full content
+POST_LISTING_COLUMNS = (Post.id, Post.title, Post.author, Post.date_posted, Post.excerpt,
+                        Post.slug, Post.reading_minutes)
+
+
+def _store_derived_fields(target):
+    for name, value in derive_fields(target.title, target.content).items():
+        setattr(target, name, value)
+
+
+@event.listens_for(Post, 'before_insert')
+def _derive_fields(mapper, connection, target):
+    _store_derived_fields(target)
+    if target.updated_at is None:
+        if target.date_posted is None:
+            target.date_posted = datetime.utcnow()
+        target.updated_at = target.date_posted
+
+
+@event.listens_for(Post, 'before_update')
+def _rederive_fields(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes():
+        _store_derived_fields(target)
+        if not state.attrs.updated_at.history.has_changes():
+            target.updated_at = datetime.utcnow()
+    elif target.content_html is None:
+        _store_derived_fields(target)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_post_changes(session, flush_context):
+    # The new/dirty/deleted collections still hold the pre-flush state here
+    if any(isinstance(obj, Post) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['posts_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _announce_post_changes(session):
+    if session.info.pop('posts_changed', False) and has_app_context():
+        posts_changed.send(current_app._get_current_object())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_post_changes(session):
+    session.info.pop('posts_changed', None)
+
+
+def lead_count_keys(created_at, values):
+    """``(day, segment, value)`` rows of LeadDailyCount that one lead counts towards."""
+    day = created_at.date()
+    keys = [(day, 'total', '')]
+    keys.extend((day, segment, values[segment]) for segment in Lead.SEGMENTS if values.get(segment))
+    return keys
+
+
+def add_lead_counts(connection, deltas):
+    """Add to the counts in ``{(day, segment, value): delta}``, creating missing rows."""
+    table = LeadDailyCount.__table__
+    statement = sqlite_insert(table)
+    connection.execute(
+        statement.on_conflict_do_update(index_elements=['day', 'segment', 'value'],
+                                        set_={'count': table.c.count + statement.excluded['count']}),
+        [{'day': day, 'segment': segment, 'value': value, 'count': delta}
+         for (day, segment, value), delta in deltas.items()])
+
+
+def _lead_values(target, old=False):
+    state = inspect(target)
+    values = {}
+    for name in ('created_at',) + Lead.SEGMENTS:
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(target, name)
+    return values
+
+
+@event.listens_for(Lead, 'after_insert')
+def _count_lead(mapper, connection, target):
+    add_lead_counts(connection, dict.fromkeys(lead_count_keys(target.created_at, _lead_values(target)), 1))
+
+
+@event.listens_for(Lead, 'after_update')
+def _recount_lead(mapper, connection, target):
+    before, after = _lead_values(target, old=True), _lead_values(target)
+    if before != after:
+        deltas = dict.fromkeys(lead_count_keys(before['created_at'], before), -1)
+        for key in lead_count_keys(after['created_at'], after):
+            deltas[key] = deltas.get(key, 0) + 1
+        add_lead_counts(connection, {key: delta for key, delta in deltas.items() if delta})
+
+
+@event.listens_for(Lead, 'after_delete')
+def _uncount_lead(mapper, connection, target):
+    values = _lead_values(target, old=True)
+    add_lead_counts(connection, dict.fromkeys(lead_count_keys(values['created_at'], values), -1))
@@ -0,0 +1,272 @@
+"""Durable outbox for outgoing email.
+
+Web requests only insert a row into ``mail_outbox``; they never talk to the
+SMTP server. A separate worker process (``flask outbox run``) claims due
+messages in batches and delivers them over a single reused SMTP connection.
+Temporary failures are retried with exponential backoff; permanent ones,
+and messages that run out of attempts, are dead-lettered for inspection.
+When the server cannot be reached or refuses the login, no message is to
+blame: the batch goes back to the queue without using up an attempt.
+"""
+import random
+import signal
+import smtplib
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+
+from flask import current_app
+from sqlalchemy import func, or_, update
+
+from app import db
+from app.models import OutboxMessage
+from app.signals import mail_send_finished
+
+
+def enqueue(subject, sender, recipients, body, reply_to=None):
+    """Add a message to the outbox. The caller commits the session."""
+    message = OutboxMessage(
+        message_id=make_msgid(domain=sender.rpartition('@')[2] or None),
+        subject=subject,
+        sender=sender,
+        recipients=', '.join(recipients),
+        reply_to=reply_to,
+        body=body,
+    )
+    db.session.add(message)
+    return message
+
+
+def build_email(message):
+    email = EmailMessage()
+    email['Subject'] = message.subject
+    email['From'] = message.sender
+    email['To'] = message.recipients
+    if message.reply_to:
+        email['Reply-To'] = message.reply_to
+    email['Date'] = format_datetime(message.created_at.replace(tzinfo=timezone.utc), usegmt=True)
+    # Stable across retries, so receivers can drop duplicates
+    email['Message-ID'] = message.message_id
+    email.set_content(message.body)
+    return email
+
+
+class SMTPUnavailable(Exception):
+    """Connecting, STARTTLS or logging in failed; nothing was sent."""
+
+
+class SMTPConnection:
+    """One SMTP session, opened lazily and reused for every send."""
+
+    def __init__(self, config):
+        self.config = config
+        self.smtp = None
+
+    def open(self):
+        config = self.config
+        host, port, timeout = config['MAIL_SERVER'], config['MAIL_PORT'], config['MAIL_TIMEOUT']
+        smtp = None
+        try:
+            if config.get('MAIL_USE_SSL'):
+                smtp = smtplib.SMTP_SSL(host, port, timeout=timeout)
+            else:
+                smtp = smtplib.SMTP(host, port, timeout=timeout)
+                if config.get('MAIL_USE_TLS'):
+                    smtp.starttls()
+            if config.get('MAIL_USERNAME') and config.get('MAIL_PASSWORD'):
+                smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        except (smtplib.SMTPException, OSError) as error:
+            # A 535 from login says nothing about the message being sent
+            if smtp is not None:
+                smtp.close()
+            raise SMTPUnavailable(f'{type(error).__name__}: {error}') from error
+        self.smtp = smtp
+
+    def send(self, email):
+        if self.smtp is None:
+            self.open()
+        try:
+            self.smtp.send_message(email)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle session; reconnect once and retry
+            self.close()
+            self.open()
+            self.smtp.send_message(email)
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        self.smtp = None
+
+
+def is_permanent(error):
+    """5xx replies to a message will fail the same way again, so retrying is pointless."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def retry_delay(attempts, config):
+    """Exponential backoff with jitter, capped at OUTBOX_RETRY_MAX seconds."""
+    delay = min(config['OUTBOX_RETRY_BASE'] * 2 ** (attempts - 1), config['OUTBOX_RETRY_MAX'])
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(batch_size, lease):
+    """Lock up to ``batch_size`` due messages for this worker.
+
+    Messages stuck in ``sending`` past their lease (a crashed worker) are
+    picked up again. Each claim is a conditional UPDATE, so two workers can
+    never claim the same row.
+    """
+    now = datetime.utcnow()
+    due = or_(
+        (OutboxMessage.status == OutboxMessage.PENDING) & (OutboxMessage.next_attempt_at <= now),
+        (OutboxMessage.status == OutboxMessage.SENDING) & (OutboxMessage.locked_until < now),
+    )
+    candidates = db.session.execute(
+        db.select(OutboxMessage.id, OutboxMessage.status).where(due)
+        .order_by(OutboxMessage.next_attempt_at).limit(batch_size)
+    ).all()
+
+    claimed = []
+    for message_id, status in candidates:
+        result = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == message_id, OutboxMessage.status == status, due)
+            .values(status=OutboxMessage.SENDING, locked_until=now + timedelta(seconds=lease))
+        )
+        if result.rowcount:
+            claimed.append(message_id)
+    db.session.commit()
+
+    if not claimed:
+        return []
+    return db.session.execute(
+        db.select(OutboxMessage).where(OutboxMessage.id.in_(claimed))
+    ).scalars().all()
+
+
+def defer(messages, error, config):
+    """Return claimed messages to the queue without counting an attempt."""
+    retry_at = datetime.utcnow() + retry_delay(1, config)
+    for message in messages:
+        message.status = OutboxMessage.PENDING
+        message.locked_until = None
+        message.next_attempt_at = retry_at
+        message.last_error = str(error)
+    db.session.commit()
+    current_app.logger.warning('SMTP server unavailable, %d outbox messages deferred until %s: %s',
+                               len(messages), retry_at, error)
+
+
+def drain(connection, batch_size=None):
+    """Deliver one batch. Returns ``{'sent': n, 'retried': n, 'dead': n, 'deferred': n}``.
+
+    The batch stops at the first :class:`SMTPUnavailable`; the messages not
+    yet sent are deferred.
+    """
+    config = current_app.config
+    batch_size = batch_size or config['OUTBOX_BATCH_SIZE']
+    counts = {'sent': 0, 'retried': 0, 'dead': 0, 'deferred': 0}
+
+    batch = claim_batch(batch_size, config['OUTBOX_LEASE'])
+    for position, message in enumerate(batch):
+        started = time.perf_counter()
+        try:
+            connection.send(build_email(message))
+        except SMTPUnavailable as error:
+            defer(batch[position:], error, config)
+            counts['deferred'] = len(batch) - position
+            break
+        except (smtplib.SMTPException, OSError) as error:
+            message.attempts += 1
+            message.locked_until = None
+            message.last_error = f'{type(error).__name__}: {error}'
+            if is_permanent(error) or message.attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+                message.status = OutboxMessage.DEAD
+                counts['dead'] += 1
+                current_app.logger.error('Outbox message %s dead-lettered: %s',
+                                         message.id, message.last_error)
+            else:
+                message.status = OutboxMessage.PENDING
+                message.next_attempt_at = datetime.utcnow() + retry_delay(message.attempts, config)
+                counts['retried'] += 1
+                current_app.logger.warning('Outbox message %s failed, retrying at %s: %s',
+                                           message.id, message.next_attempt_at, message.last_error)
+            mail_send_finished.send(current_app._get_current_object(),
+                                    outcome='dead' if message.status == OutboxMessage.DEAD else 'retried',
+                                    seconds=time.perf_counter() - started)
+            if not isinstance(error, smtplib.SMTPResponseException):
+                # Connection-level failure: start the next send on a fresh session
+                connection.close()
+        else:
+            message.attempts += 1
+            message.locked_until = None
+            message.status = OutboxMessage.SENT
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+            counts['sent'] += 1
+            mail_send_finished.send(current_app._get_current_object(), outcome='sent',
+                                    seconds=time.perf_counter() - started)
+        # Commit per message so a crash never re-sends a delivered email
+        db.session.commit()
+
+    return counts
+
+
+def run_worker(once=False):
+    """Drain the outbox until stopped, closing the SMTP session when idle."""
+    config = current_app.config
+    connection = SMTPConnection(config)
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    if not once:
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+    totals = {'sent': 0, 'retried': 0, 'dead': 0, 'deferred': 0}
+    try:
+        while not stopping:
+            counts = drain(connection)
+            for key, value in counts.items():
+                totals[key] += value
+            if sum(counts.values()) > counts['deferred']:
+                continue
+            # Nothing due, or the server is down: idle sessions get dropped by servers anyway
+            connection.close()
+            db.session.remove()
+            if once:
+                break
+            time.sleep(config['OUTBOX_POLL_INTERVAL'])
+    finally:
+        connection.close()
+    return totals
+
+
+def status_counts():
+    rows = db.session.execute(
+        db.select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+    ).all()
+    return dict(rows)
+
+
+def requeue_dead():
+    """Give every dead-lettered message a fresh set of attempts."""
+    result = db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.status == OutboxMessage.DEAD)
+        .values(status=OutboxMessage.PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
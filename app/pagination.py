@@ -0,0 +1,64 @@
+"""Keyset (cursor) pagination.
+
+Pages are addressed by the sort key of their boundary row rather than by an
+offset, so page 500 costs the same index range scan as page 1.
+"""
+import base64
+from collections import namedtuple
+
+from sqlalchemy import tuple_
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(*values):
+    raw = '|'.join(str(value) for value in values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, *types):
+    """Parse a cursor back into typed values, or ``None`` if it is invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        parts = raw.split('|')
+        if len(parts) != len(types):
+            return None
+        return tuple(convert(part) for convert, part in zip(types, parts))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_desc(query, key_columns, per_page, after=None, before=None):
+    """Page through ``query`` in descending ``key_columns`` order.
+
+    ``after`` continues with older rows than the given key, ``before`` goes
+    back to newer ones. The rows must expose every key column as an
+    attribute so the boundary cursors can be built from them.
+    """
+    key = tuple_(*key_columns)
+    if before is not None:
+        rows = (query.filter(key > before)
+                .order_by(*[column.asc() for column in key_columns])
+                .limit(per_page + 1).all())
+        has_newer = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_older = True
+    else:
+        if after is not None:
+            query = query.filter(key < after)
+        rows = (query.order_by(*[column.desc() for column in key_columns])
+                .limit(per_page + 1).all())
+        items = rows[:per_page]
+        has_older = len(rows) > per_page
+        has_newer = after is not None
+
+    def cursor_for(row):
+        return encode_cursor(*(getattr(row, column.key) for column in key_columns))
+
+    return Page(
+        items=items,
+        next_cursor=cursor_for(items[-1]) if items and has_older else None,
+        prev_cursor=cursor_for(items[0]) if items and has_newer else None,
+    )
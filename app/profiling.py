@@ -0,0 +1,206 @@
+"""Production profiling, off the normal request path.
+
+Two modes, each off until configured:
+
+* One request at a time. Set ``PROFILE_SECRET``, then send a request with
+  an ``X-Profile`` header from ``flask profile sign PATH``. The header is
+  an expiry time and an HMAC of it and the path, so it cannot be reused
+  for another page or after it expires. That request runs under cProfile
+  and its stats are written to ``PROFILE_DIR`` as a ``.prof`` file (open
+  it with snakeviz, or ``flameprof`` for a flame graph). The response
+  names the file in ``X-Profile-File``. The body is buffered while the
+  profiler runs, so a streamed page is profiled as a whole.
+* Continuous sampling. With ``PROFILE_SAMPLE_INTERVAL`` set, a thread in
+  each worker records the stack of every thread that is handling a
+  request, that many seconds apart. Every ``PROFILE_FLUSH_INTERVAL``
+  seconds the counts are written as folded stacks
+  (``sampled-<pid>-<time>.folded``), the input format of flamegraph.pl
+  and speedscope.
+
+The hook is a WSGI wrapper that is only installed if one of the two is
+configured. An unprofiled request then costs one header lookup, plus two
+set operations while sampling.
+"""
+import atexit
+import cProfile
+import hashlib
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile'
+_ENVIRON_KEY = 'HTTP_X_PROFILE'
+_SLUG_RE = re.compile(r'[^\w.-]+')
+
+
+def sign(secret, path, expires):
+    """The ``X-Profile`` header value that allows profiling ``path`` until ``expires``."""
+    digest = hmac.new(secret.encode(), f'{int(expires)}:{path}'.encode(), hashlib.sha256).hexdigest()
+    return f'{int(expires)}.{digest}'
+
+
+def verify(secret, path, value, now=None):
+    """Why ``value`` does not allow profiling ``path``, or None if it does."""
+    expires, _, _ = value.partition('.')
+    if not expires.isdigit():
+        return 'malformed'
+    if int(expires) < (time.time() if now is None else now):
+        return 'expired'
+    if not hmac.compare_digest(sign(secret, path, int(expires)), value):
+        return 'bad signature'
+    return None
+
+
+class Sampler(threading.Thread):
+    """Counts the folded stacks of the threads in ``active`` every ``interval`` seconds.
+
+    Stacks are cut at the profiler's own frames, so they start at the
+    Flask app rather than in the server. Time the server spends sending
+    the body is counted under ``(server)``.
+    """
+
+    def __init__(self, directory, interval, flush_interval, active, root_codes):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.directory = directory
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.active = active
+        self.root_codes = root_codes
+        self.counts = Counter()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def _fold(self, frame):
+        names = []
+        while frame is not None and frame.f_code not in self.root_codes:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        if frame is None and names:
+            # Between chunks of the body: the server is sending the last one
+            return f'(server);{names[0]}'
+        return ';'.join(reversed(names))
+
+    def run(self):
+        flush_at = time.monotonic() + self.flush_interval
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = [self._fold(frames[ident]) for ident in tuple(self.active) if ident in frames]
+            with self._lock:
+                self.counts.update(stack for stack in stacks if stack)
+            if time.monotonic() >= flush_at:
+                self.flush()
+                flush_at = time.monotonic() + self.flush_interval
+
+    def flush(self):
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        if not counts:
+            return None
+        path = os.path.join(self.directory, f'sampled-{os.getpid()}-{time.strftime("%Y%m%dT%H%M%S")}.folded')
+        with open(path, 'w', encoding='utf-8') as handle:
+            for stack, count in counts.most_common():
+                handle.write(f'{stack} {count}\n')
+        return path
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+
+class Profiler:
+    """WSGI wrapper that profiles signed requests and feeds the sampler."""
+
+    def __init__(self, wsgi_app, directory, secret=None, sample_interval=0, flush_interval=60):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.secret = secret
+        self.sample_interval = sample_interval
+        self.flush_interval = flush_interval
+        self.sampler = None
+        self._active = set()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self.secret and _ENVIRON_KEY in environ:
+            reason = verify(self.secret, environ.get('PATH_INFO', ''), environ[_ENVIRON_KEY])
+            if reason is None:
+                return self._profile(environ, start_response)
+            logger.warning('Ignored %s header: %s', HEADER, reason)
+        if not self.sample_interval:
+            return self.wsgi_app(environ, start_response)
+        if self._pid != os.getpid():
+            self._start_sampler()
+        ident = threading.get_ident()
+        self._active.add(ident)
+        try:
+            result = self.wsgi_app(environ, start_response)
+        finally:
+            self._active.discard(ident)
+        return self._sampled(result)
+
+    def _sampled(self, result):
+        # The body of a streamed page is rendered while it is iterated
+        ident = threading.get_ident()
+        self._active.add(ident)
+        try:
+            yield from result
+        finally:
+            self._active.discard(ident)
+            if hasattr(result, 'close'):
+                result.close()
+
+    def _start_sampler(self):
+        # Started in each worker on first use; a thread started in a
+        # preloading gunicorn master does not survive the fork
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._active = set()
+            self.sampler = Sampler(self.directory, self.sample_interval, self.flush_interval,
+                                   self._active, {Profiler.__call__.__code__, Profiler._sampled.__code__})
+            self.sampler.start()
+            self._pid = os.getpid()
+            atexit.register(self.sampler.stop)
+
+    def _profile(self, environ, start_response):
+        slug = _SLUG_RE.sub('_', environ.get('PATH_INFO', '').strip('/')) or 'index'
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{environ.get("REQUEST_METHOD")}-{slug}-{uuid.uuid4().hex[:8]}.prof'
+
+        def profiled_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [('X-Profile-File', name)], exc_info)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            result = self.wsgi_app(environ, profiled_start_response)
+            try:
+                body = list(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            profile.disable()
+            profile.dump_stats(os.path.join(self.directory, name))
+        logger.info('Profiled %s %s into %s', environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'), name)
+        return body
+
+
+def init_app(app):
+    secret = app.config['PROFILE_SECRET']
+    sample_interval = app.config['PROFILE_SAMPLE_INTERVAL']
+    if not (secret or sample_interval):
+        return
+    directory = app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    app.wsgi_app = Profiler(app.wsgi_app, directory, secret, sample_interval,
+                            app.config['PROFILE_FLUSH_INTERVAL'])
@@ -0,0 +1,250 @@
+"""SQL query instrumentation: per-request query logs, slow queries, N+1 hints.
+
+Every statement a request executes is recorded with its duration. When the
+request ends, including the body of a streamed page, the log is checked:
+
+* more queries than the request's ``QUERY_BUDGETS`` entry is a warning.
+  A plain endpoint key covers its GETs, ``'endpoint?arg'`` GETs that carry
+  ``arg`` (the largest matching budget applies), and ``'endpoint POST'``
+  that method; requests without an entry are not checked
+* one statement run ``QUERY_REPEAT_THRESHOLD`` times or more is flagged
+  as a likely N+1 (a query per row that a join or ``selectinload`` would
+  fold into one). If every run had the same parameters, the result could
+  simply have been reused
+* any statement slower than ``QUERY_SLOW_MS`` is logged when it finishes
+
+Statements are normalized (whitespace collapsed, expanded ``IN (?, ?, ...)``
+lists folded) so that runs with different list lengths group together.
+Parameters are never logged, only a short hash of them, which is enough
+to tell identical runs apart from different ones.
+
+``capture()`` and ``assert_max_queries()`` record the queries of a block
+of code, e.g. a test client request (with the page cache off, or a cached
+page runs none). ``flask queries check`` requests every GET entry in
+``QUERY_BUDGETS``, with arguments and path values taken from the newest
+post, and fails if one is over budget or repeats a statement; deploy.sh
+and update.sh run it, so a regression stops the deployment. Entries for
+other methods are only enforced at runtime, since the check must not
+write to the database.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request, url_for
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+Query = namedtuple('Query', ['statement', 'parameters', 'duration'])
+Repeat = namedtuple('Repeat', ['statement', 'count', 'distinct'])
+Result = namedtuple('Result', ['key', 'url', 'count', 'duration', 'budget', 'repeats'])
+
+_SAFE_METHODS = ('GET', 'HEAD')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'\(\?(?:, \?)+\)')
+
+_captures = threading.local()
+# QUERY_SLOW_MS in seconds, read once; a config lookup per query costs more than the rest of the hook
+_slow_seconds = None
+
+
+def normalize(statement):
+    return _IN_LIST_RE.sub('(?, ...)', _WHITESPACE_RE.sub(' ', statement).strip())
+
+
+def fingerprint(parameters):
+    """A short hash that tells parameter sets apart without revealing them."""
+    return hashlib.blake2b(repr(parameters).encode(), digest_size=6).hexdigest()
+
+
+class QueryLog:
+    """The statements run by one request or ``capture()`` block."""
+
+    def __init__(self):
+        self.queries = []
+
+    def add(self, statement, parameters, duration):
+        self.queries.append(Query(statement, parameters, duration))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query.duration for query in self.queries)
+
+    def repeats(self, threshold):
+        """Statements run at least ``threshold`` times, most frequent first."""
+        counts = Counter(normalize(query.statement) for query in self.queries)
+        repeated = {statement: count for statement, count in counts.items() if count >= threshold}
+        if not repeated:
+            return []
+        distinct = {statement: set() for statement in repeated}
+        for query in self.queries:
+            statement = normalize(query.statement)
+            if statement in distinct:
+                distinct[statement].add(fingerprint(query.parameters))
+        return [Repeat(statement, count, len(distinct[statement]))
+                for statement, count in sorted(repeated.items(), key=lambda item: -item[1])]
+
+    def describe(self):
+        return '\n'.join(f'{query.duration * 1000:8.2f} ms  {normalize(query.statement)}'
+                         for query in self.queries)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_queries_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info.pop('_queries_started', time.perf_counter())
+    log = g.get('_queries') if has_request_context() else None
+    if log is not None:
+        log.add(statement, parameters, duration)
+    for captured in getattr(_captures, 'stack', ()):
+        captured.add(statement, parameters, duration)
+    if _slow_seconds is not None and duration >= _slow_seconds:
+        logger.warning('Slow query (%.1f ms): %s', duration * 1000, normalize(statement),
+                       extra={'query_ms': round(duration * 1000, 2), 'params': fingerprint(parameters)})
+
+
+def _listen():
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _start_request():
+    g._queries = QueryLog()
+
+
+def budget_for(budgets, endpoint, method, args):
+    """``(key, budget)`` of the ``QUERY_BUDGETS`` entry for a request; budget None if there is none."""
+    if method not in _SAFE_METHODS:
+        key = f'{endpoint} {method}'
+        return key, budgets.get(key)
+    variants = [(budgets[key], key) for key in (f'{endpoint}?{name}' for name in args) if key in budgets]
+    if variants:
+        budget, key = max(variants)
+        return key, budget
+    return endpoint, budgets.get(endpoint)
+
+
+def _finish_request(exc):
+    log = g.pop('_queries', None)
+    if log is None or request.url_rule is None:
+        return
+    config = current_app.config
+    endpoint = request.url_rule.endpoint
+    key, budget = budget_for(config['QUERY_BUDGETS'], endpoint, request.method, request.args)
+    if budget is not None and log.count > budget:
+        logger.warning('%s ran %d queries, budget %d', key, log.count, budget,
+                       extra={'queries': log.count, 'query_ms': round(log.duration * 1000, 2)})
+    for repeat in log.repeats(config['QUERY_REPEAT_THRESHOLD']):
+        logger.warning('%s %s: %s', endpoint, describe_repeat(repeat), repeat.statement,
+                       extra={'repeats': repeat.count})
+
+
+def describe_repeat(repeat):
+    if repeat.distinct == 1:
+        return f'ran the same query {repeat.count} times, the result could be reused'
+    return f'ran one statement {repeat.count} times with {repeat.distinct} parameter sets, likely N+1'
+
+
+@contextmanager
+def capture():
+    """Record the queries run in this thread inside the block."""
+    _listen()
+    log = QueryLog()
+    stack = _captures.__dict__.setdefault('stack', [])
+    stack.append(log)
+    try:
+        yield log
+    finally:
+        stack.remove(log)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail with the list of statements if the block runs more than ``limit`` queries."""
+    with capture() as log:
+        yield log
+    if log.count > limit:
+        raise AssertionError(f'{log.count} queries, expected at most {limit}:\n{log.describe()}')
+
+
+def _sample_values():
+    """Path values and query arguments for the checked URLs, from the newest post."""
+    from datetime import datetime
+    from app.database import read_session
+    from app.models import Post
+    from app.pagination import encode_cursor
+    from app.suggestions import normalize
+
+    post = read_session.query(Post.id, Post.slug, Post.title, Post.date_posted).order_by(
+        Post.date_posted.desc(), Post.id.desc()).first()
+    if post is None:
+        return {'search': 'cloud', 'q': 'cl', 'after': encode_cursor(datetime.utcnow(), 0)}
+    word = next((word for word in normalize(post.title or '') if len(word) >= 3), 'cloud')
+    # A search that matches, a partly typed word and the cursor of page 2
+    return {'post_id': post.id, 'slug': post.slug, 'search': word, 'q': word[:3],
+            'after': encode_cursor(post.date_posted, post.id)}
+
+
+def _budget_urls(app):
+    values = _sample_values()
+    rules = {}
+    for rule in app.url_map.iter_rules():
+        rules.setdefault(rule.endpoint, rule)
+    for key in app.config['QUERY_BUDGETS']:
+        if ' ' in key:
+            continue  # other methods are only checked at runtime
+        endpoint, _, arg = key.partition('?')
+        rule = rules.get(endpoint)
+        if rule is None or 'GET' not in rule.methods or not rule.arguments <= values.keys():
+            continue
+        query = {arg: values[arg]} if arg else {}
+        yield key, url_for(endpoint, **{name: values[name] for name in rule.arguments}, **query)
+
+
+def check(app):
+    """Request every GET entry in ``QUERY_BUDGETS`` once warm and count its queries."""
+    from app.cache import NullBackend, page_cache
+
+    budgets = app.config['QUERY_BUDGETS']
+    threshold = app.config['QUERY_REPEAT_THRESHOLD']
+    client = app.test_client()
+    with app.test_request_context():
+        urls = list(_budget_urls(app))
+    # Cached pages would run no queries at all
+    backend, page_cache.backend = page_cache.backend, NullBackend()
+    results = []
+    try:
+        for key, url in urls:
+            client.get(url).close()  # first request fills per-process caches
+            with capture() as log:
+                response = client.get(url)
+                response.get_data()
+                response.close()
+            results.append(Result(key, url, log.count, log.duration, budgets[key], log.repeats(threshold)))
+    finally:
+        page_cache.backend = backend
+    return results
+
+
+def init_app(app):
+    global _slow_seconds
+    if not app.config['QUERY_LOG_ENABLED']:
+        return
+    _slow_seconds = app.config['QUERY_SLOW_MS'] / 1000
+    _listen()
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
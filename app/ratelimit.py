@@ -0,0 +1,211 @@
+"""Token-bucket rate limiting shared by every worker on the host.
+
+Views opt in with :meth:`RateLimiter.limit`. Each named limit is a set of
+token buckets, one per client address and one for the whole site; a
+request spends one token from each and is refused with a bare 429 (and a
+``Retry-After``) when any of them is empty. The check runs before the
+view, so refused requests never parse a form or render a template.
+
+Bucket state lives in a small SQLite file next to the database by
+default, so all gunicorn workers draw from the same buckets without a
+separate server. Every check is one ``BEGIN IMMEDIATE`` transaction, which
+keeps concurrent workers from spending the same token twice. If the store
+cannot be reached the request is let through and a warning logged: a
+broken limiter must not take the contact form down with it.
+
+Client addresses come from ``request.remote_addr``, which reflects
+``X-Forwarded-For`` once the app is wrapped in ``ProxyFix`` (see
+``PROXY_FIX_X_FOR``).
+"""
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+# Roughly one check in this many also deletes buckets that have refilled
+_PRUNE_EVERY = 200
+
+
+def parse_rate(rate):
+    """``'10/hour'`` or ``'5/10minutes'`` -> ``(capacity, period_seconds)``."""
+    match = _RATE_RE.match(rate or '')
+    if not match:
+        raise ValueError(f'Invalid rate limit {rate!r}; expected e.g. "10/hour"')
+    count, multiple, unit = match.groups()
+    return int(count), int(multiple or 1) * _PERIODS[unit]
+
+
+def _refill(bucket, now, capacity, period):
+    """Tokens in a bucket at ``now``; new buckets start full."""
+    if bucket is None:
+        return float(capacity)
+    tokens, updated = bucket
+    return min(float(capacity), tokens + (now - updated) * capacity / period)
+
+
+def _take(buckets, states, now):
+    """Spend one token from each bucket, or say how long until that is possible.
+
+    ``buckets`` is a list of ``(key, capacity, period)`` and ``states`` maps
+    keys to ``(tokens, updated)``. Returns ``(retry_after, new_states)``;
+    ``retry_after`` is 0 when the request may go ahead.
+    """
+    new_states, wait = {}, 0.0
+    for key, capacity, period in buckets:
+        tokens = _refill(states.get(key), now, capacity, period)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) * period / capacity)
+        new_states[key] = (tokens - 1, now)
+    return wait, ({} if wait else new_states)
+
+
+class NullStore:
+    def acquire(self, buckets, now):
+        return 0.0
+
+    def clear(self):
+        pass
+
+
+class MemoryStore:
+    """Per-process buckets; for development and tests only."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets, now):
+        with self._lock:
+            wait, new_states = _take(buckets, self._buckets, now)
+            self._buckets.update(new_states)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStore:
+    """Buckets in an SQLite file shared by every process on the host.
+
+    The state is disposable, so the file skips durability (no fsync) and
+    is never migrated; delete it to reset every limit.
+    """
+
+    def __init__(self, path, timeout=1.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS bucket ('
+                               'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def acquire(self, buckets, now):
+        connection = self._connection()
+        keys = [key for key, _, _ in buckets]
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                f"SELECT key, tokens, updated FROM bucket WHERE key IN ({', '.join('?' * len(keys))})",
+                keys).fetchall()
+            wait, new_states = _take(buckets, {key: (tokens, updated) for key, tokens, updated in rows},
+                                     now)
+            connection.executemany(
+                'INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                [(key, tokens, updated) for key, (tokens, updated) in new_states.items()])
+            if random.randrange(_PRUNE_EVERY) == 0:
+                longest = max(period for _, _, period in buckets)
+                connection.execute('DELETE FROM bucket WHERE updated < ?', (now - longest,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM bucket')
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        self.store = NullStore()
+        self.limits = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config['RATELIMIT_STORAGE'] if app.config['RATELIMIT_ENABLED'] else 'null'
+        if kind == 'sqlite':
+            self.store = SQLiteStore(app.config['RATELIMIT_DB']
+                                     or os.path.join(app.instance_path, 'ratelimit.db'))
+        elif kind == 'memory':
+            self.store = MemoryStore()
+        elif kind in ('null', 'none', ''):
+            self.store = NullStore()
+        else:
+            raise ValueError(f'Unknown RATELIMIT_STORAGE: {kind!r}')
+        self.limits = {name: {scope: parse_rate(rate) for scope, rate in rates.items() if rate}
+                       for name, rates in app.config['RATELIMITS'].items()}
+        app.extensions['rate_limiter'] = self
+
+    def buckets(self, name):
+        """``(key, capacity, period)`` for every bucket a request to ``name`` spends from."""
+        buckets = []
+        for scope, (capacity, period) in self.limits.get(name, {}).items():
+            if scope == 'per_ip':
+                buckets.append((f'{name}:ip:{request.remote_addr}', capacity, period))
+            elif scope == 'global':
+                buckets.append((f'{name}:global', capacity, period))
+            else:
+                raise ValueError(f'Unknown rate limit scope {scope!r} for {name!r}')
+        return buckets
+
+    def check(self, name):
+        """Spend a token for the current request; seconds to wait if refused, else 0."""
+        buckets = self.buckets(name)
+        if not buckets:
+            return 0.0
+        try:
+            return self.store.acquire(buckets, time.time())
+        except (sqlite3.Error, OSError) as exc:
+            current_app.logger.warning('Rate limit store unavailable, allowing request: %s', exc)
+            return 0.0
+
+    def limit(self, name, methods=('POST',)):
+        """Refuse requests to a view once the ``RATELIMITS[name]`` buckets run dry."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.method in methods:
+                    wait = self.check(name)
+                    if wait:
+                        return current_app.response_class(
+                            'Too many requests, please try again later.\n', status=429,
+                            mimetype='text/plain', headers={'Retry-After': str(int(wait) + 1)})
+                return view(**kwargs)
+            return wrapper
+        return decorator
+
+
+rate_limiter = RateLimiter()
@@ -1,5 +1,7 @@
 # Import necessary modules from Flask
 from flask import Blueprint, render_template
+from app.cache import page_cache
+from app.conditional import conditional, template_etag
 
 # Create a Blueprint named 'about' to organize the 'About' section of the site
 # '__name__' helps Flask locate resources related to this blueprint
@@ -7,6 +9,8 @@ bp = Blueprint('about', __name__)
 
 # Define the route for the root URL of the 'about' section (e.g., /about/)
 @bp.route('/')
+@conditional(etag=lambda: template_etag('about/index.html'))
+@page_cache.cached(ttl=3600)
 def index():
     # Render and return the 'about/index.html' template when the route is accessed
     return render_template('about/index.html')
@@ -1,22 +1,79 @@
-from flask import Blueprint, render_template, request
-from app.models import Post
+from datetime import datetime
+from flask import Blueprint, abort, current_app, redirect, render_template, request, url_for
+from sqlalchemy.orm import load_only
+from app import feeds, search, suggestions
+from app.cache import page_cache
+from app.conditional import (blog_etag, blog_last_modified, combine_etag, conditional,
+                             template_etag)
+from app.database import read_session
+from app.models import POST_LISTING_COLUMNS, Post
+from app.pagination import decode_cursor, paginate_desc
+from app.streaming import render_streamed
 
 bp = Blueprint('blog', __name__)
 
 @bp.route('/')
+@conditional(etag=lambda: blog_etag('blog/index.html'), last_modified=blog_last_modified)
+@page_cache.cached(ttl=300, group='blog', args=('search', 'after', 'before'))
 def index():
-    # Get search query from request parameters
+    # Get search query and page cursors from request parameters
     search_query = request.args.get('search', '').strip()
+    after = request.args.get('after')
+    before = request.args.get('before')
+    per_page = current_app.config['BLOG_POSTS_PER_PAGE']
+    snippets = {}
     
     # Query posts based on search
     if search_query:
-        # Search in title and content (case-insensitive)
-        posts = Post.query.filter(
-            (Post.title.ilike(f'%{search_query}%')) |
-            (Post.content.ilike(f'%{search_query}%'))
-        ).order_by(Post.date_posted.desc()).all()
+        # Ranked full-text search with highlighted snippets
+        page, snippets = search.search_posts(search_query, per_page=per_page, after=after)
     else:
-        # Get all posts if no search query
-        posts = Post.query.order_by(Post.date_posted.desc()).all()
+        # Newest first, one index range scan per page
+        page = paginate_desc(
+            read_session.query(*POST_LISTING_COLUMNS),
+            (Post.date_posted, Post.id),
+            per_page,
+            after=decode_cursor(after, datetime.fromisoformat, int),
+            before=decode_cursor(before, datetime.fromisoformat, int),
+        )
     
-    return render_template('blog/index.html', posts=posts, search_query=search_query)
+    return render_streamed('blog/index.html', posts=page.items, page=page,
+                           search_query=search_query, snippets=snippets,
+                           is_first_page=not (after or before))
+
+@bp.route('/feed.xml')
+@conditional(etag=lambda: blog_etag('blog/feed.xml'), last_modified=blog_last_modified)
+@page_cache.cached(ttl=86400, group='blog')
+def feed():
+    xml = render_template('blog/feed.xml', posts=feeds.feed_posts(), site_url=feeds.site_url,
+                          updated=blog_last_modified() or datetime.utcnow())
+    return xml, {'Content-Type': 'application/atom+xml; charset=utf-8'}
+
+@bp.route('/suggest')
+def suggest():
+    # Answered from memory; browsers keep each prefix's answer for a minute
+    body = suggestions.suggest_json(current_app._get_current_object(), request.args.get('q', ''))
+    return body, {'Content-Type': 'application/json', 'Cache-Control': 'public, max-age=60'}
+
+def _post_updated(post_id, slug=None):
+    return read_session.query(Post.updated_at).filter_by(id=post_id).scalar()
+
+@bp.route('/<int:post_id>')
+def post_redirect(post_id):
+    # Old id-only links; the canonical URL carries the slug
+    slug = read_session.query(Post.slug).filter_by(id=post_id).scalar() or abort(404)
+    return redirect(url_for('blog.post', post_id=post_id, slug=slug), 301)
+
+@bp.route('/<int:post_id>/<slug>')
+@conditional(etag=lambda post_id, slug: combine_etag(template_etag('blog/post.html'), post_id, slug,
+                                                     _post_updated(post_id)),
+             last_modified=_post_updated)
+@page_cache.cached(ttl=3600, group='blog')
+def post(post_id, slug):
+    # The raw content is never needed: its HTML was rendered when it was saved
+    post = read_session.get(Post, post_id, options=[load_only(
+        Post.title, Post.author, Post.date_posted, Post.content_html,
+        Post.reading_minutes, Post.slug)]) or abort(404)
+    if slug != post.slug:
+        return redirect(url_for('blog.post', post_id=post_id, slug=post.slug), 301)
+    return render_template('blog/post.html', post=post)
@@ -1,15 +1,24 @@
-from flask import Blueprint, render_template, flash, redirect, url_for
-from app.forms import ContactForm
-from flask_mail import Message
-from app import mail
+from flask import Blueprint, current_app, flash, redirect, url_for
+from app import db
+from app.ratelimit import rate_limiter
+from app.streaming import render_streamed
 import os
 
 bp = Blueprint('contact', __name__)
 
 @bp.route('/', methods=['GET', 'POST'])
+@rate_limiter.limit('contact')
 def index():
+    # WTForms and smtplib are only imported by workers that serve this page
+    from app import leads, outbox
+    from app.forms import ContactForm
+
     form = ContactForm()
     if form.validate_on_submit():
+        # Keep the submission even if its email cannot be queued below
+        lead = leads.record(form)
+        db.session.commit()
+
         # Build email body with all form fields
         email_body = f"""
         New Contact Form Submission from Zencrow Technologies Website
@@ -75,20 +84,17 @@ def index():
         mail_server = os.environ.get('MAIL_SERVER')
         mail_username = os.environ.get('MAIL_USERNAME')
         mail_password = os.environ.get('MAIL_PASSWORD')
-        
-        print(f"DEBUG: MAIL_SERVER = {mail_server}")
-        print(f"DEBUG: MAIL_USERNAME = {mail_username}")
-        print(f"DEBUG: MAIL_PASSWORD = {'*' * len(mail_password) if mail_password else 'NOT SET'}")
-        
+
         if not all([mail_server, mail_username, mail_password]):
             flash('Email configuration is not set up. Please contact the administrator.', 'error')
-            print("Email configuration missing: MAIL_SERVER, MAIL_USERNAME, or MAIL_PASSWORD not set")
+            current_app.logger.error('Lead %s not emailed: MAIL_SERVER, MAIL_USERNAME or MAIL_PASSWORD not set',
+                                     lead.id)
             return redirect(url_for('contact.index'))
         
         # Check if using placeholder values
         if 'your-email@gmail.com' in mail_username or 'your-email-password' in mail_password:
             flash('Please configure your email credentials in the .env file.', 'error')
-            print("Using placeholder email credentials - please update .env file")
+            current_app.logger.error('Lead %s not emailed: placeholder mail credentials in .env', lead.id)
             return redirect(url_for('contact.index'))
         
         # Always send from authenticated mailbox to avoid SPF/DMARC rejections
@@ -98,22 +104,17 @@ def index():
         raw_recipients = os.environ.get('CONTACT_RECIPIENTS', 'hr@zencrowtechnologies.com')
         recipients = [r.strip() for r in raw_recipients.split(',') if r.strip()]
 
-        msg = Message(
+        # Queue the email; the outbox worker delivers it outside the request
+        outbox.enqueue(
             subject=f"New Contact Form: {form.subject.data}",
             sender=default_sender,
             recipients=recipients,
-            reply_to=form.email.data
+            body=email_body,
+            reply_to=form.email.data,
         )
-        msg.body = email_body
-        
-        try:
-            mail.send(msg)
-            flash('Your message has been sent successfully! We will get back to you soon.', 'success')
-            print(f"Email sent successfully to hr@zencrowtechnologies.com from {form.email.data}")
-        except Exception as e:
-            error_msg = f"Email sending failed: {str(e)}"
-            flash(f'Email Error: {str(e)}', 'error')
-            print(error_msg)
+        db.session.commit()
+        flash('Your message has been sent successfully! We will get back to you soon.', 'success')
+        current_app.logger.info('Lead %s emailed to %s via the outbox', lead.id, ', '.join(recipients))
             
         return redirect(url_for('contact.index'))
-    return render_template('contact/index.html', form=form)
+    return render_streamed('contact/index.html', form=form)
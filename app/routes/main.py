@@ -1,12 +1,24 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, current_app, render_template, jsonify
 from datetime import datetime
+from app import feeds
+from app.cache import page_cache
+from app.conditional import blog_etag, blog_last_modified, conditional, template_etag
 
 bp = Blueprint('main', __name__)
 
 @bp.route('/')
+@conditional(etag=lambda: template_etag('main/index.html'))
+@page_cache.cached(ttl=3600)
 def index():
     return render_template('main/index.html')
 
+@bp.route('/sitemap.xml')
+@conditional(etag=lambda: blog_etag('sitemap.xml'), last_modified=blog_last_modified)
+@page_cache.cached(ttl=86400, group='blog')
+def sitemap():
+    xml = render_template('sitemap.xml', pages=feeds.static_pages(), posts=feeds.sitemap_posts())
+    return xml, {'Content-Type': 'application/xml; charset=utf-8'}
+
 @bp.route('/health')
 def health():
     """Health check endpoint for monitoring"""
@@ -15,3 +27,19 @@ def health():
         'timestamp': datetime.utcnow().isoformat(),
         'service': 'zencrow-website'
     })
+
+@bp.route('/health/live')
+def health_live():
+    """Liveness probe: the worker is answering requests"""
+    response = jsonify({'status': 'alive'})
+    response.cache_control.no_store = True
+    return response
+
+@bp.route('/health/ready')
+def health_ready():
+    """Readiness probe: cached results of the background dependency checks"""
+    status, checks = current_app.extensions['health'].readiness()
+    response = jsonify({'status': status, 'checks': checks})
+    response.status_code = 503 if status in ('starting', 'unready') else 200
+    response.cache_control.no_store = True
+    return response
@@ -1,97 +1,44 @@
 # Import necessary modules from Flask
-from flask import Blueprint, render_template
+from functools import wraps
+
+from flask import Blueprint, current_app, make_response, render_template
+from app import catalog
+from app.cache import page_cache
+from app.conditional import combine_etag, conditional, template_etag
 
 # Create a Blueprint for the 'services' section of the site
 # This helps in organizing routes into separate components
 bp = Blueprint('services', __name__)
 
+
+def _cross_origin(view):
+    # Public data, fetched by widgets embedded on other sites; the 304s
+    # answered by @conditional need the header as much as the full responses
+    @wraps(view)
+    def wrapper(**kwargs):
+        response = make_response(view(**kwargs))
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        return response
+    return wrapper
+
+
+def _page_etag():
+    return combine_etag(template_etag('services/index.html', 'services/_service.html'), catalog.get().etag)
+
+
 # Define the route for the services index page
 @bp.route('/')
+@conditional(etag=_page_etag)
+@page_cache.cached(ttl=3600)
 def index():
-    # Create a list of dictionaries containing detailed service information
-    services = [
-        {
-            'id': 'it-support',
-            'title': 'IT Support & Solutions',
-            'icon': 'bi-headset',
-            'color': 'primary',
-            'description': 'Comprehensive IT support and solutions tailored to your business needs.',
-            'features': [
-                '24/7 Technical Support',
-                'Network Infrastructure Setup',
-                'Cloud Migration Services',
-                'Cybersecurity Solutions',
-                'Hardware & Software Maintenance',
-                'Data Backup & Recovery'
-            ],
-            'pricing': {
-                'basic': {'price': '$299', 'period': 'month', 'features': ['Basic Support', 'Email Support', 'Remote Assistance']},
-                'professional': {'price': '$599', 'period': 'month', 'features': ['Priority Support', 'Phone Support', 'On-site Visits', 'Proactive Monitoring']},
-                'enterprise': {'price': 'Custom', 'period': '', 'features': ['Dedicated Team', 'Custom Solutions', 'SLA Guarantee', 'Strategic Consulting']}
-            }
-        },
-        {
-            'id': 'web-development',
-            'title': 'Web Development',
-            'icon': 'bi-code-slash',
-            'color': 'success',
-            'description': 'Custom web solutions and applications built with modern technologies and best practices.',
-            'features': [
-                'Custom Website Development',
-                'E-commerce Solutions',
-                'Web Application Development',
-                'Mobile-Responsive Design',
-                'API Development & Integration',
-                'Performance Optimization'
-            ],
-            'pricing': {
-                'basic': {'price': '$2,999', 'period': 'project', 'features': ['5 Pages', 'Responsive Design', 'Contact Form', 'Basic SEO']},
-                'professional': {'price': '$5,999', 'period': 'project', 'features': ['10 Pages', 'CMS Integration', 'Advanced SEO', 'Analytics Setup']},
-                'enterprise': {'price': 'Custom', 'period': '', 'features': ['Unlimited Pages', 'Custom Features', 'E-commerce', 'Advanced Integrations']}
-            }
-        },
-        {
-            'id': 'tech-training',
-            'title': 'Tech Training',
-            'icon': 'bi-mortarboard',
-            'color': 'warning',
-            'description': 'Professional development programs to enhance your team\'s technical skills and knowledge.',
-            'features': [
-                'Programming Languages Training',
-                'Web Development Bootcamps',
-                'Data Science & Analytics',
-                'Cloud Computing Courses',
-                'Cybersecurity Training',
-                'Agile & DevOps Practices'
-            ],
-            'pricing': {
-                'individual': {'price': '$299', 'period': 'course', 'features': ['Online Access', 'Course Materials', 'Certificate', 'Email Support']},
-                'team': {'price': '$2,999', 'period': 'course', 'features': ['Up to 10 People', 'Live Sessions', 'Custom Content', 'Progress Tracking']},
-                'corporate': {'price': 'Custom', 'period': '', 'features': ['Custom Curriculum', 'On-site Training', 'Ongoing Support', 'ROI Analysis']}
-            }
-        },
-        {
-            'id': 'language-learning',
-            'title': 'Language Learning',
-            'icon': 'bi-translate',
-            'color': 'info',
-            'description': 'Comprehensive language courses designed to expand your global communication capabilities.',
-            'features': [
-                'Multiple Language Options',
-                'Interactive Learning Platform',
-                'Native Speaker Instructors',
-                'Business Language Focus',
-                'Cultural Training',
-                'Progress Assessment'
-            ],
-            'pricing': {
-                'basic': {'price': '$99', 'period': 'month', 'features': ['1 Language', 'Basic Lessons', 'Mobile App', 'Email Support']},
-                'premium': {'price': '$199', 'period': 'month', 'features': ['3 Languages', 'Live Sessions', 'Cultural Content', 'Priority Support']},
-                'corporate': {'price': 'Custom', 'period': '', 'features': ['Custom Programs', 'Group Sessions', 'Business Focus', 'Progress Reports']}
-            }
-        }
-    ]
+    # The catalog is loaded once at startup (see app/catalog.py) and each
+    # service card is rendered once per catalog version
+    return render_template('services/index.html', service_cards=catalog.service_cards())
 
-    # Render the services/index.html template, passing the list of services
-    return render_template('services/index.html', services=services)
 
+# The catalog as JSON, for the pricing widgets and partners; serialized at startup
+@bp.route('/api')
+@_cross_origin
+@conditional(etag=lambda: catalog.get().etag)
+def api():
+    return current_app.response_class(catalog.get().json, mimetype='application/json')
@@ -0,0 +1,130 @@
+"""Versioned schema migrations.
+
+Each migration is a function registered with :func:`migration` under an
+increasing version number. Applied versions are recorded in the
+``schema_migrations`` table, and ``flask db upgrade`` runs the ones still
+missing, in order, inside one transaction. ``flask db check`` exits
+non-zero while any are pending, so a deploy can refuse to start on a stale
+schema.
+
+The app itself never touches the schema at startup. Migrations are
+idempotent as well, because databases created before this table existed
+already have some of these changes.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from app import content
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+# (version, description, function), kept sorted by version
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register ``fn(connection)`` as schema version ``version``."""
+    def decorator(fn):
+        if any(existing == version for existing, _, _ in MIGRATIONS):
+            raise ValueError(f'Duplicate migration version {version}')
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return fn
+    return decorator
+
+
+@migration(1, 'Create tables')
+def _create_tables(connection):
+    from app import db, models  # noqa: F401 -- registers every model
+    db.metadata.create_all(connection)
+
+
+@migration(2, 'Add post.excerpt')
+def _add_excerpt(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('post')}
+    if 'excerpt' not in columns:
+        connection.execute(text('ALTER TABLE post ADD COLUMN excerpt VARCHAR(300)'))
+        _backfill_excerpts(connection)
+
+
+@migration(3, 'Index post (date_posted, id) for keyset pagination')
+def _add_listing_index(connection):
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_post_date_posted_id ON post (date_posted, id)'
+    ))
+
+
+@migration(4, 'Create the full-text search index')
+def _add_search_index(connection):
+    from app import search
+    search.ensure_index(connection)
+
+
+@migration(5, 'Store rendered HTML, word count, reading time and slug on post')
+def _add_derived_post_fields(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('post')}
+    for name, type_ in (('content_html', 'TEXT'), ('word_count', 'INTEGER'),
+                        ('reading_minutes', 'INTEGER'), ('slug', 'VARCHAR(80)')):
+        if name not in columns:
+            connection.execute(text(f'ALTER TABLE post ADD COLUMN {name} {type_}'))
+    content.backfill(connection)
+
+
+@migration(6, 'Add post.updated_at')
+def _add_updated_at(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('post')}
+    if 'updated_at' not in columns:
+        connection.execute(text('ALTER TABLE post ADD COLUMN updated_at DATETIME'))
+    connection.execute(text('UPDATE post SET updated_at = date_posted WHERE updated_at IS NULL'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_post_updated_at ON post (updated_at)'))
+
+
+@migration(7, 'Create the lead and lead_daily_count tables')
+def _create_lead_tables(connection):
+    from app.models import Lead, LeadDailyCount
+    Lead.__table__.create(connection, checkfirst=True)
+    LeadDailyCount.__table__.create(connection, checkfirst=True)
+
+
+def _backfill_excerpts(connection):
+    rows = connection.execute(text('SELECT id, content FROM post')).all()
+    if rows:
+        connection.execute(
+            text('UPDATE post SET excerpt = :excerpt WHERE id = :id'),
+            [{'id': row.id, 'excerpt': content.make_excerpt(row.content)} for row in rows],
+        )
+
+
+def applied_versions(connection):
+    if not inspect(connection).has_table(MIGRATIONS_TABLE):
+        return set()
+    return set(connection.execute(text(f'SELECT version FROM {MIGRATIONS_TABLE}')).scalars())
+
+
+def pending(connection):
+    """Migrations not yet applied, as ``(version, description)`` pairs."""
+    applied = applied_versions(connection)
+    return [(version, description) for version, description, _ in MIGRATIONS
+            if version not in applied]
+
+
+def upgrade(connection):
+    """Apply every pending migration. Returns the ones that ran."""
+    connection.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ('
+        'version INTEGER PRIMARY KEY, description VARCHAR(200) NOT NULL, applied_at DATETIME NOT NULL)'
+    ))
+    applied = applied_versions(connection)
+    ran = []
+    for version, description, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        fn(connection)
+        connection.execute(
+            text(f'INSERT INTO {MIGRATIONS_TABLE} (version, description, applied_at) '
+                 'VALUES (:version, :description, :applied_at)'),
+            {'version': version, 'description': description, 'applied_at': datetime.utcnow()},
+        )
+        ran.append((version, description))
+    return ran
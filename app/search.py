@@ -0,0 +1,206 @@
+"""Full-text search for blog posts, backed by an SQLite FTS5 index.
+
+The ``post_fts`` virtual table keeps its own copy of each post's title and
+content. It is kept in sync with ``Post`` through mapper events, so every
+ORM insert, update and delete updates the index in the same transaction.
+"""
+import re
+from datetime import datetime
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, text
+
+from app import db
+from app.database import read_session
+from app.models import POST_LISTING_COLUMNS, Post
+from app.pagination import Page, decode_cursor, encode_cursor, paginate_desc
+
+FTS_TABLE = 'post_fts'
+
+# Title matches weigh ten times as much as body matches
+RANK_FUNCTION = 'bm25(10.0, 1.0)'
+
+# Control characters that survive HTML escaping, swapped for <mark> tags
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available(bind=None):
+    """FTS5 only exists on SQLite; other databases fall back to LIKE."""
+    bind = bind if bind is not None else db.engine
+    return bind.dialect.name == 'sqlite'
+
+
+def build_match_query(raw_query):
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so user input can never be parsed as FTS5 syntax,
+    and the last word is a prefix match so partial words still hit.
+    """
+    tokens = _TOKEN_RE.findall(raw_query or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def ensure_index(connection):
+    """Create the FTS table if it is missing and fill it from ``post``."""
+    if connection.dialect.name != 'sqlite':
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE},
+    ).first()
+    if exists:
+        return
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        "title, content, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', :rank)"
+    ), {'rank': RANK_FUNCTION})
+    _populate(connection)
+
+
+def rebuild_index():
+    """Drop and rebuild the whole index. Returns the number of posts indexed."""
+    with db.engine.begin() as connection:
+        connection.execute(text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+        ensure_index(connection)
+        return connection.execute(text(f'SELECT count(*) FROM {FTS_TABLE}')).scalar()
+
+
+def _populate(connection):
+    connection.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, content) "
+        "SELECT id, coalesce(title, ''), coalesce(content, '') FROM post"
+    ))
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def index_post(connection, post_id, title, content):
+    connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': post_id})
+    connection.execute(
+        text(f'INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (:id, :title, :content)'),
+        {'id': post_id, 'title': title or '', 'content': content or ''},
+    )
+
+
+def index_posts(connection, rows, new=False):
+    """Index many ``(id, title, content)`` rows at once; ``new`` skips the deletes."""
+    rows = [{'id': post_id, 'title': title or '', 'content': body or ''}
+            for post_id, title, body in rows]
+    if not rows:
+        return
+    if not new:
+        connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), rows)
+    connection.execute(
+        text(f'INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (:id, :title, :content)'), rows)
+
+
+def remove_post(connection, post_id):
+    connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :id'), {'id': post_id})
+
+
+def highlight(fragment):
+    """Escape an FTS snippet and turn its match markers into <mark> tags."""
+    html = str(escape(fragment or ''))
+    html = html.replace(_HIGHLIGHT_START, '<mark>').replace(_HIGHLIGHT_END, '</mark>')
+    return Markup(html)
+
+
+def search_posts(raw_query, per_page=10, after=None):
+    """Return ``(page, snippets)`` for a search, best matches first.
+
+    ``page`` is a :class:`~app.pagination.Page` of listing rows and
+    ``after`` the ``next_cursor`` of the previous page. ``snippets`` maps
+    post ids to highlighted HTML fragments of the body.
+
+    Only the newest ``SEARCH_CANDIDATE_LIMIT`` matches are ranked, so the
+    cost of a common term does not grow with the archive. The trade-off is
+    recall: when more posts match, older ones are left out of the results
+    entirely, even if they would rank first. Pages follow the ranking by
+    ``(rank, rowid)``, and a cursor resumes after the last row it returned.
+    """
+    match = build_match_query(raw_query)
+    if match is None:
+        return Page([], None, None), {}
+
+    if not is_available():
+        pattern = f'%{raw_query}%'
+        query = read_session.query(*POST_LISTING_COLUMNS).filter(
+            Post.title.ilike(pattern) | Post.content.ilike(pattern)
+        )
+        after = decode_cursor(after, datetime.fromisoformat, int)
+        return paginate_desc(query, (Post.date_posted, Post.id), per_page, after=after), {}
+
+    # Rank only the newest matches so common terms stay cheap on big archives,
+    # then page through that ranking by (rank, rowid)
+    candidates = current_app.config.get('SEARCH_CANDIDATE_LIMIT', 1000)
+    params = {'match': match, 'candidates': candidates, 'limit': per_page + 1}
+    keyset = ''
+    position = decode_cursor(after, float, int)
+    if position is not None:
+        keyset = 'WHERE (rank, rowid) > (:rank, :rowid) '
+        params.update(rank=position[0], rowid=position[1])
+    ranked = read_session.execute(text(
+        f"SELECT rowid, rank FROM (SELECT rowid, rank FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :match ORDER BY rowid DESC LIMIT :candidates) "
+        f"{keyset}ORDER BY rank, rowid LIMIT :limit"
+    ), params).all()
+    if not ranked:
+        return Page([], None, None), {}
+
+    next_cursor = None
+    if len(ranked) > per_page:
+        ranked = ranked[:per_page]
+        next_cursor = encode_cursor(repr(ranked[-1].rank), ranked[-1].rowid)
+    ids = [row.rowid for row in ranked]
+
+    # One range scan for the snippets; "+rowid" keeps the IN list out of the
+    # index, which would otherwise rebuild prefix doclists once per post
+    rows = read_session.execute(text(
+        f"SELECT rowid, snippet({FTS_TABLE}, 1, :start, :end, '…', 32) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+        "AND rowid BETWEEN :low AND :high "
+        f"AND +rowid IN ({', '.join(str(int(post_id)) for post_id in ids)})"
+    ), {
+        'start': _HIGHLIGHT_START,
+        'end': _HIGHLIGHT_END,
+        'match': match,
+        'low': min(ids),
+        'high': max(ids),
+    }).all()
+    snippets = {row[0]: highlight(row[1]) for row in rows}
+
+    by_id = {row.id: row for row in
+             read_session.query(*POST_LISTING_COLUMNS).filter(Post.id.in_(ids))}
+    items = [by_id[post_id] for post_id in ids if post_id in by_id]
+    return Page(items, next_cursor, None), snippets
+
+
+@event.listens_for(Post, 'after_insert')
+def _index_inserted(mapper, connection, target):
+    if is_available(connection):
+        index_post(connection, target.id, target.title, target.content)
+
+
+@event.listens_for(Post, 'after_update')
+def _index_updated(mapper, connection, target):
+    if not is_available(connection):
+        return
+    state = inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes():
+        index_post(connection, target.id, target.title, target.content)
+
+
+@event.listens_for(Post, 'after_delete')
+def _index_deleted(mapper, connection, target):
+    if is_available(connection):
+        remove_post(connection, target.id)
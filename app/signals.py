@@ -0,0 +1,16 @@
+"""Application signals, for subsystems that react to content changes."""
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent with the app as sender after a commit that added, changed or deleted
+# posts. Bulk writes that bypass the ORM send it themselves.
+posts_changed = _signals.signal('posts-changed')
+
+# Sent with the app as sender for every cacheable page request, with
+# ``group`` and ``result`` ('hit' or 'miss'). app.metrics counts them.
+page_cache_used = _signals.signal('page-cache-used')
+
+# Sent by the outbox worker after every send attempt, with ``outcome``
+# ('sent', 'retried' or 'dead') and ``seconds``. app.metrics times them.
+mail_send_finished = _signals.signal('mail-send-finished')
@@ -0,0 +1,69 @@
+"""Opt-in streamed page rendering, to cut time to first byte.
+
+A view that returns :func:`render_streamed` instead of ``render_template``
+sends the page as Jinja renders it. ``base.html`` marks the end of
+``<head>`` with ``{{ stream_flush() }}``, so the first chunk on the wire is
+the head, and the browser can start fetching stylesheets while the body
+is still being rendered. The rest goes out in chunks of about
+``STREAM_CHUNK_SIZE`` bytes, not one write per template node.
+
+Headers, the session cookie included, are sent before the body is
+rendered. Anything that would change the session is therefore done up
+front: flashed messages are popped, and the CSRF tokens of forms in the
+context are generated. The request context stays available while the
+body renders, as with ``stream_template``. Responses carry
+``X-Accel-Buffering: no`` so that nginx passes chunks on instead of
+buffering the whole page. ``STREAM_TEMPLATES = False`` turns every
+streamed view back into a buffered one.
+"""
+from flask import current_app, g, get_flashed_messages, render_template, stream_template
+
+# Only emitted while streaming; never reaches the client
+_FLUSH_MARKER = '\x00stream-flush\x00'
+
+
+def stream_flush():
+    """Template global: end the current chunk here when the page is streamed."""
+    return _FLUSH_MARKER if g.get('_streaming') else ''
+
+
+def _chunks(fragments, size):
+    buffer, length = [], 0
+    for fragment in fragments:
+        if _FLUSH_MARKER in fragment:
+            head, _, fragment = fragment.partition(_FLUSH_MARKER)
+            buffer.append(head)
+            yield ''.join(buffer)
+            buffer, length = [], 0
+        buffer.append(fragment)
+        length += len(fragment)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _settle_session(context):
+    # Both would otherwise write to the session after its cookie was sent
+    get_flashed_messages()
+    for value in context.values():
+        csrf_field = getattr(value, 'csrf_token', None)
+        if csrf_field is not None and hasattr(csrf_field, 'current_token'):
+            csrf_field.current_token
+
+
+def render_streamed(template_name, **context):
+    """Like ``render_template``, but stream the page when STREAM_TEMPLATES is on."""
+    if not current_app.config['STREAM_TEMPLATES']:
+        return render_template(template_name, **context)
+    _settle_session(context)
+    g._streaming = True
+    fragments = stream_template(template_name, **context)
+    return current_app.response_class(
+        _chunks(fragments, current_app.config['STREAM_CHUNK_SIZE']),
+        mimetype='text/html', headers={'X-Accel-Buffering': 'no'})
+
+
+def init_app(app):
+    app.jinja_env.globals['stream_flush'] = stream_flush
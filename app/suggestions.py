@@ -0,0 +1,252 @@
+"""Search-as-you-type suggestions for the blog, from an in-memory prefix index.
+
+Each worker keeps two sorted arrays and answers ``/blog/suggest?q=`` with a
+binary search into them, without touching the database:
+
+* post titles: one key per word position, so "python ba" finds "Learning
+  Python Basics". Only the newest ``SUGGEST_MAX_POSTS`` posts are indexed.
+* frequent terms: the ``SUGGEST_MAX_TERMS`` words found in the most posts,
+  read from the FTS5 index's vocabulary (see ``app.search``). They complete
+  the last word of the query.
+
+Keys are casefolded and stripped of accents, like the FTS5 tokenizer does.
+
+The index is built on the first suggestion request. After that, a
+background thread refreshes it every ``SUGGEST_REFRESH_INTERVAL`` seconds,
+or right after a commit in this process that changed posts. A refresh
+compares ``max(updated_at)``, the post count and the highest id with what
+it saw last. It then fetches only the posts changed since and merges their
+keys into the sorted titles; it reloads everything only if posts were
+deleted. The arrays are rebuilt off the request path, and requests always
+read a complete snapshot.
+
+Reading the terms scans the whole FTS5 vocabulary, and one post barely
+moves the most frequent words, so a refresh that merges changed titles
+keeps the previous terms. They are re-read on a full reload, once
+``SUGGEST_TERMS_AFTER_POSTS`` posts have changed since the last read, or
+at the first refresh ``SUGGEST_TERMS_INTERVAL`` seconds after it with any
+change pending.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from flask import url_for
+from sqlalchemy import text
+
+from app import db
+from app.database import read_session
+from app.models import Post
+from app.search import FTS_TABLE, is_available
+from app.signals import posts_changed
+
+logger = logging.getLogger(__name__)
+
+# Title keys start at most this many words in
+MAX_WORD_POSITIONS = 6
+# Prefix matches looked at per query before ranking; bounds one-letter queries
+SCAN_LIMIT = 200
+MIN_QUERY_LENGTH = 2
+VOCAB_TABLE = f'temp.{FTS_TABLE}_vocab'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# titles: sorted (key, word position, post id); terms and term_docs: parallel, sorted by term
+Snapshot = namedtuple('Snapshot', ['posts', 'titles', 'terms', 'term_docs'])
+_EMPTY = Snapshot({}, (), (), ())
+
+
+def normalize(value):
+    """Lower-case words without accents, as the FTS5 tokenizer sees them."""
+    decomposed = unicodedata.normalize('NFKD', value.casefold())
+    return _WORD_RE.findall(''.join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+def _title_keys(title):
+    words = normalize(title or '')
+    return tuple(' '.join(words[position:]) for position in range(min(len(words), MAX_WORD_POSITIONS)))
+
+
+def _prefix_range(items, prefix, wrap=str):
+    start = bisect.bisect_left(items, wrap(prefix))
+    return start, min(bisect.bisect_left(items, wrap(prefix + '\uffff'), start), start + SCAN_LIMIT)
+
+
+def _key_tuple(prefix):
+    # (prefix,) sorts before every (key, position, post id) whose key starts with prefix
+    return (prefix,)
+
+
+class SuggestionIndex:
+    """The prefix index of one worker, and the thread that keeps it current."""
+
+    def __init__(self, app):
+        self.app = app
+        self.snapshot = None
+        self._stamp = None  # (max updated_at, count, max id) at the last refresh
+        self._terms_read_at = None  # time.monotonic() of the last vocabulary scan
+        self._terms_stale = 0  # posts changed since then
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        # Started on the first request so it lives in the worker, not a forking master
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self.snapshot is None:
+                    # Its own app context, so the build is not counted as the request's queries
+                    with self.app.app_context():
+                        self.refresh()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='suggestions', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = self.app.config['SUGGEST_REFRESH_INTERVAL']
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                with self._lock, self.app.app_context():
+                    self.refresh()
+            except Exception:
+                logger.exception('Refreshing the suggestion index failed')
+
+    def posts_changed(self, sender, **extra):
+        self._wake.set()
+
+    def refresh(self):
+        """Bring the index up to date with the post table; True if anything changed."""
+        latest, count, max_id = read_session.query(
+            db.func.max(Post.updated_at), db.func.count(), db.func.max(Post.id)).one()
+        stamp = (latest, count, max_id)
+        if stamp == self._stamp:
+            if self._terms_due():
+                self.snapshot = self.snapshot._replace(**self._terms())
+                return True
+            return False
+        limit = self.app.config['SUGGEST_MAX_POSTS']
+        columns = (Post.id, Post.title, Post.slug, Post.date_posted, Post.updated_at)
+        if self._stamp is None or latest is None or self._stamp[0] is None or latest < self._stamp[0]:
+            changed, rows = None, read_session.query(*columns).order_by(
+                Post.date_posted.desc(), Post.id.desc()).limit(limit).all()
+        else:
+            seen_latest, seen_count, seen_max_id = self._stamp
+            rows = read_session.query(*columns).filter(Post.updated_at >= seen_latest).all()
+            added = sum(1 for row in rows if row.id > (seen_max_id or 0))
+            # The posts at the previous high-water mark come back too; only the rest changed
+            edited = sum(1 for row in rows if row.id <= (seen_max_id or 0) and row.updated_at > seen_latest)
+            # Unless the count grew by exactly the new ids, posts were deleted
+            changed = rows if count == seen_count + added else None
+            if changed is None:
+                rows = read_session.query(*columns).order_by(
+                    Post.date_posted.desc(), Post.id.desc()).limit(limit).all()
+        posts = {} if changed is None else dict(self.snapshot.posts)
+        for post_id, title, slug, date_posted, _ in rows:
+            posts[post_id] = (title, slug, date_posted, _title_keys(title))
+        if len(posts) > limit:
+            newest = sorted(posts.items(), key=lambda item: (item[1][2], item[0]), reverse=True)
+            posts = dict(newest[:limit])
+        if changed is not None and not self._terms_due(added + edited):
+            terms = {'terms': self.snapshot.terms, 'term_docs': self.snapshot.term_docs}
+        else:
+            terms = self._terms()
+        self.snapshot = self._build(posts, None if changed is None else {row.id for row in changed}, terms)
+        self._stamp = stamp
+        return True
+
+    def _terms_due(self, changed=0):
+        self._terms_stale += changed
+        if not self._terms_stale:
+            return False
+        return (self._terms_stale >= self.app.config['SUGGEST_TERMS_AFTER_POSTS']
+                or time.monotonic() - self._terms_read_at >= self.app.config['SUGGEST_TERMS_INTERVAL'])
+
+    def _terms(self):
+        """The ``terms`` and ``term_docs`` fields of a snapshot, read from the vocabulary."""
+        self._terms_read_at, self._terms_stale = time.monotonic(), 0
+        if not is_available():
+            return {'terms': (), 'term_docs': ()}
+        # fts5vocab needs a (temporary) table, which the read-only connection cannot create
+        with db.engine.connect() as connection:
+            connection.execute(text(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab(main, {FTS_TABLE}, row)'))
+            rows = connection.execute(text(
+                f'SELECT term, doc FROM {VOCAB_TABLE} WHERE length(term) >= 3 ORDER BY doc DESC LIMIT :limit'
+            ), {'limit': self.app.config['SUGGEST_MAX_TERMS']}).all()
+        terms = sorted((term, docs) for term, docs in rows if not term.isdigit())
+        return {'terms': tuple(term for term, _ in terms), 'term_docs': tuple(docs for _, docs in terms)}
+
+    def _build(self, posts, changed_ids, terms):
+        if changed_ids is None:
+            titles = sorted((key, position, post_id) for post_id, (_, _, _, keys) in posts.items()
+                            for position, key in enumerate(keys))
+        else:
+            # Keep the sorted keys of unchanged posts; sorting them with a few
+            # new keys appended is one merge pass, not a full sort
+            previous = self.snapshot
+            if changed_ids.isdisjoint(previous.posts) and len(posts) == len(previous.posts) + len(changed_ids):
+                titles = list(previous.titles)  # only new posts
+            else:
+                titles = [entry for entry in previous.titles if entry[2] in posts and entry[2] not in changed_ids]
+            titles.extend(sorted((key, position, post_id) for post_id in changed_ids if post_id in posts
+                                 for position, key in enumerate(posts[post_id][3])))
+            titles.sort()
+        return Snapshot(posts, tuple(titles), **terms)
+
+    def suggest(self, raw_query, limit):
+        """``(posts, terms)``: ``[(title, url)]`` and completed queries for ``raw_query``."""
+        words = normalize(raw_query)
+        snapshot = self.snapshot or _EMPTY
+        if not words or len(' '.join(words)) < MIN_QUERY_LENGTH:
+            return [], []
+        prefix = ' '.join(words)
+
+        start, end = _prefix_range(snapshot.titles, prefix, _key_tuple)
+        # Titles that start with the query first, then the most recently added
+        candidates = sorted(snapshot.titles[start:end], key=lambda entry: (entry[1] > 0, -entry[2]))
+        posts, seen = [], set()
+        for _, _, post_id in candidates:
+            if post_id in seen:
+                continue
+            seen.add(post_id)
+            title, slug, _, _ = snapshot.posts[post_id]
+            posts.append((title, url_for('blog.post', post_id=post_id, slug=slug)))
+            if len(posts) == limit:
+                break
+
+        start, end = _prefix_range(snapshot.terms, words[-1])
+        ranked = sorted(range(start, end), key=lambda index: -snapshot.term_docs[index])
+        lead = ' '.join(words[:-1])
+        terms = [f'{lead} {snapshot.terms[index]}'.strip() for index in ranked[:limit]
+                 if snapshot.terms[index] != words[-1]]
+        return posts, terms
+
+
+def get(app):
+    return app.extensions['suggestions']
+
+
+def suggest_json(app, raw_query):
+    """The compact JSON body of a ``/blog/suggest`` response."""
+    index = get(app)
+    index.ensure_running()
+    posts, terms = index.suggest(raw_query[:100], app.config['SUGGEST_LIMIT'])
+    return json.dumps({'posts': [{'title': title, 'url': url} for title, url in posts], 'terms': terms},
+                      ensure_ascii=False, separators=(',', ':'))
+
+
+def init_app(app):
+    index = SuggestionIndex(app)
+    app.extensions['suggestions'] = index
+    posts_changed.connect(index.posts_changed, app, weak=False)
@@ -0,0 +1,58 @@
+"""Compiled-template caching shared by every worker.
+
+Jinja parses and compiles each template the first time a process renders
+it, and gunicorn recycles workers every ``max_requests``, so without help
+the compile cost comes back with every new worker. Two things avoid it:
+
+* A filesystem bytecode cache (``TEMPLATE_CACHE_DIR``, by default
+  ``instance/jinja-cache``). The first process to compile a template
+  stores the result there and every other worker loads it. An entry is
+  only used while the template source still matches its checksum, so
+  edited templates recompile on their own.
+* :func:`warm`, called from the ``when_ready`` hook in
+  ``deployment/gunicorn.conf.py``. With ``preload_app`` it runs in the
+  gunicorn master, so workers fork with every template already in Jinja's
+  in-memory cache.
+
+``flask templates compile`` fills the cache at deploy time and fails on
+any template that does not compile.
+"""
+import os
+
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+
+
+def compile_all(app):
+    """Load every template through ``app.jinja_env``; returns ``(names, errors)``.
+
+    ``errors`` maps template names to the syntax error each one raised.
+    """
+    env = app.jinja_env
+    names, errors = [], {}
+    for name in env.list_templates():
+        try:
+            env.get_template(name)
+        except TemplateSyntaxError as exc:
+            errors[name] = f'line {exc.lineno}: {exc.message}'
+        else:
+            names.append(name)
+    return names, errors
+
+
+def warm(app):
+    """Compile every template into this process's cache; log, don't raise, on errors."""
+    names, errors = compile_all(app)
+    for name, error in errors.items():
+        app.logger.error('Template %s does not compile: %s', name, error)
+    return names
+
+
+def init_app(app):
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        directory = app.config['TEMPLATE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja-cache')
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as exc:
+            app.logger.warning('Template bytecode cache disabled: %s', exc)
+        else:
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
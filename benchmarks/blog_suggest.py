@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Search-as-you-type benchmark: ``/blog/suggest`` against a full search.
+
+Imports ``--posts`` synthetic posts with ``flask blog import`` and, with the
+page cache off, reports:
+
+1. building the suggestion index (what the first request in a worker
+   waits for) and the memory it holds
+2. a refresh after one post was added, i.e. the background thread's work
+   per change
+3. latency of ``/blog/suggest?q=`` through the test client for every
+   prefix of a few title words, against ``/blog/?search=`` with the same
+   prefix, which is what the search box did before (p50 and p99), and of
+   the lookup alone, without Flask's request handling
+4. the size of a suggestion response
+
+Usage:
+    python benchmarks/blog_suggest.py [--posts 20000]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bulk_import import write_file  # noqa: E402
+from loadtest import percentile  # noqa: E402
+
+
+def timed(client, path):
+    started = time.perf_counter()
+    response = client.get(path)
+    body = response.get_data()
+    assert response.status_code == 200, (path, response.status_code)
+    return (time.perf_counter() - started) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-suggest-')
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'suggest.db')}",
+                      PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', MAIL_USERNAME='', MAIL_PASSWORD='',
+                      LOG_LEVEL='ERROR', FLASK_APP='wsgi')
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    try:
+        source = os.path.join(workdir, 'posts.jsonl')
+        write_file(source, args.posts)
+        subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=project_root, check=True,
+                       capture_output=True)
+        subprocess.run([sys.executable, '-m', 'flask', 'blog', 'import', source], cwd=project_root, check=True,
+                       capture_output=True)
+
+        from app import create_app, db
+        from app.models import Post
+
+        app = create_app()
+        index = app.extensions['suggestions']
+        with app.app_context():
+            tracemalloc.start()
+            started = time.perf_counter()
+            index.refresh()
+            build_ms = (time.perf_counter() - started) * 1000
+            held = tracemalloc.get_traced_memory()[0] / 2**20
+            tracemalloc.stop()
+            snapshot = index.snapshot
+            print(f'build: {build_ms:.0f} ms for {len(snapshot.posts)} posts, {len(snapshot.titles)} title '
+                  f'keys and {len(snapshot.terms)} terms, {held:.1f} MiB')
+
+            db.session.add(Post(title='Zymurgy for developers', content='A new post.', author='Benchmark'))
+            db.session.commit()
+            started = time.perf_counter()
+            index.refresh()
+            print(f'refresh after one new post: {(time.perf_counter() - started) * 1000:.0f} ms\n')
+
+            titles = [title for title, _, _, _ in list(snapshot.posts.values())[:20]]
+
+        client = app.test_client()
+        timed(client, '/blog/suggest?q=ab')  # starts the refresh thread
+        prefixes = [word[:length] for title in titles for word in title.split()[:3]
+                    for length in range(2, len(word) + 1)]
+        results, sizes = {'suggest': [], 'search': [], 'lookup': []}, []
+        for prefix in prefixes:
+            milliseconds, size = timed(client, f'/blog/suggest?q={prefix}')
+            results['suggest'].append(milliseconds)
+            sizes.append(size)
+            results['search'].append(timed(client, f'/blog/?search={prefix}')[0])
+        with app.test_request_context():
+            for prefix in prefixes:
+                started = time.perf_counter()
+                index.suggest(prefix, app.config['SUGGEST_LIMIT'])
+                results['lookup'].append((time.perf_counter() - started) * 1000)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(prefixes)} prefixes   {'p50':>9} {'p99':>9}")
+    for name, samples in (('/blog/suggest', results['suggest']), ('/blog/?search=', results['search']),
+                          ('lookup alone', results['lookup'])):
+        samples.sort()
+        print(f'{name:<15} {statistics.median(samples):>7.2f}ms {percentile(samples, 0.99):>7.2f}ms')
+    print(f'\nsuggestion response: median {statistics.median(sizes):.0f} bytes, max {max(sizes)} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Lead reporting benchmark: daily aggregates against scanning the lead table.
+
+Fills a fresh database with ``--leads`` synthetic contact form leads spread
+over two years (written straight to the table, then counted with
+``flask leads recount``), and reports:
+
+1. the cost of recording one lead through the ORM and committing it,
+   with the ``lead_daily_count`` upserts the mapper events add
+2. per-segment totals for the last year, read from the aggregates (what
+   ``flask leads stats`` does), against the equivalent GROUP BY over the
+   lead table
+3. ``flask leads export`` of one month and of everything: wall time,
+   rows/s and peak RSS, which should not grow with the range
+
+Usage:
+    python benchmarks/lead_reports.py [--leads 200000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bulk_import import run  # noqa: E402
+
+VALUES = {
+    'language': ['english', 'spanish', 'french', 'german', 'japanese', 'tamil', None, None],
+    'proficiency_level': ['beginner', 'intermediate', 'advanced', None],
+    'it_services': ['network-support', 'hardware-support', 'cloud-services', None, None, None],
+    'web_development_services': ['website-design', 'e-commerce', None, None, None],
+    'tech_training_services': ['python', 'data-science', None, None, None, None],
+}
+
+
+def synthetic_leads(count, end, seed=3):
+    rng = random.Random(seed)
+    span = int(timedelta(days=730).total_seconds())
+    for n in range(count):
+        created = end - timedelta(seconds=rng.randrange(span))
+        row = {'name': f'Visitor {n}', 'email': f'visitor{n}@example.com', 'subject': 'Enquiry',
+               'message': 'Hello, I would like to know more about your services. ' * 4, 'created_at': created}
+        row.update({segment: rng.choice(values) for segment, values in VALUES.items()})
+        yield row
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--leads', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-leads-')
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'leads.db')}",
+                      PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', MAIL_USERNAME='',
+                      MAIL_PASSWORD='', FLASK_APP='wsgi')
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    try:
+        from sqlalchemy import func, select
+        from app import create_app, db, leads, schema
+        from app.models import Lead
+
+        app = create_app()
+        end = datetime.utcnow()
+        with app.app_context():
+            with db.engine.begin() as connection:
+                schema.upgrade(connection)
+            print(f'Writing {args.leads} leads...')
+            rows = synthetic_leads(args.leads, end)
+            while True:
+                batch = [row for _, row in zip(range(5000), rows)]
+                if not batch:
+                    break
+                with db.engine.begin() as connection:
+                    connection.execute(Lead.__table__.insert(), batch)
+            seconds, _ = run([sys.executable, '-m', 'flask', 'leads', 'recount'], os.environ)
+            print(f'flask leads recount: {seconds:.1f}s\n')
+
+            samples = []
+            for row in synthetic_leads(200, end, seed=4):
+                started = time.perf_counter()
+                db.session.add(Lead(**row))
+                db.session.commit()
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f'record one lead (insert + aggregates + commit): {statistics.median(samples):.2f} ms\n')
+
+            since = (end - timedelta(days=365)).date()
+            print(f"{'last 365 days by':<26} {'aggregates':>11} {'raw scan':>10}")
+            with db.engine.connect() as connection:
+                for segment in ('total',) + Lead.SEGMENTS:
+                    fast, expected = timed(lambda: leads.totals(connection, since, None, segment), args.repeat)
+                    column = Lead.__table__.c.id if segment == 'total' else Lead.__table__.c[segment]
+                    raw_query = select(column, func.count()).where(
+                        Lead.__table__.c.created_at >= datetime.combine(since, datetime.min.time()))
+                    if segment != 'total':
+                        raw_query = raw_query.where(column.isnot(None)).group_by(column)
+                    slow, raw = timed(lambda: connection.execute(raw_query).all(), args.repeat)
+                    assert sum(count for _, count in expected) == sum(count for _, count in raw), segment
+                    print(f'{segment:<26} {fast:>9.2f}ms {slow:>8.2f}ms')
+
+        month = (end - timedelta(days=30)).date()
+        print(f"\n{'export':<12} {'seconds':>8} {'rows/s':>9} {'peak RSS':>9}")
+        for label, extra in (('last month', ['--since', month.isoformat()]), ('everything', [])):
+            output = os.path.join(workdir, 'leads.csv')
+            seconds, rss = run([sys.executable, '-m', 'flask', 'leads', 'export', output, *extra], os.environ)
+            with open(output, encoding='utf-8') as handle:
+                count = sum(1 for _ in handle) - 1
+            print(f'{label:<12} {seconds:>8.1f} {count / seconds:>9.0f} {rss:>7.0f}MiB  ({count} leads)')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
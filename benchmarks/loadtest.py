@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Load test: every route under gunicorn, with throughput, tail latency and RSS.
+
+Seeds a throwaway SQLite database with synthetic posts, then boots
+``wsgi:application`` under gunicorn on a free local port, together with
+the outbox mail worker pointed at an in-process SMTP sink. Each route is
+then driven by several client processes for a fixed duration. The contact
+route is driven with real form POSTs, CSRF token included.
+
+For every route the report gives requests/s, p50/p95/p99 latency and the
+error count. It also gives the RSS of every gunicorn worker. Results are
+saved as JSON; pass ``--compare`` with an earlier file to flag routes whose
+throughput dropped or whose p95 grew by more than ``--threshold`` percent
+(the exit status is 1 if any did).
+
+Usage:
+    python benchmarks/loadtest.py [--posts 1000] [--workers 3] [--concurrency 8]
+                                  [--duration 10] [--output results.json]
+                                  [--compare baseline.json] [--threshold 10]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Accepts and counts mail; just enough SMTP for smtplib with AUTH."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.received = 0
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 loadtest ESMTP')
+        while True:
+            line = self.rfile.readline().decode(errors='replace').strip()
+            if not line:
+                return
+            verb = line.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-loadtest')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == 'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(env, count):
+    """Insert posts through the ORM so every derived column is filled in."""
+    script = (
+        'import sys\n'
+        'from app import create_app, db, schema\n'
+        'from app.models import Post\n'
+        'from search_benchmark import synthetic_posts\n'
+        'app = create_app()\n'
+        'with app.app_context():\n'
+        '    with db.engine.begin() as connection:\n'
+        '        schema.upgrade(connection)\n'
+        '    for i, (title, content, author, date) in enumerate(synthetic_posts(int(sys.argv[1]))):\n'
+        '        db.session.add(Post(title=title, content=content, author=author, date_posted=date))\n'
+        '        if i % 1000 == 999:\n'
+        '            db.session.commit()\n'
+        '    db.session.commit()\n'
+    )
+    env = dict(env, PYTHONPATH=os.pathsep.join([project_root, os.path.dirname(__file__)]))
+    subprocess.run([sys.executable, '-c', script, str(count)], env=env, cwd=project_root, check=True)
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not come up')
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as handle:
+                fields = handle.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/status') as handle:
+        for line in handle:
+            if line.startswith(('VmRSS:', 'VmHWM:')):
+                name, value = line.split(':')
+                values[name] = int(value.split()[0])
+    return {'rss_kb': values.get('VmRSS'), 'peak_rss_kb': values.get('VmHWM')}
+
+
+def canonical_url(conn, path):
+    """Where ``path`` permanently redirects to, or ``path`` itself."""
+    conn.request('GET', path)
+    response = conn.getresponse()
+    response.read()
+    return urlsplit(response.getheader('Location') or path).path if response.status == 301 else path
+
+
+def discover_routes(port, posts):
+    """Routes to drive, with URLs taken from the running site where needed."""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', '/blog/')
+    listing = conn.getresponse().read().decode()
+    older = re.search(r'href="(/blog/\?after=[^"]+)"', listing)
+    routes = {
+        'main.index': ['/'],
+        'services.index': ['/services/'],
+        'about.index': ['/about/'],
+        'contact.index GET': ['/contact/'],
+        'blog.index': ['/blog/'],
+        'blog.index page 2': [older.group(1).replace('&amp;', '&')] if older else ['/blog/'],
+        'blog.index search': ['/blog/?search=cloud', '/blog/?search=devops', '/blog/?search=securi'],
+        'blog.post': [canonical_url(conn, f'/blog/{post_id}') for post_id in random.Random(1).sample(
+            range(1, posts + 1), min(posts, 200))],
+        'main.health': ['/health'],
+        'contact.index POST': None,
+    }
+    return routes
+
+
+def drive(port, urls, duration, seed_value):
+    """Client process: GET ``urls`` in a loop (or POST the contact form)."""
+    rng = random.Random(seed_value)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies, errors = [], 0
+    cookie, token = None, None
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        if urls is None and token is None:
+            conn.request('GET', '/contact/')
+            response = conn.getresponse()
+            page = response.read().decode()
+            cookie = (response.getheader('Set-Cookie') or '').split(';', 1)[0]
+            token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page).group(1)
+
+        started = time.perf_counter()
+        try:
+            if urls is None:
+                body = urlencode({
+                    'csrf_token': token, 'name': 'Load Test', 'email': 'load@example.com',
+                    'subject': 'Load test', 'message': 'Benchmark message', 'language': '',
+                    'proficiency_level': '', 'it_services': '', 'web_development_services': '',
+                    'tech_training_services': '',
+                })
+                conn.request('POST', '/contact/', body, {
+                    'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+            else:
+                conn.request('GET', rng.choice(urls))
+            response = conn.getresponse()
+            response.read()
+            ok = response.status in (200, 304) or (urls is None and response.status == 302)
+            if urls is None and response.getheader('Set-Cookie'):
+                cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        errors += not ok
+    conn.close()
+    return latencies, errors
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_route(port, urls, args):
+    with ProcessPoolExecutor(args.concurrency) as pool:
+        futures = [pool.submit(drive, port, urls, args.duration, n) for n in range(args.concurrency)]
+        results = [future.result() for future in futures]
+    latencies = sorted(sample for samples, _ in results for sample in samples)
+    errors = sum(errors for _, errors in results)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / args.duration, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print per-route deltas; return the routes that regressed."""
+    regressions = []
+    print(f"\n{'route':<22} {'rps was':>7} {'change':>8} {'p95 was':>9} {'change':>8}")
+    for route, now in current['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before:
+            continue
+        rps_delta = (now['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0
+        p95_delta = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        flag = rps_delta < -threshold or p95_delta > threshold
+        if flag:
+            regressions.append(route)
+        print(f"{route:<22} {before['rps']:>7} {rps_delta:>+7.1f}% {before['p95_ms']:>7}ms "
+              f"{p95_delta:>+7.1f}%{'  REGRESSION' if flag else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per route.')
+    parser.add_argument('--routes', help='Comma-separated subset of route names.')
+    parser.add_argument('--page-cache', default='filesystem', choices=['filesystem', 'memory', 'null'])
+    parser.add_argument('--output', default='loadtest-results.json')
+    parser.add_argument('--compare', help='Earlier results file to compare against.')
+    parser.add_argument('--threshold', type=float, default=10, help='Regression threshold in percent.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-loadtest-')
+    smtp = SMTPSink()
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        PAGE_CACHE_BACKEND=args.page_cache,
+        PAGE_CACHE_DIR=os.path.join(workdir, 'page-cache'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'prometheus'),
+        SECRET_KEY='loadtest',
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=str(smtp.server_address[1]),
+        MAIL_USE_TLS='false', MAIL_USE_SSL='false',
+        MAIL_USERNAME='loadtest@example.com', MAIL_PASSWORD='loadtest',
+        CONTACT_RECIPIENTS='inbox@example.com',
+        OUTBOX_POLL_INTERVAL='1', FLASK_APP='wsgi',
+        # The contact route is driven from one address far past any sane limit
+        RATELIMIT_ENABLED='false',
+    )
+
+    print(f'Seeding {args.posts} posts...')
+    seed(env, args.posts)
+
+    # Keep gunicorn off the deployment config in the working directory
+    config = os.path.join(workdir, 'gunicorn.conf.py')
+    open(config, 'w').close()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', config, '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), '--preload', '--log-level', 'warning', 'wsgi:application'],
+        cwd=project_root, env=env)
+    mailer = subprocess.Popen([sys.executable, '-m', 'flask', 'outbox', 'run'], cwd=project_root,
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        routes = discover_routes(port, args.posts)
+        if args.routes:
+            wanted = set(args.routes.split(','))
+            routes = {name: urls for name, urls in routes.items() if name in wanted}
+
+        results = {}
+        print(f"{'route':<22} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+        for name, urls in routes.items():
+            results[name] = stats = run_route(port, urls, args)
+            print(f"{name:<22} {stats['rps']:>8} {stats['p50_ms']:>7}ms {stats['p95_ms']:>7}ms "
+                  f"{stats['p99_ms']:>7}ms {stats['errors']:>7}")
+
+        workers = {str(pid): memory_kb(pid) for pid in worker_pids(server.pid)}
+        for pid, memory in workers.items():
+            print(f"worker {pid}: rss {memory['rss_kb'] // 1024} MiB, peak {memory['peak_rss_kb'] // 1024} MiB")
+
+        posted = results.get('contact.index POST', {}).get('requests', 0)
+        deadline = time.monotonic() + 30
+        while smtp.received < posted and time.monotonic() < deadline:
+            time.sleep(0.5)
+        print(f'mail: {smtp.received} of {posted} contact submissions delivered to the SMTP sink')
+    finally:
+        for process in (server, mailer):
+            process.terminate()
+            process.wait(timeout=30)
+        smtp.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git': subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                                  capture_output=True, text=True).stdout.strip(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'posts': args.posts,
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'page_cache': args.page_cache,
+        },
+        'routes': results,
+        'gunicorn_workers': workers,
+        'mail_delivered': smtp.received,
+    }
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(report, json.load(handle), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} route(s) regressed by more than {args.threshold}%: "
+                  f"{', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Logging under load: the queue-backed handler against writing synchronously.
+
+Boots gunicorn with ``LOG_REQUESTS=true``, so every request writes one
+JSON log record, and drives it with ``--concurrency`` clients for
+``--duration`` seconds per scenario. Each sink is run twice: once with the
+default queue and background listener, and once with ``LOG_QUEUE_SIZE=0``,
+where the request thread writes each record itself, as the old
+``print()`` calls did:
+
+* ``file``: stderr goes to a file, i.e. logging I/O is cheap
+* ``slow``: stderr is a pipe drained at ``--sink-kbps`` KiB/s. This stands
+  in for a log pipeline that cannot keep up, such as a busy journald, a
+  slow disk, or a remote syslog. Once the pipe buffer is full, every
+  synchronous write waits for the reader.
+
+Reports requests/s and latency percentiles per scenario, and for the queue
+how many records were dropped rather than waited for.
+
+Usage:
+    python benchmarks/logging_overhead.py [--concurrency 8] [--duration 10]
+                                          [--sink-kbps 32] [--workers 2]
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from loadtest import free_port, run_route, seed, wait_until_up  # noqa: E402
+
+URLS = ['/about/', '/services/', '/']
+_DROPPED_RE = re.compile(rb'dropped (\d+) records')
+
+
+class SlowReader(threading.Thread):
+    """Drains a pipe at a fixed byte rate until told to hurry up."""
+
+    def __init__(self, fd, rate):
+        super().__init__(daemon=True)
+        self.fd, self.rate = fd, rate
+        self.throttle = True
+        self.received = 0
+        self.dropped = 0
+
+    def run(self):
+        while True:
+            data = os.read(self.fd, 4096)
+            if not data:
+                return
+            self.received += len(data)
+            self.dropped += sum(int(n) for n in _DROPPED_RE.findall(data))
+            if self.throttle:
+                time.sleep(len(data) / self.rate)
+
+
+def scenario(env, workdir, args, sink, queue_size):
+    port = free_port()
+    config = os.path.join(workdir, 'gunicorn.conf.py')
+    command = [sys.executable, '-m', 'gunicorn', '--config', config, '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--log-level', 'warning', 'wsgi:application']
+    env = dict(env, LOG_QUEUE_SIZE=str(queue_size))
+    log_path = os.path.join(workdir, f'{sink}-{queue_size}.log')
+    reader = None
+    if sink == 'file':
+        stderr = open(log_path, 'wb')
+    else:
+        stderr = subprocess.PIPE
+    server = subprocess.Popen(command, cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+    if sink != 'file':
+        reader = SlowReader(server.stderr.fileno(), args.sink_kbps * 1024)
+        reader.start()
+    try:
+        wait_until_up(port)
+        result = run_route(port, URLS, args)
+    finally:
+        if reader:
+            reader.throttle = False
+        server.terminate()
+        server.wait()
+        if reader:
+            reader.join()
+        if sink == 'file':
+            stderr.close()
+    if reader:
+        result['dropped'] = reader.dropped
+    else:
+        with open(log_path, 'rb') as handle:
+            result['dropped'] = sum(int(n) for n in _DROPPED_RE.findall(handle.read()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--sink-kbps', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-logging-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'logging.db')}",
+               PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', SECRET_KEY='logging-benchmark',
+               LOG_REQUESTS='true', MAIL_USERNAME='', MAIL_PASSWORD='')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    # Keep gunicorn off the deployment config in the working directory
+    open(os.path.join(workdir, 'gunicorn.conf.py'), 'w').close()
+
+    results = []
+    try:
+        seed(env, 50)
+        for sink in ('file', 'slow'):
+            for label, queue_size in (('synchronous', 0), ('queue', 10000)):
+                results.append((sink, label, scenario(env, workdir, args, sink, queue_size)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'sink':<6} {'handler':<12} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'dropped':>8}")
+    for sink, label, result in results:
+        print(f"{sink:<6} {label:<12} {result['rps']:>8.1f} {result['p50_ms']:>7.2f}ms "
+              f"{result['p95_ms']:>7.2f}ms {result['p99_ms']:>7.2f}ms {result['dropped']:>8}")
+
+
+if __name__ == '__main__':
+    main()
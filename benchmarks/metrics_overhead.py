@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Metrics overhead benchmark: request latency with and without instrumentation.
+
+Each mode runs in a fresh interpreter (SQLAlchemy event listeners are
+process-wide) against the same seeded SQLite database, with the page cache
+disabled so every request renders. Instrumented runs use multiprocess mode,
+as under gunicorn. Also reports how long a /metrics scrape takes once
+several worker processes have written samples.
+
+Usage:
+    python benchmarks/metrics_overhead.py [--requests 2000] [--workers 9]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+PATHS = ['/health', '/blog/', '/blog/1', '/about/']
+
+
+def seed(app, count=50):
+    from app import db, schema
+    from app.models import Post
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            schema.upgrade(connection)
+        if Post.query.count():
+            return
+        start = datetime(2024, 1, 1)
+        db.session.add_all(
+            Post(title=f'Post {i}', content=f'# Heading\n\nBody of post {i}. ' * 20,
+                 author='Benchmark Bot', date_posted=start + timedelta(days=i))
+            for i in range(count)
+        )
+        db.session.commit()
+
+
+def run_mode(requests):
+    """Child process: time every path, print JSON results."""
+    from app import create_app
+
+    app = create_app()
+    seed(app)
+    client = app.test_client()
+    results = {}
+    for path in PATHS:
+        # Time the page itself, not the redirect from an id-only post URL
+        url = client.get(path).location or path
+        for _ in range(50):
+            client.get(url)
+        samples = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.get(url)
+            samples.append((time.perf_counter() - started) * 1e6)
+        samples.sort()
+        results[path] = (statistics.median(samples), samples[int(len(samples) * 0.95) - 1])
+    print(json.dumps(results))
+
+
+def write_samples(requests):
+    """Child process: record samples like one gunicorn worker would."""
+    from app import create_app
+
+    client = create_app().test_client()
+    for i in range(requests):
+        client.get(PATHS[i % len(PATHS)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=9)
+    parser.add_argument('--child', choices=['time', 'samples'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'time':
+        return run_mode(args.requests)
+    if args.child == 'samples':
+        return write_samples(args.requests)
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-metrics-bench-')
+    base_env = dict(os.environ,
+                    DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                    PAGE_CACHE_BACKEND='null', MAIL_USERNAME='', MAIL_PASSWORD='')
+    multiproc_dir = os.path.join(workdir, 'prometheus')
+
+    def child(mode, env, requests):
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--requests', str(requests)],
+            env=env, check=True, capture_output=True, text=True).stdout
+        return json.loads(output) if output.strip() else None
+
+    off = child('time', dict(base_env, METRICS_ENABLED='false'), args.requests)
+    on = child('time', dict(base_env, METRICS_ENABLED='true', PROMETHEUS_MULTIPROC_DIR=multiproc_dir),
+               args.requests)
+
+    print(f"{'path':<10} {'off p50':>9} {'on p50':>9} {'overhead':>9} {'off p95':>9} {'on p95':>9}")
+    for path in PATHS:
+        (off_p50, off_p95), (on_p50, on_p95) = off[path], on[path]
+        print(f'{path:<10} {off_p50:>7.0f}us {on_p50:>7.0f}us {on_p50 - off_p50:>7.0f}us '
+              f'{off_p95:>7.0f}us {on_p95:>7.0f}us')
+
+    # Scrape cost grows with the number of per-process files to merge
+    env = dict(base_env, METRICS_ENABLED='true', PROMETHEUS_MULTIPROC_DIR=multiproc_dir)
+    for _ in range(args.workers):
+        child('samples', env, 200)
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = multiproc_dir
+    from app import metrics
+
+    samples = []
+    for _ in range(20):
+        started = time.perf_counter()
+        body = metrics.collect()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f'\n/metrics scrape over {args.workers + 1} process files: '
+          f'{statistics.median(samples):.1f}ms, {len(body) // 1024} KiB')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Profiling hook overhead: what ``app/profiling.py`` costs requests that are
+not being profiled.
+
+Times in-process requests through the test client with the page cache
+off (medians over ``--requests``, in a fresh process per configuration):
+
+* ``off``: neither mode configured, so the hook is not installed
+* ``armed``: ``PROFILE_SECRET`` set, requests without an ``X-Profile``
+  header
+* ``sampling``: ``PROFILE_SAMPLE_INTERVAL`` of ``--interval`` seconds
+* ``profiled``: every request carries a valid ``X-Profile`` header, for
+  the cost of the profile itself
+
+Page timings vary by more than the hook can cost, so the hook is also
+timed on its own around a WSGI app that does nothing (``timeit``, best of
+five), which is the number that shows what it adds per request.
+
+Usage:
+    python benchmarks/profiling_overhead.py [--requests 2000] [--interval 0.01]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+URLS = ['/blog/', '/about/', '/contact/']
+
+MEASURE = '''
+import json, statistics, sys, time
+from app import create_app, profiling
+app = create_app()
+client = app.test_client()
+secret = app.config['PROFILE_SECRET']
+profile = sys.argv[2] == 'profiled'
+
+results = {}
+for path in json.loads(sys.argv[3]):
+    headers = {profiling.HEADER: profiling.sign(secret, path, time.time() + 3600)} if profile else None
+    samples = []
+    for n in range(int(sys.argv[1]) + 50):
+        started = time.perf_counter()
+        with client.get(path, headers=headers) as response:
+            response.get_data()
+        if n >= 50:
+            samples.append((time.perf_counter() - started) * 1000)
+    assert response.status_code == 200, (path, response.status_code)
+    results[path] = statistics.median(samples)
+print(json.dumps(results))
+'''
+
+
+def measure(env, mode, requests):
+    output = subprocess.run([sys.executable, '-c', MEASURE, str(requests), mode, json.dumps(URLS)],
+                            cwd=project_root, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def hook_ns(directory, **options):
+    """Nanoseconds the wrapper adds to one call of a WSGI app that does nothing."""
+    from app.profiling import Profiler
+
+    def noop(environ, start_response):
+        return [b'']
+
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/blog/', 'HTTP_ACCEPT': '*/*'}
+    wrapped = Profiler(noop, directory, **options)
+    calls = 200_000
+    bare = min(timeit.repeat(lambda: list(noop(environ, None)), number=calls, repeat=5))
+    hooked = min(timeit.repeat(lambda: list(wrapped(environ, None)), number=calls, repeat=5))
+    if wrapped.sampler:
+        wrapped.sampler.stop()
+    return (hooked - bare) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=0.01)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-profiling-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'profiling.db')}",
+               PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', MAIL_USERNAME='', MAIL_PASSWORD='',
+               RATELIMIT_ENABLED='false', LOG_LEVEL='ERROR', PROFILE_DIR=os.path.join(workdir, 'profiles'))
+    for name in ('PROMETHEUS_MULTIPROC_DIR', 'PROFILE_SECRET', 'PROFILE_SAMPLE_INTERVAL'):
+        env.pop(name, None)
+    modes = {
+        'off': {},
+        'armed': {'PROFILE_SECRET': 'profiling-benchmark'},
+        'sampling': {'PROFILE_SAMPLE_INTERVAL': str(args.interval)},
+        'profiled': {'PROFILE_SECRET': 'profiling-benchmark'},
+    }
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=project_root,
+                       env=dict(env, FLASK_APP='wsgi'), check=True, capture_output=True)
+        results = {mode: measure(dict(env, **extra), mode, args.requests) for mode, extra in modes.items()}
+        hook = {'armed': hook_ns(env['PROFILE_DIR'], secret='profiling-benchmark'),
+                'sampling': hook_ns(env['PROFILE_DIR'], sample_interval=args.interval)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'median':<12}" + ''.join(f'{mode:>12}' for mode in modes))
+    for path in URLS:
+        print(f'{path:<12}' + ''.join(f'{results[mode][path]:>10.3f}ms' for mode in modes))
+    print(f"\nhook alone, per request: armed {hook['armed']:.0f} ns, sampling {hook['sampling']:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
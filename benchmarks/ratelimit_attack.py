@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Rate limit check: concurrent bots against /contact/ under gunicorn.
+
+Boots ``wsgi:application`` with several workers and tight contact limits,
+then runs attacker processes that POST the contact form as fast as they
+can. Each attacker presents one address through ``X-Forwarded-For`` (a few
+of them share one, like a botnet behind NAT); one more attacker rotates
+through fresh addresses to drain the site-wide bucket. A separate client
+posts once a second from its own address, standing in for a real visitor.
+
+It reports, per client address, how many submissions got through against
+the most the buckets allow (capacity plus refill over the run), which
+shows whether the workers share their buckets, and the latency of refused
+versus accepted requests. It also counts the messages that reached the
+outbox. The exit status is 1 if any bucket let more through than it
+allows.
+
+Usage:
+    python benchmarks/ratelimit_attack.py [--workers 3] [--attackers 8]
+                                          [--duration 10] [--per-ip 5/minute]
+                                          [--global 40/minute]
+"""
+
+import argparse
+import http.client
+import os
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from loadtest import free_port, wait_until_up  # noqa: E402
+
+FORM = {
+    'name': 'Bot', 'email': 'bot@example.com', 'subject': 'Spam', 'message': 'Buy now',
+    'language': '', 'proficiency_level': '', 'it_services': '', 'web_development_services': '',
+    'tech_training_services': '',
+}
+
+
+def attack(port, addresses, duration, pause):
+    """Client process: POST the contact form, cycling through ``addresses``."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', '/contact/')
+    response = conn.getresponse()
+    page = response.read().decode()
+    cookie = (response.getheader('Set-Cookie') or '').split(';', 1)[0]
+    token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page).group(1)
+    body = urlencode(dict(FORM, csrf_token=token))
+
+    results = []  # (address, status, seconds)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        address = addresses[len(results) % len(addresses)]
+        started = time.perf_counter()
+        conn.request('POST', '/contact/', body, {
+            'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie,
+            'X-Forwarded-For': address})
+        response = conn.getresponse()
+        response.read()
+        results.append((address, response.status, time.perf_counter() - started))
+        if response.getheader('Set-Cookie'):
+            cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        if pause:
+            time.sleep(pause)
+    conn.close()
+    return results
+
+
+def allowed(rate, duration):
+    from app.ratelimit import parse_rate
+
+    capacity, period = parse_rate(rate)
+    return int(capacity + capacity * duration / period)
+
+
+def percentile_ms(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000 if samples else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--attackers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--per-ip', default='5/minute')
+    parser.add_argument('--global', dest='global_rate', default='40/minute')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-ratelimit-')
+    database = os.path.join(workdir, 'ratelimit-bench.db')
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f'sqlite:///{database}',
+        PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', SECRET_KEY='ratelimit',
+        MAIL_SERVER='127.0.0.1', MAIL_USERNAME='bench@example.com', MAIL_PASSWORD='bench',
+        RATELIMIT_STORAGE='sqlite', RATELIMIT_DB=os.path.join(workdir, 'buckets.db'),
+        RATELIMIT_CONTACT_PER_IP=args.per_ip, RATELIMIT_CONTACT_GLOBAL=args.global_rate,
+        FLASK_APP='wsgi',
+    )
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=project_root, env=env,
+                   check=True, capture_output=True)
+
+    # Keep gunicorn off the deployment config in the working directory
+    config = os.path.join(workdir, 'gunicorn.conf.py')
+    open(config, 'w').close()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', config, '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), '--log-level', 'warning', 'wsgi:application'],
+        cwd=project_root, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        # Pairs of attackers share an address; the last one rotates through new ones
+        clients = [[f'198.51.100.{n // 2 + 1}'] for n in range(args.attackers - 1)]
+        clients.append([f'203.0.113.{n}' for n in range(1, 255)])
+        with ProcessPoolExecutor(len(clients) + 1) as pool:
+            futures = [pool.submit(attack, port, addresses, args.duration, 0) for addresses in clients]
+            visitor = pool.submit(attack, port, ['192.0.2.10'], args.duration, 1.0)
+            results = [result for future in futures for result in future.result()]
+            visitor_results = visitor.result()
+    finally:
+        server.terminate()
+        server.wait()
+
+    per_ip_max = allowed(args.per_ip, args.duration)
+    global_max = allowed(args.global_rate, args.duration)
+    accepted, refused, by_address = [], [], {}
+    for address, status, seconds in results + visitor_results:
+        counts = by_address.setdefault(address, [0, 0])
+        if status == 429:
+            refused.append(seconds)
+            counts[1] += 1
+        else:
+            accepted.append(seconds)
+            counts[0] += 1
+
+    over = []
+    print(f"{'address':<16} {'accepted':>9} {'refused':>8} {'limit':>6}")
+    for address in sorted(by_address, key=lambda a: tuple(int(p) for p in a.split('.'))):
+        ok, no = by_address[address]
+        if ok > per_ip_max:
+            over.append(address)
+        if not address.startswith('203.0.113.'):
+            print(f'{address:<16} {ok:>9} {no:>8} {per_ip_max:>6}{"  OVER" if ok > per_ip_max else ""}')
+    rotating = [by_address[a] for a in by_address if a.startswith('203.0.113.')]
+    print(f"{'rotating (' + str(len(rotating)) + ')':<16} {sum(c[0] for c in rotating):>9} "
+          f"{sum(c[1] for c in rotating):>8}")
+
+    total = len(accepted)
+    with sqlite3.connect(database) as connection:
+        queued = connection.execute('SELECT count(*) FROM mail_outbox').fetchone()[0]
+    print(f'\naccepted {total} of {total + len(refused)} (site-wide limit {global_max}), '
+          f'{queued} messages queued')
+    visitor_ok = sum(status != 429 for _, status, _ in visitor_results)
+    print(f'visitor: {visitor_ok} of {len(visitor_results)} submissions accepted')
+    print(f"refused  p50 {percentile_ms(refused, 0.5):6.1f}ms  p95 {percentile_ms(refused, 0.95):6.1f}ms  "
+          f"({len(refused)} requests)")
+    print(f"accepted p50 {percentile_ms(accepted, 0.5):6.1f}ms  p95 {percentile_ms(accepted, 0.95):6.1f}ms  "
+          f"({len(accepted)} requests)")
+    if refused and accepted:
+        print(f'refusals cost {statistics.median(refused) / statistics.median(accepted):.0%} '
+              f'of an accepted submission')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if over or total > global_max:
+        print('\nFAIL: a bucket let through more than its limit')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Blog search benchmark: FTS5 index vs. the old ILIKE table scan.
+
+Seeds a throwaway SQLite database with synthetic posts at several archive
+sizes and reports the median and p95 latency of each search strategy.
+
+Usage:
+    python benchmarks/search_benchmark.py [--sizes 1000,10000,100000] [--runs 50]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+SYLLABLES = 'ka lo mi ne ra su ti vo ze ba de fi gu ha jo'.split()
+
+TOPIC_WORDS = (
+    'cloud network security python data analytics migration server backup '
+    'support design training language agile devops database mobile api'
+).split()
+
+# Rare, mid-frequency, prefix, common and missing terms
+QUERIES = ['devops', 'cloud migration', 'securi', 'the', 'nonexistentterm']
+
+
+def vocabulary(size=20000):
+    words = ['the', 'and', 'of'] + TOPIC_WORDS
+    rng = random.Random(7)
+    while len(words) < size:
+        words.append(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    # Zipf-like weights, so word frequencies resemble natural text
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def synthetic_posts(count, seed=42):
+    rng = random.Random(seed)
+    words, weights = vocabulary()
+    cum_weights = list(itertools.accumulate(weights))
+    start = datetime(2020, 1, 1)
+    for i in range(count):
+        title = ' '.join(rng.choices(words, cum_weights=cum_weights, k=6)).title()
+        content = '\n'.join(
+            ' '.join(rng.choices(words, cum_weights=cum_weights, k=20)) for _ in range(4)
+        )
+        yield (title, content, 'Benchmark Bot', start + timedelta(minutes=i))
+
+
+def seed(app, count):
+    from sqlalchemy import text
+    from app import db, search
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text('DELETE FROM post'))
+            connection.exec_driver_sql(
+                'INSERT INTO post (title, content, author, date_posted) VALUES (?, ?, ?, ?)',
+                list(synthetic_posts(count)),
+            )
+        search.rebuild_index()
+
+
+def time_call(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-search-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import create_app, db, schema
+    from app.models import Post
+    from app import search
+
+    app = create_app()
+    with app.app_context(), db.engine.begin() as connection:
+        schema.upgrade(connection)
+
+    print(f"{'posts':>8} {'query':<18} {'fts p50':>9} {'fts p95':>9} {'like p50':>9} {'like p95':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        seed(app, size)
+        with app.app_context():
+            for query in QUERIES:
+                def fts():
+                    search.search_posts(query)
+
+                def like():
+                    pattern = f'%{query}%'
+                    Post.query.filter(
+                        Post.title.ilike(pattern) | Post.content.ilike(pattern)
+                    ).order_by(Post.date_posted.desc()).limit(20).all()
+
+                fts_p50, fts_p95 = time_call(fts, args.runs)
+                like_p50, like_p95 = time_call(like, max(5, args.runs // 10))
+                print(f'{size:>8} {query:<18} {fts_p50:>8.2f}ms {fts_p95:>8.2f}ms '
+                      f'{like_p50:>8.2f}ms {like_p95:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
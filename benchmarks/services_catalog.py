@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Services catalog benchmark: the services page and ``/services/api``.
+
+With the page cache off, times in-process requests through the test client
+(medians over ``--requests``):
+
+* ``/services/`` rendered, i.e. what a page cache miss costs
+* ``/services/api``, a full 200 response and a 304 revalidation of the
+  kind a polling widget makes
+
+``--compare REF`` times ``/services/`` on another git revision too (via a
+temporary worktree), e.g. ``--compare HEAD~1`` for the catalog built in
+the view on every request.
+
+Usage:
+    python benchmarks/services_catalog.py [--requests 2000] [--compare REF]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = '''
+import json, statistics, sys, time
+from app import create_app
+app = create_app()
+client = app.test_client()
+
+def median_ms(path, headers=None, expect=200):
+    samples = []
+    for n in range(int(sys.argv[1]) + 50):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        response.get_data()
+        if n >= 50:
+            samples.append((time.perf_counter() - started) * 1000)
+    assert response.status_code == expect, (path, response.status_code)
+    return statistics.median(samples)
+
+results = {'/services/': median_ms('/services/')}
+api = client.get('/services/api')
+if api.status_code == 200:
+    results['/services/api'] = median_ms('/services/api')
+    results['/services/api (304)'] = median_ms('/services/api', {'If-None-Match': api.headers['ETag']}, 304)
+print(json.dumps(results))
+'''
+
+
+def measure(root, env, requests):
+    output = subprocess.run([sys.executable, '-c', MEASURE, str(requests)], cwd=root, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--compare', metavar='REF', help='Git revision to compare against.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-services-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'services.db')}",
+               PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', MAIL_USERNAME='', MAIL_PASSWORD='',
+               LOG_LEVEL='ERROR')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    trees = {'working tree': project_root}
+    try:
+        if args.compare:
+            trees[args.compare] = os.path.join(workdir, 'tree')
+            subprocess.run(['git', 'worktree', 'add', '--detach', trees[args.compare], args.compare],
+                           cwd=project_root, check=True, capture_output=True)
+        results = {name: measure(root, env, args.requests) for name, root in trees.items()}
+    finally:
+        if args.compare:
+            subprocess.run(['git', 'worktree', 'remove', '--force', trees[args.compare]],
+                           cwd=project_root, capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'median':<22}" + ''.join(f'{name:>16}' for name in trees))
+    for path in results['working tree']:
+        print(f'{path:<22}' + ''.join(f'{results[name][path]:>14.3f}ms' if path in results[name]
+                                      else f"{'-':>16}" for name in trees))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+SQLite concurrency check: do blog reads stall while posts are being written?
+
+One writer process keeps inserting batches of posts (each batch one
+transaction, which also updates the search index) while several reader
+processes request blog listing, search and post pages through the app,
+each process standing in for one gunicorn worker. The run is repeated for
+two profiles on fresh databases:
+
+``legacy``
+    rollback journal, ``synchronous=FULL``, reads on the writer engine,
+    i.e. SQLite's defaults.
+``tuned``
+    the shipped profile: WAL, ``synchronous=NORMAL``, mmap, a larger page
+    cache, and reads through the read-only engine.
+
+For each profile it reports reader latency percentiles and worst case,
+failed reads ("database is locked" and similar), and committed batches.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--readers 4] [--duration 10]
+                                            [--posts 2000] [--batch 5000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+PROFILES = {
+    'legacy': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': '0',
+               'SQLITE_CACHE_SIZE': '-2000', 'SQLITE_READ_ENGINE': 'false'},
+    'tuned': {},
+}
+
+READ_PATHS = ['/blog/', '/blog/?search=cloud', '/blog/?search=devops', '/blog/1', '/blog/50']
+
+
+def seed(posts):
+    from search_benchmark import synthetic_posts
+    from app import create_app, db, schema
+    from app.models import Post
+
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            schema.upgrade(connection)
+        db.session.add_all(Post(title=title, content=content, author=author, date_posted=date)
+                           for title, content, author, date in synthetic_posts(posts))
+        db.session.commit()
+
+
+def write(duration, batch):
+    """Child process: commit batches of new posts until the time is up."""
+    from datetime import datetime
+    from app import create_app, db
+    from app.models import Post
+
+    app = create_app()
+    committed, failed, commit_times = 0, 0, []
+    deadline = time.perf_counter() + duration
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                db.session.add_all(
+                    Post(title=f'Load {committed}-{i}', content='cloud devops write load ' * 40,
+                         author='Writer', date_posted=datetime.utcnow())
+                    for i in range(batch))
+                db.session.commit()
+                committed += 1
+                commit_times.append(time.perf_counter() - started)
+            except Exception:
+                db.session.rollback()
+                failed += 1
+    print(json.dumps({'committed': committed, 'failed': failed,
+                      'batch_seconds': statistics.median(commit_times) if commit_times else None}))
+
+
+def read(duration, seed_value):
+    """Child process: fetch read-only pages until the time is up."""
+    import random
+    from app import create_app
+
+    rng = random.Random(seed_value)
+    client = create_app().test_client()
+    # Post pages redirect from their id-only URLs; read the canonical ones
+    paths = [client.get(path).location or path for path in READ_PATHS]
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status = client.get(rng.choice(paths)).status_code
+        except Exception:
+            status = 500
+        latencies.append(time.perf_counter() - started)
+        errors += status != 200
+    print(json.dumps({'latencies': latencies, 'errors': errors}))
+
+
+def run_profile(name, args, workdir):
+    env = dict(os.environ, **PROFILES[name],
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, f'{name}.db')}",
+               PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false',
+               MAIL_USERNAME='', MAIL_PASSWORD='',
+               PYTHONPATH=os.pathsep.join([project_root, os.path.dirname(os.path.abspath(__file__))]))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    script = os.path.abspath(__file__)
+    subprocess.run([sys.executable, script, '--child', 'seed', '--posts', str(args.posts)],
+                   env=env, check=True, capture_output=True)
+
+    def spawn(role, *extra):
+        return subprocess.Popen([sys.executable, script, '--child', role,
+                                 '--duration', str(args.duration), *extra],
+                                env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    readers = [spawn('read', '--seed', str(n)) for n in range(args.readers)]
+    writer = spawn('write', '--batch', str(args.batch))
+    written = json.loads(writer.communicate()[0])
+    reads = [json.loads(reader.communicate()[0]) for reader in readers]
+
+    latencies = sorted(sample * 1000 for result in reads for sample in result['latencies'])
+    return {
+        'reads': len(latencies),
+        'errors': sum(result['errors'] for result in reads),
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'p99': latencies[int(len(latencies) * 0.99)],
+        'max': latencies[-1],
+        **written,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--child', choices=['seed', 'read', 'write'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'seed':
+        return seed(args.posts)
+    if args.child == 'write':
+        return write(args.duration, args.batch)
+    if args.child == 'read':
+        return read(args.duration, args.seed)
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-sqlite-bench-')
+    try:
+        print(f"{'profile':<8} {'reads':>7} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} "
+              f"{'batches':>8} {'failed':>7}")
+        for name in PROFILES:
+            r = run_profile(name, args, workdir)
+            print(f"{name:<8} {r['reads']:>7} {r['errors']:>7} {r['p50']:>7.1f}ms {r['p95']:>7.1f}ms "
+                  f"{r['p99']:>7.1f}ms {r['max']:>7.1f}ms {r['committed']:>8} {r['failed']:>7}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Startup profile: how long a fresh process takes to become able to serve.
+
+Every run is a new interpreter, like a gunicorn worker that was spawned or
+recycled by ``max_requests``. Each run reports the time to import the
+``app`` package, to run ``create_app()``, and to serve the first request.
+Runs are repeated and the medians reported. One extra run under
+``python -X importtime`` lists the modules that cost the most to import.
+
+``--compare REF`` runs the same measurement on another git revision (via a
+temporary worktree), e.g. ``--compare HEAD~1`` to check that a change made
+startup faster.
+
+Usage:
+    python benchmarks/startup_profile.py [--runs 15] [--top 15] [--compare REF]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+SETUP = '''
+from app import create_app, db, schema
+app = create_app()
+with app.app_context(), db.engine.begin() as connection:
+    schema.upgrade(connection)
+'''
+
+BOOT = '''
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+}))
+'''
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def child_env(workdir):
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+               PAGE_CACHE_DIR=os.path.join(workdir, 'page-cache'),
+               MAIL_USERNAME='', MAIL_PASSWORD='')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return env
+
+
+def boot_once(root, env):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', BOOT], cwd=root, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases['process_ms'] = (time.perf_counter() - started) * 1000
+    return phases
+
+
+def measure(trees, runs, workdir):
+    """Median boot phases per tree; runs alternate between trees to share any drift."""
+    envs = {}
+    for name, root in trees.items():
+        envs[name] = child_env(os.path.join(workdir, str(len(envs))))
+        os.makedirs(os.path.dirname(envs[name]['PAGE_CACHE_DIR']), exist_ok=True)
+        subprocess.run([sys.executable, '-c', SETUP], cwd=root, env=envs[name], check=True,
+                       capture_output=True)
+    samples = {name: [] for name in trees}
+    for _ in range(runs):
+        for name, root in trees.items():
+            samples[name].append(boot_once(root, envs[name]))
+    return {name: {phase: statistics.median(run[phase] for run in runs_)
+                   for phase in runs_[0]}
+            for name, runs_ in samples.items()}
+
+
+def import_profile(root, workdir):
+    """Per-module (self, cumulative) import time in ms from ``-X importtime``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT], cwd=root,
+                            env=child_env(workdir), check=True, capture_output=True, text=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)) / 1000, int(match.group(2)) / 1000)
+    return modules
+
+
+def print_profile(modules, top):
+    print(f"\n{'module':<40} {'self':>8} {'cumulative':>11}")
+    ranked = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for name, (own, cumulative) in ranked:
+        print(f'{name:<40} {own:>6.1f}ms {cumulative:>9.1f}ms')
+    packages = {}
+    for name, (own, _) in modules.items():
+        package = name.split('.', 1)[0]
+        packages[package] = packages.get(package, 0) + own
+    print(f"\n{'top-level package':<40} {'total':>8}")
+    for package, total in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f'{package:<40} {total:>6.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--compare', metavar='REF', help='Git revision to compare against.')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-startup-')
+    trees = {'working tree': project_root}
+    try:
+        if args.compare:
+            trees[args.compare] = os.path.join(workdir, 'tree')
+            subprocess.run(['git', 'worktree', 'add', '--detach', trees[args.compare], args.compare],
+                           cwd=project_root, check=True, capture_output=True)
+        results = measure(trees, args.runs, os.path.join(workdir, 'db'))
+        print_profile(import_profile(project_root, os.path.join(workdir, 'db', '0')), args.top)
+
+        print(f"\n{'median of ' + str(args.runs) + ' runs':<20}" + ''.join(f'{name:>16}' for name in trees))
+        for phase in ('import_ms', 'create_app_ms', 'first_request_ms', 'process_ms'):
+            print(f'{phase:<20}' + ''.join(f'{results[name][phase]:>14.1f}ms' for name in trees))
+    finally:
+        if args.compare:
+            subprocess.run(['git', 'worktree', 'remove', '--force', trees[args.compare]],
+                           cwd=project_root, capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+First-request latency of a fresh worker, with and without compiled templates.
+
+Every run is a new interpreter that builds the app the way gunicorn's
+master does under ``preload_app`` and then serves the first request to
+each page, as a freshly forked or recycled worker would. Three modes are
+compared:
+
+* ``cold``: no bytecode cache, nothing warmed; every page pays for parsing
+  and compiling its templates (how workers started before)
+* ``bytecode``: the shared cache has been filled by ``flask templates
+  compile``, so templates are loaded from it instead of compiled
+* ``preload``: ``templating.warm()`` ran in the master (the gunicorn
+  ``when_ready`` hook), so the templates are already in memory
+
+Runs alternate between modes so that drift affects them alike; medians over
+``--runs`` are reported per page, along with a warm second request for
+reference. The page cache is off, so every request renders.
+
+Usage:
+    python benchmarks/template_warmup.py [--runs 15] [--posts 200]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from loadtest import seed  # noqa: E402
+
+PAGES = ['/', '/about/', '/services/', '/contact/', '/blog/', '/blog/1']
+
+WORKER = '''
+import json, sys, time
+from app import create_app, templating
+app = create_app()
+if sys.argv[1] == 'preload':
+    templating.warm(app)
+client = app.test_client()
+results = {}
+for page in sys.argv[2:]:
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        response = client.get(page, follow_redirects=True)
+        response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+    assert response.status_code == 200, (page, response.status_code)
+    results[page] = timings
+print(json.dumps(results))
+'''
+
+
+def run_worker(mode, env):
+    output = subprocess.run([sys.executable, '-c', WORKER, mode, *PAGES], cwd=project_root, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--posts', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-templates-')
+    cache_dir = os.path.join(workdir, 'jinja-cache')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'templates.db')}",
+               PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', RATELIMIT_ENABLED='false',
+               TEMPLATE_CACHE_DIR=cache_dir, MAIL_USERNAME='', MAIL_PASSWORD='', FLASK_APP='wsgi')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    envs = {
+        'cold': dict(env, TEMPLATE_BYTECODE_CACHE='false'),
+        'bytecode': env,
+        'preload': env,
+    }
+    try:
+        seed(env, args.posts)
+        subprocess.run([sys.executable, '-m', 'flask', 'templates', 'compile', '--clear'], cwd=project_root,
+                       env=env, check=True, capture_output=True)
+        samples = {mode: [] for mode in envs}
+        for _ in range(args.runs):
+            for mode, mode_env in envs.items():
+                samples[mode].append(run_worker(mode, mode_env))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'page':<12} " + ' '.join(f'{mode:>10}' for mode in envs) + f" {'2nd request':>12}")
+    totals = {mode: 0.0 for mode in envs}
+    for page in PAGES:
+        medians = {mode: statistics.median(run[page][0] for run in samples[mode]) for mode in envs}
+        warm = statistics.median(run[page][1] for mode in envs for run in samples[mode])
+        for mode in envs:
+            totals[mode] += medians[mode]
+        print(f'{page:<12} ' + ' '.join(f'{medians[mode]:>8.2f}ms' for mode in envs) + f' {warm:>10.2f}ms')
+    print(f"{'all pages':<12} " + ' '.join(f'{totals[mode]:>8.2f}ms' for mode in envs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Time to first byte with and without streamed templates.
+
+Boots two gunicorn servers against the same seeded database, one with
+``STREAM_TEMPLATES=false`` and one with it on. The page cache is off, so
+every request renders. Each page is fetched over a plain socket,
+alternating between the servers so drift affects both alike, and three
+moments are recorded: the first byte, the end of ``<head>`` (when a
+browser can start on the stylesheets), and the last byte. Medians over
+``--requests`` fetches are reported per page.
+
+Usage:
+    python benchmarks/ttfb.py [--posts 500] [--per-page 50] [--requests 200]
+"""
+
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from loadtest import canonical_url, free_port, seed, wait_until_up  # noqa: E402
+
+PAGES = ['/blog/', '/blog/?search=cloud', '/blog/1', '/contact/']
+
+
+def fetch(port, path):
+    """Seconds to the first byte, to ``</head>`` and to the last byte."""
+    started = time.perf_counter()
+    first = head = None
+    received = b''
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        sock.sendall(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+        while True:
+            data = sock.recv(65536)
+            now = time.perf_counter()
+            if not data:
+                break
+            first = first or now
+            received += data
+            if head is None and b'</head>' in received:
+                head = now
+    return first - started, (head or now) - started, now - started
+
+
+def measure(ports, pages, requests):
+    """Median (first, head, last) in ms per mode and page, fetched alternately."""
+    results = {mode: {} for mode in ports}
+    for page in pages:
+        samples = {mode: [] for mode in ports}
+        for n in range(requests + 10):
+            for mode, port in ports.items():
+                sample = fetch(port, pages[page][mode])
+                if n >= 10:
+                    samples[mode].append(sample)
+        for mode in ports:
+            results[mode][page] = [statistics.median(sample[i] for sample in samples[mode]) * 1000
+                                   for i in range(3)]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--per-page', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='zencrow-ttfb-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'ttfb.db')}",
+               PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', SECRET_KEY='ttfb',
+               BLOG_POSTS_PER_PAGE=str(args.per_page), MAIL_USERNAME='', MAIL_PASSWORD='')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    seed(env, args.posts)
+    # Keep gunicorn off the deployment config in the working directory
+    config = os.path.join(workdir, 'gunicorn.conf.py')
+    open(config, 'w').close()
+
+    servers, ports = [], {}
+    try:
+        for mode in ('false', 'true'):
+            ports[mode] = free_port()
+            servers.append(subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '--config', config,
+                 '--bind', f'127.0.0.1:{ports[mode]}', '--workers', '1', '--log-level', 'warning',
+                 'wsgi:application'],
+                cwd=project_root, env=dict(env, STREAM_TEMPLATES=mode), stdout=subprocess.DEVNULL))
+        for port in ports.values():
+            wait_until_up(port)
+        # Post pages redirect from their id-only URLs; fetch the canonical ones
+        pages = {page: {mode: canonical_url(http.client.HTTPConnection('127.0.0.1', port), page)
+                        for mode, port in ports.items()} for page in PAGES}
+        results = measure(ports, pages, args.requests)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'page':<22} {'':>10} {'first byte':>11} {'</head>':>9} {'last byte':>10}")
+    for page in PAGES:
+        for mode, label in (('false', 'buffered'), ('true', 'streamed')):
+            first, head, last = results[mode][page]
+            print(f'{page if mode == "false" else "":<22} {label:>10} {first:>9.2f}ms {head:>7.2f}ms '
+                  f'{last:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -12,14 +12,156 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///zencrow.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # One pooled connection per request thread in each worker (gunicorn `threads`),
+    # plus a little headroom for background work
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', 1)))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 2)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+    # SQLite tuning applied to every connection (see app/database.py)
+    SQLITE_PRAGMAS = {
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -16000)),  # negative: KiB
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+    # Serve read-only pages from a separate read-only engine
+    SQLITE_READ_ENGINE = os.environ.get('SQLITE_READ_ENGINE', 'true').lower() in ('true', '1', 'yes')
+
+    # Blog listing page size
+    BLOG_POSTS_PER_PAGE = int(os.environ.get('BLOG_POSTS_PER_PAGE', 10))
+
+    # Sitemap and Atom feed. SITE_URL (e.g. https://zencrow.com) makes their
+    # absolute links independent of the request, as `flask freeze` needs
+    SITE_URL = os.environ.get('SITE_URL')
+    FEED_POSTS = int(os.environ.get('FEED_POSTS', 20))
+    SITEMAP_SKIP_ENDPOINTS = ['main.health', 'main.health_live', 'main.health_ready', 'main.sitemap',
+                              'blog.feed', 'blog.suggest', 'services.api', 'metrics']
+
+    # Blog search: how many of the newest matches are ranked by relevance. Older
+    # matches are never returned, however relevant: a search that matches more
+    # posts than this only finds the newest ones. Raising it costs a bm25 score
+    # per extra match on every search for a common term
+    SEARCH_CANDIDATE_LIMIT = int(os.environ.get('SEARCH_CANDIDATE_LIMIT', 1000))
+
+    # Search-as-you-type at /blog/suggest, from a prefix index in each worker (app/suggestions.py)
+    SUGGEST_LIMIT = int(os.environ.get('SUGGEST_LIMIT', 6))  # titles, and terms, per response
+    SUGGEST_MAX_POSTS = int(os.environ.get('SUGGEST_MAX_POSTS', 10000))  # newest posts whose titles are indexed
+    SUGGEST_MAX_TERMS = int(os.environ.get('SUGGEST_MAX_TERMS', 5000))
+    SUGGEST_REFRESH_INTERVAL = float(os.environ.get('SUGGEST_REFRESH_INTERVAL', 30))
+    # The frequent terms come from a full scan of the FTS vocabulary, so they are
+    # re-read only this often, or once this many posts have changed since
+    SUGGEST_TERMS_INTERVAL = float(os.environ.get('SUGGEST_TERMS_INTERVAL', 600))
+    SUGGEST_TERMS_AFTER_POSTS = int(os.environ.get('SUGGEST_TERMS_AFTER_POSTS', 50))
     
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
-    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', True)
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'True').lower() in ('true', '1', 'yes')
+    MAIL_USE_SSL = os.environ.get('MAIL_USE_SSL', 'False').lower() in ('true', '1', 'yes')
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_TIMEOUT = int(os.environ.get('MAIL_TIMEOUT', 30))
+
+    # Contact form outbox, drained by `flask outbox run`
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 5))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+    OUTBOX_RETRY_BASE = int(os.environ.get('OUTBOX_RETRY_BASE', 30))
+    OUTBOX_RETRY_MAX = int(os.environ.get('OUTBOX_RETRY_MAX', 3600))
+    OUTBOX_LEASE = int(os.environ.get('OUTBOX_LEASE', 300))
     
+    # Contact form rate limits: token buckets per client address and site-wide,
+    # shared by all workers through an SQLite file (RATELIMIT_STORAGE 'sqlite',
+    # 'memory' for a single process, or 'null'). Rates read like '10/hour'.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE', 'sqlite')
+    RATELIMIT_DB = os.environ.get('RATELIMIT_DB')  # defaults to instance/ratelimit.db
+    RATELIMITS = {
+        'contact': {
+            'per_ip': os.environ.get('RATELIMIT_CONTACT_PER_IP', '10/hour'),
+            'global': os.environ.get('RATELIMIT_CONTACT_GLOBAL', '100/hour'),
+        },
+    }
+
+    # Proxies in front of the app whose X-Forwarded-For/-Proto to trust
+    # (nginx in the shipped deployment; gunicorn only listens on localhost)
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 1))
+    PROXY_FIX_X_PROTO = int(os.environ.get('PROXY_FIX_X_PROTO', 1))
+
+    # Readiness checks behind /health/ready, run in the background per worker;
+    # HEALTH_CHECK_INTERVALS overrides a check's interval in seconds by name
+    HEALTH_CHECK_INTERVALS = {}
+    HEALTH_OUTBOX_MAX_PENDING = int(os.environ.get('HEALTH_OUTBOX_MAX_PENDING', 100))
+    HEALTH_SMTP_TIMEOUT = float(os.environ.get('HEALTH_SMTP_TIMEOUT', 5))
+
+    # Views using render_streamed() send the <head> first, then chunks of
+    # STREAM_CHUNK_SIZE characters; False renders them in one piece again
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', 'true').lower() in ('true', '1', 'yes')
+    STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 16384))
+
+    # Identifies the deployed code; part of every page ETag
+    BUILD_VERSION = os.environ.get('BUILD_VERSION', 'dev')
+
+    # Rendered page cache: 'filesystem' (shared by all workers), 'memory' or 'null'
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'filesystem')
+    PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR')  # defaults to instance/page-cache
+    PAGE_CACHE_DEFAULT_TTL = int(os.environ.get('PAGE_CACHE_DEFAULT_TTL', 300))
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 512))  # memory: per worker
+    PAGE_CACHE_MAX_FILES = int(os.environ.get('PAGE_CACHE_MAX_FILES', 20000))  # filesystem: per host
+
+    # Services catalog (see app/catalog.py); validated when the app starts
+    SERVICES_CATALOG = os.environ.get('SERVICES_CATALOG')  # defaults to app/data/services.json
+
+    # Compiled templates shared by all workers (`flask templates compile` fills it)
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'true').lower() in ('true', '1', 'yes')
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')  # defaults to instance/jinja-cache
+
+    # Static export (`flask freeze`)
+    FREEZE_DIR = os.environ.get('FREEZE_DIR')  # defaults to instance/frozen
+    FREEZE_SKIP_ENDPOINTS = ['main.health', 'main.health_live', 'main.health_ready', 'contact.index',
+                             'services.api', 'blog.suggest', 'metrics']
+    FREEZE_FOLLOW_ARGS = ['after']
+
+    # Static assets (`flask assets build`)
+    PUBLIC_FOLDER = os.environ.get('PUBLIC_FOLDER')  # defaults to <repo>/public
+
+    # Prometheus metrics at /metrics; set PROMETHEUS_MULTIPROC_DIR under gunicorn
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('true', '1', 'yes')
+
+    # Application logging (see app/log.py): JSON lines through a background thread
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # or 'text'
+    LOG_FILE = os.environ.get('LOG_FILE')  # default: stderr, i.e. gunicorn's error log
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # 0: write synchronously
+    LOG_REQUESTS = os.environ.get('LOG_REQUESTS', 'false').lower() in ('true', '1', 'yes')
+    LOG_REDACT_CONFIG = ['SECRET_KEY', 'MAIL_PASSWORD', 'PROFILE_SECRET']
+
+    # SQL query instrumentation (see app/queries.py)
+    QUERY_LOG_ENABLED = os.environ.get('QUERY_LOG_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 100))
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))  # one statement this often: N+1
+    # Most queries one request may run: 'endpoint' for its GETs, 'endpoint?arg' for GETs with
+    # that argument, 'endpoint METHOD' for other methods. `flask queries check` requests the GETs
+    QUERY_BUDGETS = {
+        'main.index': 0, 'main.sitemap': 2, 'about.index': 0, 'services.index': 0, 'services.api': 0,
+        'contact.index': 0, 'contact.index POST': 4,
+        'blog.index': 2, 'blog.index?after': 2, 'blog.index?search': 4,
+        'blog.feed': 3, 'blog.post': 3, 'blog.post_redirect': 1, 'blog.suggest': 0, 'blog.suggest?q': 0,
+    }
+
+    # Profiling (see app/profiling.py); both modes are off unless configured
+    PROFILE_SECRET = os.environ.get('PROFILE_SECRET')  # signs `flask profile sign` headers
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0))  # seconds; 0: off
+    PROFILE_FLUSH_INTERVAL = float(os.environ.get('PROFILE_FLUSH_INTERVAL', 60))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')  # defaults to instance/profiles
+
     # Production settings
     PREFERRED_URL_SCHEME = 'https' if os.environ.get('FLASK_ENV') == 'production' else 'http'
     
@@ -42,6 +184,8 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    RATELIMIT_STORAGE = 'memory'
     
 config = {
     'development': DevelopmentConfig,
@@ -49,6 +49,15 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
+# Fingerprint and precompress static assets; the vendored Bootstrap files come
+# from git (app/static/vendor), so nothing is downloaded here
+echo "🎨 Building static assets..."
+FLASK_APP=wsgi flask assets build
+
+# Compile every template into the shared bytecode cache; stops on syntax errors
+echo "🧩 Compiling templates..."
+FLASK_APP=wsgi flask templates compile --clear
+
 # Create environment file
 echo "⚙️ Creating environment configuration..."
 cat > .env << EOF
@@ -60,10 +69,19 @@ MAIL_PORT=587
 MAIL_USE_TLS=True
 MAIL_USERNAME=your-email@gmail.com
 MAIL_PASSWORD=your-app-password
+SITE_URL=https://zencrow.com
 EOF
 
 echo "⚠️  Please edit .env file with your actual email credentials!"
 
+# Create or migrate the database schema
+echo "🗄️ Migrating database..."
+FLASK_APP=wsgi flask db upgrade
+
+# Count every page's SQL queries against QUERY_BUDGETS; stops on N+1 regressions
+echo "🔎 Checking SQL query budgets..."
+FLASK_APP=wsgi flask queries check
+
 # Create log directories
 echo "📝 Creating log directories..."
 sudo mkdir -p /var/log/gunicorn
@@ -73,6 +91,7 @@ sudo chown ec2-user:ec2-user /var/log/gunicorn
 echo "📋 Copying configuration files..."
 sudo cp deployment/nginx.conf /etc/nginx/conf.d/zencrow.conf
 sudo cp deployment/zencrow.service /etc/systemd/system/
+sudo cp deployment/zencrow-mailer.service /etc/systemd/system/
 sudo cp deployment/gunicorn.conf.py /home/ec2-user/zencrow-website/
 
 # Configure Nginx
@@ -93,8 +112,8 @@ sudo firewall-cmd --reload
 # Enable and start the application service
 echo "🚀 Starting application service..."
 sudo systemctl daemon-reload
-sudo systemctl enable zencrow
-sudo systemctl start zencrow
+sudo systemctl enable zencrow zencrow-mailer
+sudo systemctl start zencrow zencrow-mailer
 
 # Check service status
 echo "📊 Checking service status..."
@@ -9,6 +9,9 @@ backlog = 2048
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "sync"
+# More than one thread switches to gthread; the database pools size themselves
+# from the same variable (DB_POOL_SIZE in config.py)
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -21,7 +24,8 @@ max_requests_jitter = 50
 accesslog = "/var/log/gunicorn/access.log"
 errorlog = "/var/log/gunicorn/error.log"
 loglevel = "info"
-access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+# Ends with the request time in seconds and the app's request id (see app/log.py)
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" %(L)s %({x-request-id}o)s'
 
 # Process naming
 proc_name = "zencrow"
@@ -46,3 +50,33 @@ reload = False
 
 # Ensure proper Python path
 pythonpath = os.path.dirname(os.path.abspath(__file__))
+
+# Metrics: every worker writes its samples here and /metrics merges them.
+# Must be set before the app (and prometheus_client) is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(pythonpath, 'instance', 'prometheus'))
+
+
+def on_starting(server):
+    from app import metrics
+    metrics.prune_dead_processes()
+
+
+def when_ready(server):
+    # The app is already loaded in the master with preload_app: compile every
+    # template now so that workers fork with them in memory
+    if server.cfg.preload_app:
+        from app import templating
+        templating.warm(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Run the readiness checks once and start their thread before this worker
+    # accepts connections, so its first /health/ready is not a 503
+    from app import health
+    health.get(worker.wsgi).ensure_running()
+
+
+def child_exit(server, worker):
+    from app import metrics
+    metrics.mark_process_dead(worker.pid)
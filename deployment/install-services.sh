@@ -44,12 +44,17 @@ SyslogIdentifier=zencrow
 WantedBy=multi-user.target
 EOF
 
+# Mail sender that drains the contact form outbox
+echo "📋 Creating zencrow-mailer service..."
+sed "s#/home/ec2-user/zencrow-website#$APP_DIR#g" deployment/zencrow-mailer.service | \
+    sudo tee /etc/systemd/system/zencrow-mailer.service > /dev/null
+
 # Reload systemd
 sudo systemctl daemon-reload
 
 # Enable and start zencrow
-sudo systemctl enable zencrow
-sudo systemctl start zencrow
+sudo systemctl enable zencrow zencrow-mailer
+sudo systemctl start zencrow zencrow-mailer
 
 # Wait a moment
 sleep 2
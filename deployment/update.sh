@@ -10,8 +10,10 @@ echo "🔄 Starting Zencrow Website Update..."
 # Navigate to application directory
 cd /home/ec2-user/zencrow-website
 
-# Pull latest changes
+# Pull latest changes; the root gunicorn.conf.py is the copy of
+# deployment/gunicorn.conf.py made below, so drop it first or the pull stops on it
 echo "📥 Pulling latest changes from Git..."
+git checkout -- gunicorn.conf.py
 git pull origin main
 
 # Activate virtual environment
@@ -23,14 +25,57 @@ echo "📚 Updating Python dependencies..."
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# Restart the application service
-echo "🚀 Restarting application service..."
-sudo systemctl restart zencrow
+# Stamp the build so page ETags change with every deploy
+echo "🏷️ Recording build version..."
+sed -i '/^BUILD_VERSION=/d' .env
+echo "BUILD_VERSION=$(git rev-parse --short HEAD)" >> .env
+
+# Apply schema migrations before the new code starts serving
+echo "🗄️ Migrating database..."
+FLASK_APP=wsgi flask db upgrade
+
+# Fingerprint and precompress static assets for the new build; the vendored Bootstrap files come
+# from git (app/static/vendor), so nothing is downloaded here
+echo "🎨 Building static assets..."
+FLASK_APP=wsgi flask assets build
+
+# Compile every template into the shared bytecode cache; stops on syntax errors
+echo "🧩 Compiling templates..."
+FLASK_APP=wsgi flask templates compile --clear
+
+# Count every page's SQL queries against QUERY_BUDGETS; stops on N+1 regressions
+echo "🔎 Checking SQL query budgets..."
+FLASK_APP=wsgi flask queries check
+
+# Re-copy the gunicorn config, service unit and nginx site; a restart alone
+# keeps running whatever copies deploy.sh installed the first time
+echo "📋 Copying configuration files..."
+cp deployment/gunicorn.conf.py .
+sudo cp deployment/zencrow.service /etc/systemd/system/
+# Keep the domain deploy.sh (or you) put into the installed nginx site
+DOMAIN=$(sed -n 's/^ *server_name \([^ ;]*\).*/\1/p' /etc/nginx/conf.d/zencrow.conf | head -n 1)
+sudo cp deployment/nginx.conf /etc/nginx/conf.d/zencrow.conf
+if [ -n "$DOMAIN" ]; then
+    sudo sed -i "s/your-domain.com/$DOMAIN/g" /etc/nginx/conf.d/zencrow.conf
+fi
+sudo nginx -t
+sudo systemctl reload nginx
+
+# Install the mail worker unit; servers set up before it existed get it enabled here
+echo "📋 Installing mail worker service..."
+sudo cp deployment/zencrow-mailer.service /etc/systemd/system/
+sudo systemctl daemon-reload
+sudo systemctl enable --now zencrow-mailer
+
+# Restart the application and the mail worker so both run the new code
+echo "🚀 Restarting application services..."
+sudo systemctl restart zencrow zencrow-mailer
 
 # Check service status
 echo "📊 Checking service status..."
 sudo systemctl status zencrow --no-pager
+sudo systemctl status zencrow-mailer --no-pager
 
 echo "✅ Update completed successfully!"
 echo "🌐 Your application is now running the latest version"
-echo "📝 Check logs with: sudo journalctl -u zencrow -f"
+echo "📝 Check logs with: sudo journalctl -u zencrow -u zencrow-mailer -f"
@@ -58,6 +58,19 @@ else
     exit 1
 fi
 
+# Workers run the readiness checks at boot; retry while the service is still starting
+for attempt in 1 2 3 4 5; do
+    READY_RESPONSE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost:8000/health/ready)
+    [ "$READY_RESPONSE" == "200" ] && break
+    sleep 2
+done
+if [ "$READY_RESPONSE" == "200" ]; then
+    echo "   ✅ Readiness checks passing (HTTP $READY_RESPONSE)"
+else
+    echo "   ⚠️  Readiness probe returned HTTP $READY_RESPONSE:"
+    curl -s http://localhost:8000/health/ready | python3 -m json.tool 2>/dev/null
+fi
+
 # Test main page through Nginx
 echo "6. Testing main page through Nginx..."
 MAIN_RESPONSE=$(curl -s -o /dev/null -w "%{http_code}" http://localhost/)
@@ -109,4 +109,67 @@ document.addEventListener('DOMContentLoaded', () => {
     // Initial render
     handleResize();
     animate();
-});
\ No newline at end of file
+});
+
+document.addEventListener('DOMContentLoaded', () => {
+    // Search-as-you-type on the blog search box
+    const input = document.querySelector('input[data-suggest-url]');
+    if (!input) return;
+
+    const list = document.createElement('div');
+    list.className = 'suggest-list list-group shadow-sm';
+    list.hidden = true;
+    input.closest('.search-form').appendChild(list);
+
+    let timer = null;
+    let pending = null;
+
+    const hide = () => {
+        list.hidden = true;
+        list.replaceChildren();
+    };
+
+    const item = (text, href, muted) => {
+        const link = document.createElement('a');
+        link.className = 'list-group-item list-group-item-action' + (muted ? ' text-muted' : '');
+        link.href = href;
+        link.textContent = text;
+        return link;
+    };
+
+    const render = (data) => {
+        const searchUrl = input.form.action;
+        const items = data.posts.map((post) => item(post.title, post.url, false));
+        data.terms.forEach((term) => {
+            items.push(item(term, searchUrl + '?search=' + encodeURIComponent(term), true));
+        });
+        list.replaceChildren(...items);
+        list.hidden = items.length === 0;
+    };
+
+    const fetchSuggestions = () => {
+        const query = input.value.trim();
+        if (pending) pending.abort();
+        if (query.length < 2) {
+            hide();
+            return;
+        }
+        pending = new AbortController();
+        fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(query), {signal: pending.signal})
+            .then((response) => (response.ok ? response.json() : {posts: [], terms: []}))
+            .then(render)
+            .catch((error) => {
+                if (error.name !== 'AbortError') hide();
+            });
+    };
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(fetchSuggestions, 200);
+    });
+    input.addEventListener('keydown', (event) => {
+        if (event.key === 'Escape') hide();
+    });
+    // Let a click on a suggestion land before the list goes away
+    input.addEventListener('blur', () => setTimeout(hide, 150));
+});
@@ -3,4 +3,8 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # Development convenience; deployments run `flask db upgrade` explicitly
+    from app import db, schema
+    with app.app_context(), db.engine.begin() as connection:
+        schema.upgrade(connection)
     app.run(debug=True)
@@ -0,0 +1,88 @@
+"""Shared fixtures: an app on a fresh SQLite file for every test.
+
+``Config`` reads the environment when it is imported, so the settings that
+must never reach real services are set here first. Individual tests change
+``Config`` attributes through :func:`make_app` before the app is created.
+"""
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update(
+    DATABASE_URL='sqlite://', SECRET_KEY='tests', MAIL_USERNAME='', MAIL_PASSWORD='',
+    PAGE_CACHE_BACKEND='null', METRICS_ENABLED='false', RATELIMIT_STORAGE='memory',
+    LOG_LEVEL='WARNING', LOG_QUEUE_SIZE='0', LOG_FORMAT='text', TEMPLATE_BYTECODE_CACHE='false',
+    SITE_URL='http://localhost',
+)
+for name in ('PROMETHEUS_MULTIPROC_DIR', 'PROFILE_SECRET', 'PROFILE_SAMPLE_INTERVAL'):
+    os.environ.pop(name, None)
+
+from app import create_app, db, schema  # noqa: E402
+from app.models import Post  # noqa: E402
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """``make_app(**config)``: a migrated app with ``config`` applied to ``Config``."""
+    apps = []
+
+    def make(**config):
+        monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'zencrow.db'}")
+        monkeypatch.setattr(Config, 'RATELIMIT_DB', str(tmp_path / 'ratelimit.db'))
+        monkeypatch.setattr(Config, 'PAGE_CACHE_DIR', str(tmp_path / 'page-cache'))
+        for name, value in config.items():
+            monkeypatch.setattr(Config, name, value)
+        app = create_app()
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            with db.engine.begin() as connection:
+                schema.upgrade(connection)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        app.extensions['read_engine'].dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add_posts(app):
+    """``add_posts(n)``: commit ``n`` posts, newest last; returns their ids."""
+    def add(count, title='Cloud migration notes', **fields):
+        start = datetime(2024, 1, 1)
+        with app.app_context():
+            posts = [Post(title=f'{title} {n}', content=f'Post {n} about cloud and devops.', author='Tests',
+                          date_posted=start + timedelta(days=n), **fields) for n in range(count)]
+            db.session.add_all(posts)
+            db.session.commit()
+            return [post.id for post in posts]
+    return add
+
+
+@pytest.fixture
+def app_log(caplog):
+    """Records of the app's loggers, which do not propagate to the root logger."""
+    logger = logging.getLogger('app')
+    logger.addHandler(caplog.handler)
+    yield caplog
+    logger.removeHandler(caplog.handler)
@@ -0,0 +1,58 @@
+"""Vendored third-party files: pins, offline checks and template URLs."""
+import json
+import os
+
+import pytest
+
+from app import assets
+
+CSS = 'bootstrap/bootstrap.min.css'
+
+
+@pytest.fixture
+def static(app, tmp_path):
+    """Point the app's static folder at an empty directory."""
+    app.static_folder = str(tmp_path / 'static')
+    return tmp_path / 'static' / assets.VENDOR_DIR
+
+
+def vendor_file(static, name, data, pinned=None):
+    path = static / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    lock_path = static / assets.VENDOR_LOCK
+    lock = json.loads(lock_path.read_text()) if lock_path.exists() else {}
+    lock[name] = {'url': assets.VENDOR_ASSETS[name], 'integrity': assets._integrity(pinned or data)}
+    lock_path.write_text(json.dumps(lock))
+
+
+def test_unpinned_files_are_not_downloaded(app, static, monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError('downloaded without a pin')
+
+    monkeypatch.setattr('urllib.request.urlopen', no_network)
+    with pytest.raises(ValueError, match='not pinned'):
+        assets.vendor(app)
+
+
+def test_check_reports_missing_unpinned_and_changed_files(app, static):
+    vendor_file(static, CSS, b'.btn{}')
+    vendor_file(static, 'bootstrap/bootstrap.bundle.min.js', b'tampered', pinned=b'original')
+    problems = assets.check_vendor(app)
+    assert CSS not in problems
+    assert problems['bootstrap/bootstrap.bundle.min.js'].startswith('does not match sha384-')
+    assert problems['bootstrap-icons/bootstrap-icons.css'] == 'missing'
+
+    (static / 'bootstrap-icons').mkdir()
+    (static / 'bootstrap-icons' / 'bootstrap-icons.css').write_text('.bi{}')
+    assert assets.check_vendor(app)['bootstrap-icons/bootstrap-icons.css'].startswith('not pinned')
+
+
+def test_vendor_urls_are_resolved_once(app, static):
+    vendor_file(static, CSS, b'.btn{}')
+    vendor_url = assets._vendor_url_function(app)
+    os.remove(static / CSS)  # later changes on disk are not looked up per render
+    with app.test_request_context():
+        assert vendor_url(CSS) == f'/static/{assets.VENDOR_DIR}/{CSS}'
+        assert vendor_url('bootstrap/bootstrap.bundle.min.js') == \
+            assets.VENDOR_ASSETS['bootstrap/bootstrap.bundle.min.js']
@@ -0,0 +1,129 @@
+"""`flask blog import` and `export`: batches, conflicts and what they store."""
+import csv
+import json
+import sqlite3
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+from app import bulk, db, search
+from app.models import Post
+
+DERIVED = ('slug', 'excerpt', 'content_html', 'word_count', 'reading_minutes')
+BODY = 'Moving a **legacy** service to the cloud, one step at a time. ' * 40
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows), encoding='utf-8')
+    return str(path)
+
+
+def run(app, *args):
+    result = app.test_cli_runner().invoke(args=['blog', *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def stored(app):
+    with app.app_context():
+        return {post.title: post for post in db.session.query(Post).order_by(Post.id)}
+
+
+def fts_rows(app):
+    with app.app_context():
+        return db.session.execute(text(f'SELECT rowid, title, content FROM {search.FTS_TABLE} '
+                                       'ORDER BY rowid')).all()
+
+
+def test_duplicates_in_a_batch_collapse_to_the_last(app, tmp_path):
+    rows = [{'title': 'Cloud notes', 'date_posted': '2024-03-01T09:00:00', 'content': f'Draft {n}'}
+            for n in range(3)]
+    rows.append({'title': 'Other post', 'date_posted': '2024-03-02T09:00:00', 'content': 'Other'})
+    output = run(app, 'import', write_jsonl(tmp_path / 'posts.jsonl', rows))
+    assert 'Inserted 2, updated 0, skipped 2' in output
+    assert stored(app)['Cloud notes'].content == 'Draft 2'
+
+
+def test_existing_posts_are_updated_or_skipped(app, tmp_path):
+    first = [{'title': 'Cloud notes', 'date_posted': '2024-03-01T09:00:00', 'content': 'First version'}]
+    run(app, 'import', write_jsonl(tmp_path / 'first.jsonl', first))
+    original = stored(app)['Cloud notes']
+
+    second = [dict(first[0], content='Second version, about **devops**.')]
+    path = write_jsonl(tmp_path / 'second.jsonl', second)
+    assert 'Inserted 0, updated 0, skipped 1' in run(app, 'import', path, '--on-conflict', 'skip')
+    assert stored(app)['Cloud notes'].content == 'First version'
+
+    assert 'Inserted 0, updated 1, skipped 0' in run(app, 'import', path)
+    updated = stored(app)['Cloud notes']
+    assert updated.id == original.id
+    assert '<strong>devops</strong>' in updated.content_html
+    assert updated.updated_at > original.updated_at
+    assert fts_rows(app) == [(original.id, 'Cloud notes', second[0]['content'])]
+
+
+def test_imported_posts_match_orm_posts(app, tmp_path):
+    with app.app_context():
+        db.session.add(Post(title='Cloud, step by step', content=BODY, author='Tests',
+                            date_posted=datetime(2024, 1, 1)))
+        db.session.commit()
+    run(app, 'import', write_jsonl(tmp_path / 'posts.jsonl', [
+        {'title': 'Cloud, step by step!', 'content': BODY, 'author': 'Tests',
+         'date_posted': '2024-01-02T00:00:00'}]))
+
+    orm, imported = stored(app).values()
+    for name in DERIVED:
+        assert getattr(imported, name) == getattr(orm, name), name
+    assert imported.reading_minutes > 1
+    assert imported.updated_at == imported.date_posted
+    assert fts_rows(app) == [(orm.id, orm.title, BODY), (imported.id, imported.title, BODY)]
+
+
+def test_csv_export_round_trips(app, add_posts, tmp_path):
+    add_posts(5)
+    before = stored(app)
+    exported = tmp_path / 'posts.csv'
+    run(app, 'export', str(exported))
+    with open(exported, newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    assert [row['title'] for row in rows] == list(before)
+    assert list(rows[0]) == list(bulk.FIELDS)
+
+    assert 'Inserted 0, updated 0, skipped 5' in run(app, 'import', str(exported), '--on-conflict', 'skip')
+    with app.app_context():
+        db.session.query(Post).delete()
+        db.session.execute(text(f'DELETE FROM {search.FTS_TABLE}'))
+        db.session.commit()
+    assert 'Inserted 5, updated 0, skipped 0' in run(app, 'import', str(exported))
+    after = stored(app)
+    for title, post in before.items():
+        for name in bulk.FIELDS + DERIVED:
+            assert getattr(after[title], name) == getattr(post, name), (title, name)
+
+
+def test_post_written_during_an_import_is_indexed_once(app):
+    # Another writer commits a post between the conflict lookup and the batch's INSERT
+    path = app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')
+
+    def racing_writer(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO post ') and not raced:
+            raced.append(1)
+            other = sqlite3.connect(path)
+            with other:
+                post_id = other.execute("INSERT INTO post (title, content, date_posted, updated_at) "
+                                        "VALUES ('Racer', 'Racing body', '2024-01-01', '2024-01-01')").lastrowid
+                other.execute(f'INSERT INTO {search.FTS_TABLE}(rowid, title, content) '
+                              "VALUES (?, 'Racer', 'Racing body')", (post_id,))
+            other.close()
+
+    raced = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', racing_writer)
+        try:
+            bulk.import_records(db.engine, [{'title': f'Imported {n}', 'content': 'Body'} for n in range(3)])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', racing_writer)
+    assert raced
+    posts = {post.id: post.title for post in stored(app).values()}
+    assert {rowid: title for rowid, title, _ in fts_rows(app)} == posts
+    assert len(fts_rows(app)) == 4
@@ -0,0 +1,71 @@
+"""The rendered page cache: keys, bypasses and purges."""
+import pytest
+
+from app import db
+from app.cache import FileSystemBackend
+from app.models import Post
+
+
+@pytest.fixture(params=['memory', 'filesystem'])
+def app(request, make_app):
+    return make_app(PAGE_CACHE_BACKEND=request.param)
+
+
+def test_second_request_is_a_hit(app, client, add_posts):
+    add_posts(2)
+    first = client.get('/blog/')
+    assert first.headers['X-Cache'] == 'MISS'
+    first.get_data()  # streamed pages are stored once sent in full
+    assert client.get('/blog/').headers['X-Cache'] == 'HIT'
+
+
+def test_encoded_separator_does_not_collide(app, client, add_posts):
+    # "after=X%26search%3Dcloud" is one argument, not "after=X&search=cloud"
+    add_posts(3, title='Cloud')
+    client.get('/blog/?after=X%26search%3Dcloud').get_data()
+    search = client.get('/blog/?after=X&search=cloud')
+    assert search.headers['X-Cache'] == 'MISS'
+    assert b'Search results for' in search.get_data()
+
+
+def test_argument_order_shares_an_entry(app, client, add_posts):
+    add_posts(3)
+    client.get('/blog/?search=cloud&after=X').get_data()
+    assert client.get('/blog/?after=X&search=cloud').headers['X-Cache'] == 'HIT'
+
+
+def test_unknown_arguments_are_not_cached(app, client):
+    for n in range(3):
+        response = client.get(f'/about/?nonce={n}')
+        assert response.status_code == 200
+        assert 'X-Cache' not in response.headers
+    assert app.extensions['page_cache'].backend.entry_count() == 0
+
+
+def test_post_change_purges_blog_pages(app, client, add_posts):
+    post_id, = add_posts(1)
+    client.get('/blog/').get_data()
+    with app.app_context():
+        db.session.get(Post, post_id).title = 'Renamed post'
+        db.session.commit()
+    response = client.get('/blog/')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert b'Renamed post' in response.get_data()
+
+
+def test_filesystem_backend_keeps_at_most_max_entries(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), max_entries=10)
+    for n in range(35):
+        backend.set('blog', f'/blog/?search={n}', (200, [], b'page'), ttl=60 + n)
+    assert backend.entry_count() <= 10
+    # The entries closest to expiry went first
+    assert backend.get('blog', '/blog/?search=34') is not None
+    assert backend.get('blog', '/blog/?search=0') is None
+
+
+def test_sweep_deletes_expired_entries(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), max_entries=100)
+    backend.set('pages', '/about/', (200, [], b'page'), ttl=-1)
+    backend.set('pages', '/services/', (200, [], b'page'), ttl=60)
+    assert backend.sweep() == 1
+    assert backend.entry_count() == 1
@@ -0,0 +1,59 @@
+"""The services catalog: validation errors name the field, and /services/api."""
+import copy
+import json
+import os
+
+import pytest
+
+from app import catalog
+
+
+@pytest.fixture(scope='module')
+def document():
+    with open(os.path.join(os.path.dirname(catalog.__file__), 'data', 'services.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def broken(document, change):
+    document = copy.deepcopy(document)
+    change(document)
+    return document
+
+
+@pytest.mark.parametrize('change, message', [
+    (lambda doc: doc['services'][1].pop('title'), 'services[1].title: must be a non-empty string'),
+    (lambda doc: doc.pop('services'), 'services: must be a list'),
+    (lambda doc: doc['services'][0]['plans'][1].update(price=299),
+     'services[0].plans[1].price: must be a non-empty string'),
+    (lambda doc: doc['services'][2].update(features='Hosting'), 'services[2].features: must be a list'),
+    (lambda doc: doc['services'][0]['plans'][0]['features'].append(''),
+     'services[0].plans[0].features: must be a list of non-empty strings'),
+    (lambda doc: doc['services'][2].update(id=doc['services'][0]['id']),
+     'services[2].id: duplicate "it-support"'),
+    (lambda doc: doc['services'][1].update(color='teal'), 'services[1].color: must be one of primary,'),
+], ids=['missing', 'missing-list', 'wrong-type', 'not-a-list', 'empty-item', 'duplicate-id', 'unknown-color'])
+def test_errors_name_the_field(document, change, message):
+    with pytest.raises(catalog.CatalogError) as error:
+        catalog.parse(broken(document, change))
+    assert str(error.value).startswith(message)
+
+
+def test_load_names_the_file(document, tmp_path):
+    path = tmp_path / 'services.json'
+    path.write_text(json.dumps(broken(document, lambda doc: doc['services'][1].update(color='teal'))))
+    with pytest.raises(catalog.CatalogError, match=r'services\.json: services\[1\]\.color: .*not "teal"'):
+        catalog.load(str(path))
+
+
+def test_api_serves_the_catalog_with_etag_and_cors(app, client):
+    response = client.get('/services/api')
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    assert response.headers['Access-Control-Allow-Origin'] == '*'
+    with app.app_context():
+        assert response.get_data() == catalog.get().json
+        assert response.headers['ETag'].strip('W/"') == catalog.get().etag
+    assert response.get_json()['services'][0]['id'] == 'it-support'
+
+    again = client.get('/services/api', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304 and not again.get_data()
+    assert again.headers['Access-Control-Allow-Origin'] == '*'
@@ -0,0 +1,137 @@
+"""ETag and Last-Modified change exactly when the content of a page does."""
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+
+from app import db, queries
+from app.models import Lead, Post
+
+
+def fetch(client, url, **kwargs):
+    # Read streamed pages in full, as a server would, so their request context ends
+    response = client.get(url, **kwargs)
+    response.get_data()
+    return response
+
+
+def revalidate(client, url, response):
+    return fetch(client, url, headers={'If-None-Match': response.headers['ETag'],
+                                       'If-Modified-Since': response.headers['Last-Modified']})
+
+
+def edit_post(app, post_id, **fields):
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        for name, value in fields.items():
+            setattr(post, name, value)
+        db.session.commit()
+
+
+def post_url(client, post_id):
+    return client.get(f'/blog/{post_id}').location
+
+
+def test_listing_has_validators_and_answers_304(client, add_posts):
+    add_posts(3)
+    first = fetch(client, '/blog/')
+    assert first.status_code == 200
+    assert first.headers['ETag'] and first.headers['Last-Modified']
+    assert 'no-cache' in first.headers['Cache-Control']
+
+    again = revalidate(client, '/blog/', first)
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert not again.get_data()
+
+
+def test_if_modified_since_alone_answers_304(client, add_posts):
+    add_posts(2)
+    first = fetch(client, '/blog/feed.xml')
+    again = fetch(client, '/blog/feed.xml', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert again.status_code == 304
+
+
+def test_unrelated_change_keeps_304(app, client, add_posts):
+    first_id, second_id = add_posts(2)
+    listing = fetch(client, '/blog/')
+    url = post_url(client, first_id)
+    page = fetch(client, url)
+
+    # A contact lead and an edit of another post leave this post's page as it was
+    with app.app_context():
+        db.session.add(Lead(name='Visitor', email='visitor@example.com', subject='Hello', message='Hi'))
+        db.session.commit()
+    assert revalidate(client, '/blog/', listing).status_code == 304
+    edit_post(app, second_id, title='Another title')
+    assert revalidate(client, url, page).status_code == 304
+
+
+def test_post_edit_changes_validators(app, client, add_posts):
+    post_id, = add_posts(1)
+    url = post_url(client, post_id)
+    listing, page, feed = fetch(client, '/blog/'), fetch(client, url), fetch(client, '/blog/feed.xml')
+
+    edit_post(app, post_id, content='Rewritten from scratch.')
+    for old, target in ((listing, '/blog/'), (page, url), (feed, '/blog/feed.xml')):
+        fresh = revalidate(client, target, old)
+        assert fresh.status_code == 200, target
+        assert fresh.headers['ETag'] != old.headers['ETag']
+
+
+def test_deleted_post_changes_listing_etag(app, client, add_posts):
+    first_id, _ = add_posts(2)
+    listing = fetch(client, '/blog/')
+    with app.app_context():
+        db.session.delete(db.session.get(Post, first_id))
+        db.session.commit()
+    assert revalidate(client, '/blog/', listing).status_code == 200
+
+
+def test_validators_share_one_query(client, add_posts):
+    # ETag, Last-Modified and the feed's <updated> all come from one lookup
+    add_posts(2)
+    for url in ('/blog/', '/blog/feed.xml', '/sitemap.xml'):
+        fetch(client, url)
+        with queries.capture() as log:
+            fetch(client, url)
+        assert sum('max(post.updated_at)' in query.statement for query in log.queries) == 1, url
+
+
+STATIC_PAGES = [('/', 'main/index.html'), ('/about/', 'about/index.html'),
+                ('/services/', 'services/_service.html')]
+
+
+def edit_template(app, name, edit):
+    """Serve ``name`` with ``edit`` applied to its source, as a deploy would ship it."""
+    env = app.jinja_env
+    source, _, _ = env.loader.get_source(env, name)
+    env.loader = ChoiceLoader([DictLoader({name: edit(source)}), env.loader])
+
+
+@pytest.mark.parametrize('url', [url for url, _ in STATIC_PAGES])
+def test_static_page_answers_304_until_the_build_changes(make_app, url):
+    client = make_app().test_client()
+    first = fetch(client, url)
+    assert first.status_code == 200
+    again = fetch(client, url, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and not again.get_data()
+
+    # Another worker of the same build agrees; a new build does not
+    assert fetch(make_app().test_client(), url).headers['ETag'] == first.headers['ETag']
+    rebuilt = fetch(make_app(BUILD_VERSION='next').test_client(), url,
+                    headers={'If-None-Match': first.headers['ETag']})
+    assert rebuilt.status_code == 200 and rebuilt.headers['ETag'] != first.headers['ETag']
+
+
+@pytest.mark.parametrize('url, template', STATIC_PAGES)
+def test_static_page_etag_follows_its_templates(make_app, url, template):
+    before = fetch(make_app().test_client(), url).headers['ETag']
+
+    app = make_app()
+    edit_template(app, template, lambda source: source + '\n<!-- edited -->\n')
+    edited = fetch(app.test_client(), url, headers={'If-None-Match': before})
+    assert edited.status_code == 200 and edited.headers['ETag'] != before
+
+    # The shared layout is part of every page's chain
+    app = make_app()
+    edit_template(app, 'base.html', lambda source: source.replace('</body>', '<!-- edited --></body>'))
+    assert fetch(app.test_client(), url).headers['ETag'] != before
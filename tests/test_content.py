@@ -0,0 +1,86 @@
+"""Derived post fields: computed on write, and by `flask blog backfill`."""
+from sqlalchemy import text
+
+from app import content, db
+from app.models import Post
+from app.signals import posts_changed
+
+DERIVED = ('slug', 'excerpt', 'content_html', 'word_count', 'reading_minutes')
+
+
+def test_derive_fields():
+    body = '# Moving to the cloud\n\n- **Plan** the move\n- Run `terraform apply`\n---\n' + 'word ' * 400
+    fields = content.derive_fields('Café & Cloud: 2024 edition!', body)
+    assert fields['slug'] == 'cafe-cloud-2024-edition'
+    assert fields['word_count'] == 410
+    assert fields['reading_minutes'] == 3
+    assert fields['excerpt'].startswith('Moving to the cloud Plan the move Run terraform apply word')
+    assert fields['excerpt'].endswith('word…') and len(fields['excerpt']) <= content.EXCERPT_LENGTH + 1
+    assert ('<ul class="mb-3">\n<li class="mb-2"><strong>Plan</strong> the move</li>\n'
+            '<li class="mb-2">Run <code>terraform apply</code></li>\n</ul>\n<hr class="my-4">') in fields['content_html']
+
+
+def test_derive_fields_escapes_and_falls_back():
+    fields = content.derive_fields('¿¡', 'Short <script>alert(1)</script>')
+    assert fields['slug'] == 'post'
+    assert fields['reading_minutes'] == 1 and fields['excerpt'] == 'Short <script>alert(1)</script>'
+    assert fields['content_html'] == '<p class="mb-3">Short &lt;script&gt;alert(1)&lt;/script&gt;</p>'
+
+
+def test_fields_follow_edits(app, add_posts):
+    post_id, = add_posts(1)
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        assert post.slug == 'cloud-migration-notes-0' and post.updated_at == post.date_posted
+        post.author = 'Someone else'
+        db.session.commit()
+        assert post.updated_at == post.date_posted
+
+        post.title, post.content = 'Renamed', 'A **new** body.'
+        db.session.commit()
+        assert post.slug == 'renamed' and post.content_html == '<p class="mb-3">A <strong>new</strong> body.</p>'
+        assert post.excerpt == 'A new body.' and post.word_count == 3
+        assert post.updated_at > post.date_posted
+
+
+def stored(app):
+    with app.app_context():
+        return {post.id: {name: getattr(post, name) for name in DERIVED} for post in db.session.query(Post)}
+
+
+def backfill(app, *args):
+    announced = []
+
+    def receiver(sender, **extra):
+        announced.append(sender)
+
+    with posts_changed.connected_to(receiver, app):
+        result = app.test_cli_runner().invoke(args=['blog', 'backfill', *args])
+    assert result.exit_code == 0, result.output
+    return result.output, bool(announced)
+
+
+def test_backfill_fills_missing_fields(app, add_posts):
+    ids = add_posts(5)
+    expected = stored(app)
+    with app.app_context():
+        db.session.execute(text('UPDATE post SET content_html = NULL, excerpt = NULL, word_count = NULL, '
+                                'reading_minutes = NULL, slug = NULL WHERE id IN (:first, :last)'),
+                           {'first': ids[0], 'last': ids[-1]})
+        db.session.commit()
+
+    assert backfill(app) == ('Updated 2 posts.\n', True)
+    assert stored(app) == expected
+    assert backfill(app) == ('Updated 0 posts.\n', False)
+
+
+def test_backfill_all_rederives_every_post(app, add_posts):
+    add_posts(3)
+    expected = stored(app)
+    with app.app_context():
+        # As if the renderer had changed since the posts were written
+        db.session.execute(text("UPDATE post SET content_html = 'stale', word_count = 0"))
+        db.session.commit()
+    assert backfill(app)[0] == 'Updated 0 posts.\n'
+    assert backfill(app, '--all') == ('Updated 3 posts.\n', True)
+    assert stored(app) == expected
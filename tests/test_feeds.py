@@ -0,0 +1,79 @@
+"""Content of /sitemap.xml and the blog's Atom feed."""
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Post
+
+SITEMAP = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SITE_URL='https://zencrow.example', FEED_POSTS=3)
+
+
+def document(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return ElementTree.fromstring(response.get_data())
+
+
+def edit_post(app, post_id, **fields):
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        for name, value in fields.items():
+            setattr(post, name, value)
+        db.session.commit()
+
+
+def test_sitemap_lists_pages_then_posts(app, client, add_posts):
+    ids = add_posts(4)
+    edit_post(app, ids[1], title='Renamed post', updated_at=datetime(2024, 6, 30, 12))
+    urls = [(url.findtext(f'{SITEMAP}loc'), url.findtext(f'{SITEMAP}lastmod'))
+            for url in document(client, '/sitemap.xml')]
+
+    pages = [loc for loc, lastmod in urls if lastmod is None]
+    assert pages == sorted(pages)
+    assert {'https://zencrow.example/', 'https://zencrow.example/about/', 'https://zencrow.example/blog/',
+            'https://zencrow.example/services/', 'https://zencrow.example/contact/'} <= set(pages)
+    assert not any(skipped in loc for loc in pages
+                   for skipped in ('/health', '/sitemap.xml', '/feed.xml', '/suggest', '/api', '/metrics'))
+
+    # Posts follow the pages, oldest id first, each with its last change
+    assert urls[len(pages):] == [
+        (f'https://zencrow.example/blog/{ids[0]}/cloud-migration-notes-0', '2024-01-01'),
+        (f'https://zencrow.example/blog/{ids[1]}/renamed-post', '2024-06-30'),
+        (f'https://zencrow.example/blog/{ids[2]}/cloud-migration-notes-2', '2024-01-03'),
+        (f'https://zencrow.example/blog/{ids[3]}/cloud-migration-notes-3', '2024-01-04'),
+    ]
+
+
+def test_feed_has_the_newest_entries(app, client, add_posts):
+    ids = add_posts(5)
+    edit_post(app, ids[0], content='An **old** post, rewritten.', updated_at=datetime(2024, 7, 1, 8, 30))
+    feed = document(client, '/blog/feed.xml')
+
+    assert feed.findtext(f'{ATOM}updated') == '2024-07-01T08:30:00Z'
+    assert feed.find(f'{ATOM}link[@rel="self"]').get('href') == 'https://zencrow.example/blog/feed.xml'
+    entries = feed.findall(f'{ATOM}entry')
+    # FEED_POSTS of them, newest published first; the edited old post is not among them
+    assert [entry.findtext(f'{ATOM}title') for entry in entries] == [
+        'Cloud migration notes 4', 'Cloud migration notes 3', 'Cloud migration notes 2']
+
+    newest = entries[0]
+    assert newest.findtext(f'{ATOM}id') == f'https://zencrow.example/blog/{ids[4]}'
+    assert newest.find(f'{ATOM}link').get('href') == \
+        f'https://zencrow.example/blog/{ids[4]}/cloud-migration-notes-4'
+    assert newest.findtext(f'{ATOM}published') == newest.findtext(f'{ATOM}updated') == '2024-01-05T00:00:00Z'
+    assert newest.findtext(f'{ATOM}author/{ATOM}name') == 'Tests'
+    assert newest.findtext(f'{ATOM}summary') == 'Post 4 about cloud and devops.'
+    assert newest.findtext(f'{ATOM}content') == '<p class="mb-3">Post 4 about cloud and devops.</p>'
+
+
+def test_empty_blog(client):
+    assert document(client, '/blog/feed.xml').findall(f'{ATOM}entry') == []
+    assert all(url.findtext(f'{SITEMAP}lastmod') is None for url in document(client, '/sitemap.xml'))
@@ -0,0 +1,22 @@
+"""The nginx snippet written next to a static export."""
+import os
+import re
+
+from app.freeze import write_nginx_snippet
+
+SITE_CONF = os.path.join(os.path.dirname(__file__), os.pardir, 'deployment', 'nginx.conf')
+
+
+def proxy_headers(conf):
+    return re.findall(r'^\s*(proxy_set_header .*;)', conf, re.MULTILINE)
+
+
+def test_snippet_proxies_with_the_site_headers(tmp_path):
+    with open(SITE_CONF) as site:
+        expected = proxy_headers(site.read())
+    with open(write_nginx_snippet(str(tmp_path))) as snippet:
+        conf = snippet.read()
+    blocks = re.findall(r'location[^{]*\{[^}]*proxy_pass[^}]*\}', conf)
+    assert len(blocks) == 2
+    for block in blocks:
+        assert proxy_headers(block) == expected
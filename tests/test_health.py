@@ -0,0 +1,20 @@
+"""Readiness probes answer from checks started at worker boot."""
+from app import health
+
+
+def test_first_readiness_probe_is_ready(client):
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    checks = response.get_json()['checks']
+    assert checks['database']['ok'] and checks['migrations']['ok']
+
+
+def test_readiness_does_not_start_the_checks(app):
+    monitor = health.get(app)
+    assert monitor.readiness()[0] == 'starting'
+    assert monitor._thread is None
+
+    with app.test_request_context():
+        app.preprocess_request()  # what the first request or post_worker_init does
+    assert monitor._thread.is_alive()
+    assert monitor.readiness()[0] in ('ready', 'degraded')
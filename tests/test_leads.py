@@ -0,0 +1,115 @@
+"""Lead daily counts follow every insert, update and delete; recount and export."""
+import csv
+from datetime import date, datetime
+
+from sqlalchemy import update
+
+from app import db
+from app.models import Lead, LeadDailyCount
+
+
+def lead(created_at, **segments):
+    return Lead(name='Visitor', email='visitor@example.com', subject='Hello', message='Hi',
+                created_at=created_at, **segments)
+
+
+def add_leads(app, *leads):
+    with app.app_context():
+        db.session.add_all(leads)
+        db.session.commit()
+        return [added.id for added in leads]
+
+
+def counts(app):
+    """``{(day, segment, value): count}``, leaving out rows that went back to zero."""
+    with app.app_context():
+        return {(row.day, row.segment, row.value): row.count
+                for row in db.session.query(LeadDailyCount) if row.count}
+
+
+def run(app, *args):
+    result = app.test_cli_runner().invoke(args=['leads', *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+MAY_1, MAY_2 = date(2024, 5, 1), date(2024, 5, 2)
+
+
+def test_inserts_are_counted_per_day_and_segment(app):
+    add_leads(app, lead(datetime(2024, 5, 1, 9), language='python', it_services='cloud'),
+              lead(datetime(2024, 5, 1, 23, 59), language='python'),
+              lead(datetime(2024, 5, 2, 0, 0)))
+    assert counts(app) == {
+        (MAY_1, 'total', ''): 2, (MAY_1, 'language', 'python'): 2, (MAY_1, 'it_services', 'cloud'): 1,
+        (MAY_2, 'total', ''): 1,
+    }
+
+
+def test_updates_move_and_deletes_remove_counts(app):
+    first_id, second_id = add_leads(app, lead(datetime(2024, 5, 1, 9), language='python'),
+                                    lead(datetime(2024, 5, 1, 10), language='python'))
+    with app.app_context():
+        moved = db.session.get(Lead, first_id)
+        moved.language, moved.created_at = 'javascript', datetime(2024, 5, 2, 8)
+        db.session.get(Lead, second_id).subject = 'Not a counted field'
+        db.session.commit()
+    assert counts(app) == {
+        (MAY_1, 'total', ''): 1, (MAY_1, 'language', 'python'): 1,
+        (MAY_2, 'total', ''): 1, (MAY_2, 'language', 'javascript'): 1,
+    }
+
+    with app.app_context():
+        db.session.delete(db.session.get(Lead, second_id))
+        db.session.get(Lead, first_id).language = None
+        db.session.commit()
+    assert counts(app) == {(MAY_2, 'total', ''): 1}
+
+
+def test_rolled_back_changes_leave_the_counts(app):
+    lead_id, = add_leads(app, lead(datetime(2024, 5, 1, 9), language='python'))
+    before = counts(app)
+    with app.app_context():
+        db.session.add(lead(datetime(2024, 5, 1, 10), language='python'))
+        db.session.get(Lead, lead_id).language = 'javascript'
+        db.session.flush()
+        db.session.rollback()
+        db.session.delete(db.session.get(Lead, lead_id))
+        db.session.flush()
+        db.session.rollback()
+    assert counts(app) == before
+
+
+def test_recount_reproduces_the_counts(app):
+    add_leads(app, *(lead(datetime(2024, 5, day, hour), language=('python', 'java')[hour % 2],
+                          proficiency_level='beginner' if day == 1 else None)
+                     for day in (1, 2, 3) for hour in (8, 13, 17)))
+    with app.app_context():
+        db.session.delete(db.session.query(Lead).first())
+        db.session.commit()
+    expected = counts(app)
+    with app.app_context():
+        # Drift, as after a bulk change made outside the ORM
+        db.session.execute(update(LeadDailyCount).values(count=LeadDailyCount.count + 5))
+        db.session.commit()
+    assert counts(app) != expected
+
+    assert 'Recounted 8 leads.' in run(app, 'recount')
+    assert counts(app) == expected
+
+
+def test_export_honours_the_date_bounds(app, tmp_path):
+    inside = add_leads(app, lead(datetime(2024, 5, 1, 0, 0)), lead(datetime(2024, 5, 2, 12)),
+                       lead(datetime(2024, 5, 3, 23, 59, 59)))
+    add_leads(app, lead(datetime(2024, 4, 30, 23, 59, 59)), lead(datetime(2024, 5, 4, 0, 0)))
+    path = tmp_path / 'leads.csv'
+    run(app, 'export', str(path), '--since', '2024-05-01', '--until', '2024-05-03', '--batch-size', '2')
+    with open(path, newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    assert [int(row['id']) for row in rows] == inside
+    assert rows[0]['created_at'] == '2024-05-01 00:00:00'
+
+    run(app, 'export', str(path), '--since', '2024-05-03')
+    with open(path, newline='', encoding='utf-8') as file:
+        assert [row['created_at'] for row in csv.DictReader(file)] == ['2024-05-03 23:59:59',
+                                                                      '2024-05-04 00:00:00']
@@ -0,0 +1,28 @@
+"""Prometheus metrics at /metrics."""
+
+
+def sample(text, name, **labels):
+    wanted = name + '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+    for line in text.splitlines():
+        if line.startswith(wanted + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_page_cache_hits_and_misses_are_exported(make_app):
+    app = make_app(METRICS_ENABLED=True, PAGE_CACHE_BACKEND='memory')
+    client = app.test_client()
+    before = client.get('/metrics').get_data(as_text=True)
+    before_stats = app.extensions['page_cache'].stats()['groups'].get('pages', {'hit': 0, 'miss': 0})
+    for _ in range(3):
+        client.get('/about/').get_data()
+    after = client.get('/metrics').get_data(as_text=True)
+
+    def delta(result):
+        name = 'zencrow_page_cache_requests_total'
+        return (sample(after, name, group='pages', result=result)
+                - sample(before, name, group='pages', result=result))
+
+    assert (delta('hit'), delta('miss')) == (2, 1)
+    stats = app.extensions['page_cache'].stats()['groups']['pages']
+    assert (stats['hit'] - before_stats['hit'], stats['miss'] - before_stats['miss']) == (2, 1)
@@ -0,0 +1,147 @@
+"""The outbox worker against a local aiosmtpd server."""
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from app import db, outbox
+from app.models import OutboxMessage
+
+
+class Recorder:
+    """Accepts mail, except for the refusing addresses; remembers each session."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('busy@'):
+            return '451 Try again later'
+        if address.startswith('nobody@'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos, envelope.content))
+        return '250 Message accepted'
+
+
+def authenticate(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=auth_data.password == b'secret')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    controller = Controller(Recorder(), hostname='127.0.0.1', port=free_port(), auth_require_tls=False,
+                            authenticator=authenticate)
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+@pytest.fixture
+def app(make_app, smtp_server):
+    return make_app(MAIL_SERVER=smtp_server.hostname, MAIL_PORT=smtp_server.port, MAIL_USE_TLS=False,
+                    MAIL_TIMEOUT=5, OUTBOX_RETRY_BASE=30)
+
+
+def queue(app, *recipients):
+    with app.app_context():
+        messages = [outbox.enqueue(f'Lead {n}', 'site@example.com', [recipient], 'Hello')
+                    for n, recipient in enumerate(recipients)]
+        db.session.commit()
+        return [message.id for message in messages]
+
+
+def drain(app, **config):
+    app.config.update(config)
+    with app.app_context():
+        return outbox.drain(outbox.SMTPConnection(app.config))
+
+
+def message(app, message_id):
+    with app.app_context():
+        return db.session.get(OutboxMessage, message_id)
+
+
+def test_batch_is_sent_over_one_session(app, smtp_server):
+    ids = queue(app, *[f'owner{n}@example.com' for n in range(5)])
+    assert drain(app) == {'sent': 5, 'retried': 0, 'dead': 0, 'deferred': 0}
+    received = smtp_server.handler.messages
+    assert len(received) == 5
+    assert len({peer for peer, _, _ in received}) == 1
+    assert all(message(app, message_id).status == OutboxMessage.SENT for message_id in ids)
+    assert b'Message-ID: ' + message(app, ids[0]).message_id.encode() in received[0][2]
+
+
+def test_temporary_failure_is_retried_with_backoff(app, smtp_server):
+    message_id, = queue(app, 'busy@example.com')
+    before = datetime.utcnow()
+    assert drain(app)['retried'] == 1
+    retried = message(app, message_id)
+    assert retried.status == OutboxMessage.PENDING and retried.attempts == 1
+    assert '451' in retried.last_error
+    # OUTBOX_RETRY_BASE with up to 20% jitter; not due again until then
+    assert before + timedelta(seconds=23) < retried.next_attempt_at < before + timedelta(seconds=37)
+    assert drain(app)['retried'] == 0
+
+    with app.app_context():
+        db.session.get(OutboxMessage, message_id).next_attempt_at = before
+        db.session.commit()
+    drain(app)
+    assert message(app, message_id).attempts == 2
+    assert message(app, message_id).next_attempt_at - before > timedelta(seconds=47)
+
+
+def test_permanent_failure_is_dead_lettered(app, smtp_server):
+    dead_id, sent_id = queue(app, 'nobody@example.com', 'owner@example.com')
+    assert drain(app) == {'sent': 1, 'retried': 0, 'dead': 1, 'deferred': 0}
+    dead = message(app, dead_id)
+    assert dead.status == OutboxMessage.DEAD and dead.attempts == 1 and '550' in dead.last_error
+    assert message(app, sent_id).status == OutboxMessage.SENT
+
+
+@pytest.mark.parametrize('config', [
+    {'MAIL_USERNAME': 'site', 'MAIL_PASSWORD': 'wrong'},  # 535 from login
+    {'MAIL_PORT': 1},  # nothing listening
+], ids=['bad-login', 'unreachable'])
+def test_connection_failure_defers_the_batch(app, smtp_server, config):
+    ids = queue(app, 'owner@example.com', 'sales@example.com', 'support@example.com')
+    assert drain(app, **config) == {'sent': 0, 'retried': 0, 'dead': 0, 'deferred': 3}
+    for message_id in ids:
+        deferred = message(app, message_id)
+        assert deferred.status == OutboxMessage.PENDING and deferred.attempts == 0
+        assert deferred.next_attempt_at > datetime.utcnow()
+    assert smtp_server.handler.messages == []
+
+
+def test_login_with_good_credentials_sends(app, smtp_server):
+    queue(app, 'owner@example.com')
+    assert drain(app, MAIL_USERNAME='site', MAIL_PASSWORD='secret')['sent'] == 1
+
+
+def test_expired_lease_is_reclaimed(app):
+    stale_id, live_id = queue(app, 'owner@example.com', 'sales@example.com')
+    now = datetime.utcnow()
+    with app.app_context():
+        # A worker died holding the first claim; another still holds the second
+        db.session.get(OutboxMessage, stale_id).status = OutboxMessage.SENDING
+        db.session.get(OutboxMessage, stale_id).locked_until = now - timedelta(seconds=1)
+        db.session.get(OutboxMessage, live_id).status = OutboxMessage.SENDING
+        db.session.get(OutboxMessage, live_id).locked_until = now + timedelta(seconds=300)
+        db.session.commit()
+
+        claimed = outbox.claim_batch(10, lease=300)
+        assert [claimed_message.id for claimed_message in claimed] == [stale_id]
+        assert claimed[0].locked_until > now
+        # Nobody else can take it while the new lease runs
+        assert outbox.claim_batch(10, lease=300) == []
@@ -0,0 +1,95 @@
+"""Per-request query budgets, capture() and assert_max_queries()."""
+import pytest
+
+from app import queries
+from config import Config
+
+FORM = {
+    'name': 'Visitor', 'email': 'visitor@example.com', 'subject': 'Hello', 'message': 'Hi',
+    'language': '', 'proficiency_level': '', 'it_services': '', 'web_development_services': '',
+    'tech_training_services': '',
+}
+
+
+def budget_warnings(records):
+    return [record.getMessage() for record in records if 'budget' in record.getMessage()]
+
+
+def test_budget_for_picks_method_and_variant():
+    budgets = {'blog.index': 3, 'blog.index?search': 5, 'blog.index?after': 3, 'contact.index': 0,
+               'contact.index POST': 4}
+    assert queries.budget_for(budgets, 'blog.index', 'GET', {}) == ('blog.index', 3)
+    assert queries.budget_for(budgets, 'blog.index', 'GET', {'search': 'x'}) == ('blog.index?search', 5)
+    # The largest matching variant applies
+    both = {'after': 'c', 'search': 'x'}
+    assert queries.budget_for(budgets, 'blog.index', 'GET', both) == ('blog.index?search', 5)
+    assert queries.budget_for(budgets, 'blog.index', 'HEAD', {'utm': 'x'}) == ('blog.index', 3)
+    assert queries.budget_for(budgets, 'contact.index', 'POST', {}) == ('contact.index POST', 4)
+    assert queries.budget_for(budgets, 'blog.index', 'POST', {}) == ('blog.index POST', None)
+
+
+def test_capture_records_statements(client, add_posts):
+    add_posts(3)
+    client.get('/blog/').get_data()
+    with queries.capture() as log:
+        client.get('/blog/').get_data()
+    assert log.count == 2
+    assert all(query.statement.lstrip().upper().startswith('SELECT') for query in log.queries)
+    assert all(query.duration >= 0 for query in log.queries)
+
+
+def test_assert_max_queries_fails_with_the_statements(client, add_posts):
+    add_posts(3)
+    client.get('/blog/?search=cloud').get_data()  # the first request also runs the health checks
+    with queries.assert_max_queries(Config.QUERY_BUDGETS['blog.index?search']):
+        client.get('/blog/?search=cloud').get_data()
+    with pytest.raises(AssertionError, match=r'(?s)4 queries, expected at most 2:.*SELECT'):
+        with queries.assert_max_queries(2):
+            client.get('/blog/?search=cloud').get_data()
+
+
+@pytest.mark.parametrize('url', ['/', '/about/', '/services/', '/services/api', '/contact/',
+                                 '/blog/suggest?q=cl'])
+def test_static_pages_run_no_queries(client, add_posts, url):
+    add_posts(2)
+    client.get(url).get_data()
+    with queries.assert_max_queries(0):
+        client.get(url).get_data()
+
+
+def test_normal_traffic_logs_no_budget_warnings(make_app, add_posts, app_log):
+    app = make_app(RATELIMIT_ENABLED=False)
+    client = app.test_client()
+    add_posts(3)
+    client.get('/blog/?search=cloud').get_data()
+    client.get('/blog/?search=cloud&after=X').get_data()
+    with client.post('/contact/', data=FORM) as response:
+        assert response.status_code == 302
+    assert budget_warnings(app_log.records) == []
+
+
+def test_over_budget_variant_is_logged(make_app, add_posts, app_log):
+    app = make_app(QUERY_BUDGETS=dict(Config.QUERY_BUDGETS, **{'blog.index?search': 2}))
+    add_posts(3)
+    app.test_client().get('/blog/?search=cloud').get_data()
+    assert budget_warnings(app_log.records) == ['blog.index?search ran 4 queries, budget 2']
+
+
+def test_check_requests_variants_with_arguments(app, add_posts):
+    add_posts(15)
+    results = {result.key: result for result in queries.check(app)}
+    assert 'search=' in results['blog.index?search'].url
+    assert 'after=' in results['blog.index?after'].url
+    assert 'q=' in results['blog.suggest?q'].url
+    assert 'blog.post_redirect' in results
+    assert 'contact.index POST' not in results
+    assert [key for key, result in results.items() if result.count > result.budget or result.repeats] == []
+    # The search really matched: its snippets add queries over the plain listing
+    assert results['blog.index?search'].count > results['blog.index'].count
+
+
+def test_check_reports_search_over_budget(make_app, add_posts):
+    app = make_app(QUERY_BUDGETS=dict(Config.QUERY_BUDGETS, **{'blog.index?search': 3}))
+    add_posts(3)
+    over = [result.key for result in queries.check(app) if result.count > result.budget]
+    assert over == ['blog.index?search']
@@ -0,0 +1,85 @@
+"""Contact form rate limits hold under concurrent attackers.
+
+benchmarks/ratelimit_attack.py runs the same attack against gunicorn and
+reports latencies; these tests check that no bucket lets through more than
+it allows, across threads and across worker processes.
+"""
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from app.ratelimit import SQLiteStore, parse_rate
+
+FORM = {
+    'name': 'Bot', 'email': 'bot@example.com', 'subject': 'Spam', 'message': 'Buy now',
+    'language': '', 'proficiency_level': '', 'it_services': '', 'web_development_services': '',
+    'tech_training_services': '',
+}
+
+
+def spend(path, attempts):
+    """Worker process: try to take ``attempts`` tokens from one shared bucket."""
+    store = SQLiteStore(path, timeout=10)
+    buckets = [('contact:ip:198.51.100.1', 5, 3600)]
+    return sum(store.acquire(buckets, time.time()) == 0 for _ in range(attempts))
+
+
+def test_parse_rate():
+    assert parse_rate('10/hour') == (10, 3600)
+    assert parse_rate('5 / 10 minutes') == (5, 600)
+    with pytest.raises(ValueError):
+        parse_rate('often')
+
+
+def test_worker_processes_share_buckets(tmp_path):
+    path = str(tmp_path / 'buckets.db')
+    SQLiteStore(path).acquire([('warm-up', 1, 1)], time.time())  # create the file once
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        accepted = pool.starmap(spend, [(path, 20)] * 4)
+    assert sum(accepted) == 5
+
+
+@pytest.fixture
+def limited_app(make_app):
+    return make_app(RATELIMIT_STORAGE='sqlite',
+                    RATELIMITS={'contact': {'per_ip': '5/hour', 'global': '12/hour'}})
+
+
+def post_from(app, address, attempts, statuses):
+    client = app.test_client()
+    for _ in range(attempts):
+        with client.post('/contact/', data=FORM, headers={'X-Forwarded-For': address}) as response:
+            statuses.append((address, response.status_code, response.headers.get('Retry-After')))
+
+
+def test_concurrent_attackers_get_no_more_than_the_limit(limited_app):
+    statuses = []
+    # Pairs of attackers share an address, like clients behind one NAT
+    attackers = [threading.Thread(target=post_from, args=(limited_app, f'198.51.100.{n // 2}', 8, statuses))
+                 for n in range(4)]
+    for attacker in attackers:
+        attacker.start()
+    for attacker in attackers:
+        attacker.join()
+
+    for address in ('198.51.100.0', '198.51.100.1'):
+        accepted = [status for addr, status, _ in statuses if addr == address and status != 429]
+        assert accepted == [302] * 5, address
+    refused = [retry for _, status, retry in statuses if status == 429]
+    assert refused and all(retry and int(retry) > 0 for retry in refused)
+
+
+def test_site_wide_bucket_stops_rotating_addresses(limited_app):
+    statuses = []
+    for n in range(20):
+        post_from(limited_app, f'203.0.113.{n}', 1, statuses)
+    assert sum(status != 429 for _, status, _ in statuses) == 12
+
+
+def test_visitor_unaffected_by_attacker(limited_app):
+    statuses = []
+    post_from(limited_app, '198.51.100.7', 10, statuses)
+    post_from(limited_app, '192.0.2.10', 1, statuses)
+    assert statuses[-1][1] != 429
@@ -0,0 +1,73 @@
+"""Blog search: bm25 ranking of the newest matches, paged by (rank, rowid)."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app import db, search
+from app.models import Post
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SEARCH_CANDIDATE_LIMIT=6)
+
+
+@pytest.fixture
+def posts(app, add_posts):
+    """Eight matches, the oldest the most relevant, and one post that does not match."""
+    with app.app_context():
+        oldest = Post(title='Kubernetes, Kubernetes, Kubernetes', content='Kubernetes ' * 20,
+                      author='Tests', date_posted=datetime(2023, 1, 1))
+        db.session.add(oldest)
+        db.session.commit()
+        oldest_id = oldest.id
+    others = add_posts(7, title='Kubernetes notes')
+    add_posts(1, title='Unrelated')
+    return [oldest_id] + others
+
+
+def search_all(app, query, per_page):
+    """Every page of a search, following the cursors; and the cursors."""
+    ids, cursors, after = [], [], None
+    with app.test_request_context():
+        while True:
+            page, snippets = search.search_posts(query, per_page=per_page, after=after)
+            assert set(snippets) == {post.id for post in page.items}
+            ids.extend(post.id for post in page.items)
+            if page.next_cursor is None:
+                return ids, cursors
+            cursors.append(after := page.next_cursor)
+
+
+def bm25_order(app, candidates):
+    with app.app_context():
+        rows = db.session.execute(text(
+            f'SELECT rowid FROM (SELECT rowid, rank FROM {search.FTS_TABLE} '
+            f"WHERE {search.FTS_TABLE} MATCH 'kubernetes' ORDER BY rowid DESC LIMIT :candidates) "
+            'ORDER BY rank, rowid'), {'candidates': candidates}).all()
+    return [row.rowid for row in rows]
+
+
+def test_pages_follow_the_ranking(app, posts):
+    app.config['SEARCH_CANDIDATE_LIMIT'] = 100
+    ids, cursors = search_all(app, 'kubernetes', per_page=3)
+    assert ids == bm25_order(app, 100)
+    assert ids[0] == posts[0] and sorted(ids) == sorted(posts)
+    assert len(cursors) == 2 and len(set(cursors)) == 2
+
+
+def test_only_the_newest_candidates_are_ranked(app, posts):
+    ids, _ = search_all(app, 'kubernetes', per_page=4)
+    # The oldest match would rank first, but falls outside the six newest
+    assert ids == bm25_order(app, 6)
+    assert sorted(ids) == sorted(posts[-6:]) and posts[0] not in ids
+
+
+def test_cursor_resumes_after_its_row(app, posts):
+    app.config['SEARCH_CANDIDATE_LIMIT'] = 100
+    ids, cursors = search_all(app, 'kubernetes', per_page=3)
+    with app.test_request_context():
+        page, _ = search.search_posts('kubernetes', per_page=3, after=cursors[0])
+        assert [post.id for post in page.items] == ids[3:6]
+        assert search.search_posts('kubernetes', per_page=3, after='not a cursor')[0].items[0].id == ids[0]
@@ -0,0 +1,115 @@
+"""Blog reads keep working while posts are being written (WAL and the read-only engine).
+
+benchmarks/sqlite_concurrency.py measures the latencies under load; these
+tests check the behaviour it relies on.
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.database import read_session
+from app.models import Post
+
+READ_PATHS = ['/blog/', '/blog/?search=cloud', '/blog/feed.xml', '/sitemap.xml']
+
+
+def database_file(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///')
+
+
+@pytest.fixture
+def locked_writer(app, add_posts):
+    """A connection holding an exclusive write transaction with an uncommitted post."""
+    add_posts(5)
+    connection = sqlite3.connect(database_file(app), timeout=0.1, isolation_level=None)
+    connection.execute('BEGIN EXCLUSIVE')
+    connection.execute("INSERT INTO post (title, content, author, date_posted, updated_at) "
+                       "VALUES ('Uncommitted', 'cloud', 'Writer', ?, ?)",
+                       (datetime.utcnow().isoformat(' '), datetime.utcnow().isoformat(' ')))
+    yield connection
+    connection.execute('ROLLBACK')
+    connection.close()
+
+
+def test_database_uses_wal(app):
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+
+def test_read_engine_cannot_write(app, add_posts):
+    add_posts(1)
+    with app.app_context():
+        with pytest.raises(OperationalError):
+            read_session.execute(text("UPDATE post SET title = 'changed'"))
+
+
+def test_reads_do_not_wait_for_a_writer(client, locked_writer):
+    for path in READ_PATHS:
+        started = time.perf_counter()
+        response = client.get(path)
+        assert response.status_code == 200, path
+        # Far below busy_timeout: the reader never waited for the lock
+        assert time.perf_counter() - started < 1, path
+        assert b'Uncommitted' not in response.get_data()
+
+
+def test_rollback_journal_blocks_reads(make_app):
+    # The legacy profile, for contrast: the same reads fail behind the writer
+    app = make_app(SQLITE_PRAGMAS={'busy_timeout': 100, 'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+                   SQLITE_READ_ENGINE=False)
+    with app.app_context():
+        db.session.add(Post(title='Committed', content='cloud', author='Tests'))
+        db.session.commit()
+    connection = sqlite3.connect(database_file(app), timeout=0.1, isolation_level=None)
+    connection.execute('BEGIN EXCLUSIVE')
+    try:
+        with pytest.raises(OperationalError, match='locked'):
+            app.test_client().get('/blog/')
+    finally:
+        connection.execute('ROLLBACK')
+        connection.close()
+
+
+def test_concurrent_reads_during_batch_writes(app, add_posts):
+    add_posts(50)
+    stop = threading.Event()
+    committed, failures = [], []
+
+    def write():
+        with app.app_context():
+            while not stop.is_set():
+                db.session.add_all(Post(title=f'Load {len(committed)}-{n}', content='cloud devops write load',
+                                        author='Writer') for n in range(200))
+                db.session.commit()
+                committed.append(1)
+
+    def read():
+        client = app.test_client()
+        for n in range(40):
+            path = READ_PATHS[n % len(READ_PATHS)]
+            try:
+                status = client.get(path).status_code
+            except Exception as exc:  # "database is locked" and the like
+                failures.append((path, repr(exc)))
+            else:
+                if status != 200:
+                    failures.append((path, status))
+
+    writer = threading.Thread(target=write)
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    writer.start()
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    stop.set()
+    writer.join()
+
+    assert not failures
+    assert committed
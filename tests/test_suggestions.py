@@ -0,0 +1,81 @@
+"""The suggestion index merges changed titles at once and re-reads terms sparingly."""
+from datetime import datetime
+
+import pytest
+
+from app import suggestions
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(SUGGEST_TERMS_AFTER_POSTS=3, SUGGEST_TERMS_INTERVAL=600)
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    """The app's index, built once, with its vocabulary scans counted in ``index.scans``."""
+    index = suggestions.get(app)
+    read_terms = index._terms
+    index.scans = 0
+
+    def counted():
+        index.scans += 1
+        return read_terms()
+
+    monkeypatch.setattr(index, '_terms', counted)
+    return index
+
+
+def refresh(app, index):
+    with app.app_context():
+        return index.refresh()
+
+
+def publish(add_posts, count, title):
+    # As the site writes them: updated now, so a refresh merges them instead of reloading
+    return add_posts(count, title=title, updated_at=datetime.utcnow())
+
+
+def suggest(app, index, query):
+    with app.test_request_context():
+        return index.suggest(query, 10)
+
+
+def test_new_titles_are_merged_without_a_vocabulary_scan(app, index, add_posts):
+    add_posts(2)
+    refresh(app, index)
+    assert index.scans == 1
+
+    publish(add_posts, 1, 'Kubernetes upgrade')
+    assert refresh(app, index)
+    titles, terms = suggest(app, index, 'kubernetes')
+    assert [title for title, _ in titles] == ['Kubernetes upgrade 0']
+    assert index.scans == 1 and terms == []  # 'kubernetes' is not a known term yet
+    assert not refresh(app, index)
+
+
+def test_terms_are_read_after_enough_changed_posts(app, index, add_posts):
+    add_posts(2)
+    refresh(app, index)
+    publish(add_posts, 2, 'Kubernetes upgrade')
+    refresh(app, index)
+    assert index.scans == 1
+
+    publish(add_posts, 1, 'Kubernetes rollback')
+    refresh(app, index)
+    assert index.scans == 2
+    assert suggest(app, index, 'kuber')[1] == ['kubernetes']
+
+
+def test_terms_are_read_once_the_interval_has_passed(app, index, add_posts):
+    add_posts(2)
+    refresh(app, index)
+    publish(add_posts, 1, 'Kubernetes upgrade')
+    refresh(app, index)
+    assert not refresh(app, index) and index.scans == 1
+
+    index._terms_read_at -= app.config['SUGGEST_TERMS_INTERVAL']
+    assert refresh(app, index)
+    assert index.scans == 2
+    assert suggest(app, index, 'kuber')[1] == ['kubernetes']
+    assert not refresh(app, index) and index.scans == 2